@@ -15,23 +15,51 @@ def create_app():
 
     os.makedirs(app.config.get("UPLOADS_DIR", "./uploads"), exist_ok=True)
 
+    if app.config.get("TRUSTED_PROXY_HOPS"):
+        # IP real del cliente (rate limiting por IP) detrás del proxy de Render
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        hops = app.config["TRUSTED_PROXY_HOPS"]
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops)
+
     db.init_app(app)
     migrate.init_app(app, db)
     login_manager.init_app(app)
     csrf.init_app(app)
     limiter.init_app(app)
 
+    from .utils.security import configure_hashing
+    configure_hashing(app)
+
+    from .utils.sqlstats import init_sql_stats
+    init_sql_stats(app)
+
+    from .utils.metrics import init_metrics
+    init_metrics(app)
+
+    from .utils.profiler import init_profiler
+    init_profiler(app)
+
+    from .utils.memtrace import init_memtrace
+    init_memtrace(app)
+
     from .routes.public import public_bp
     from .routes.auth import auth_bp
     from .routes.dashboard import dashboard_bp
     from .routes.health import health_bp
     from .routes.uploads import uploads_bp
+    from .routes.pos import pos_bp
+    from .routes.ops import ops_bp
 
     app.register_blueprint(public_bp)
     app.register_blueprint(auth_bp)
     app.register_blueprint(dashboard_bp)
     app.register_blueprint(health_bp)
     app.register_blueprint(uploads_bp)
+    app.register_blueprint(pos_bp)
+    app.register_blueprint(ops_bp)
+
+    from .cli import register_cli
+    register_cli(app)
 
     # Auto-create tables only for local SQLite dev if schema missing
     try:
@@ -47,6 +75,8 @@ def create_app():
 
     from flask_wtf.csrf import generate_csrf
     app.jinja_env.globals['csrf_token'] = generate_csrf
+    from .services.image_service import upload_policy_token
+    app.jinja_env.globals['upload_policy'] = upload_policy_token
 
     # Expose a helper to check if the current user is admin/manager of some restaurant
     @app.context_processor
@@ -0,0 +1,237 @@
+import click
+from flask.cli import AppGroup
+
+from .extensions import db
+
+
+stats_cli = AppGroup("stats", help="Contadores materializados de usuario.")
+
+
+@stats_cli.command("rebuild")
+@click.option("--user-id", type=int, default=None, help="Solo este usuario (por defecto, todos).")
+def stats_rebuild(user_id):
+    """Reconstruye user_stats y user_counters a partir de tips y reviews."""
+    from .services.stats_service import rebuild_user_stats
+    from .services.achievement_service import rebuild_counters
+    rebuild_user_stats(user_id)
+    rebuild_counters(user_id)
+    db.session.commit()
+    click.echo(f"user_stats/user_counters rebuilt ({'user ' + str(user_id) if user_id else 'all users'})")
+
+
+coupons_cli = AppGroup("coupons", help="Campañas y caducidad de cupones.")
+
+
+@coupons_cli.command("sweep")
+@click.option("--batch", type=int, default=None, help="Filas por transacción.")
+def coupons_sweep(batch):
+    """Marca como expired los códigos reclamados de cupones caducados (para cron)."""
+    from .services.campaign_service import expire_claimed
+    click.echo(f"expired {expire_claimed(batch)} redemptions")
+
+
+@coupons_cli.command("issue")
+@click.argument("campaign_id", type=int)
+@click.option("--batch", type=int, default=None, help="Usuarios por lote.")
+def coupons_issue(campaign_id, batch):
+    """Ejecuta (o reanuda) la emisión de una campaña."""
+    from .services.campaign_service import run_campaign
+    campaign = run_campaign(campaign_id, batch)
+    click.echo(f"campaign {campaign.id}: {campaign.status}, issued {campaign.issued_count}")
+
+
+@coupons_cli.command("resume")
+@click.option("--batch", type=int, default=None, help="Usuarios por lote.")
+def coupons_resume(batch):
+    """Reanuda las campañas paradas (sin latido reciente) desde donde se quedaron (para cron)."""
+    from .services.campaign_service import resume_stalled
+    for campaign in resume_stalled(batch):
+        click.echo(f"campaign {campaign.id}: {campaign.status}, issued {campaign.issued_count}")
+    click.echo("resume complete")
+
+
+staff_cli = AppGroup("staff", help="Gestión de staff.")
+
+
+@staff_cli.command("import")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--restaurant-slug", default=None, help="Restaurante por defecto para filas sin restaurante.")
+@click.option("--admin-email", default=None, help="Usuario que administrará los restaurantes nuevos.")
+def staff_import(path, restaurant_slug, admin_email):
+    """Importa staff (y restaurantes) desde un CSV o JSON."""
+    from .models import Restaurant, User
+    from .services.staff_service import create_import_job, parse_import, run_import
+    default = Restaurant.query.filter_by(slug=restaurant_slug).first() if restaurant_slug else None
+    if restaurant_slug and not default:
+        raise click.ClickException(f"Restaurant {restaurant_slug} not found")
+    admin = User.query.filter_by(email=admin_email.lower()).first() if admin_email else None
+    if admin_email and not admin:
+        raise click.ClickException(f"User {admin_email} not found")
+    with open(path, "rb") as f:
+        try:
+            rows = parse_import(f.read(), path, default_restaurant=default)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+    job = create_import_job(rows, admin)
+    job = run_import(job.id)
+    click.echo(f"import {job.id}: {job.status} {job.result or job.error}")
+
+
+@staff_cli.command("backfill-logins")
+@click.option("--batch", type=int, default=200, show_default=True, help="Staff por transacción.")
+def staff_backfill_logins(batch):
+    """Genera logins pendientes y migra emails @staff.local (reanudable)."""
+    from .services.staff_service import backfill_staff_logins
+    total = backfill_staff_logins(batch, progress=lambda n: click.echo(f"  {n} staff processed"))
+    click.echo(f"backfill complete: {total} staff updated")
+
+
+payouts_cli = AppGroup("payouts", help="Pagos de propinas al staff.")
+
+
+@payouts_cli.command("run")
+@click.option("--restaurant-slug", default=None, help="Solo este restaurante (por defecto, todos).")
+@click.option("--min-cents", type=int, default=1, show_default=True, help="Pendiente mínimo para pagar.")
+def payouts_run(restaurant_slug, min_cents):
+    """Paga todo lo pendiente (pensado para el cron nocturno)."""
+    from .models import Restaurant
+    from .services.payout_service import run_all_payouts, run_payouts
+    if restaurant_slug:
+        restaurant = Restaurant.query.filter_by(slug=restaurant_slug).first()
+        if not restaurant:
+            raise click.ClickException(f"Restaurant {restaurant_slug} not found")
+        count, cents = run_payouts(restaurant.id, min_cents)
+    else:
+        count, cents = run_all_payouts(
+            min_cents, progress=lambda rid, n, c: click.echo(f"  restaurant {rid}: {n} transfers, {c / 100:.2f}")
+        )
+    click.echo(f"payouts complete: {count} transfers, {cents / 100:.2f} total")
+
+
+def _statement_format(path, fmt):
+    if fmt:
+        return fmt
+    return "jsonl" if path.lower().endswith((".jsonl", ".ndjson", ".json")) else "csv"
+
+
+@payouts_cli.command("reconcile")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(["csv", "jsonl"]), default=None, help="Por defecto, según la extensión.")
+@click.option("--report", type=click.Path(dir_okay=False, writable=True), default=None, help="CSV de discrepancias.")
+@click.option("--batch", type=int, default=None, help="Líneas por lote.")
+def payouts_reconcile(path, fmt, report, batch):
+    """Concilia las transferencias con un extracto del proveedor (CSV o JSON Lines)."""
+    from .services.reconcile_service import reconcile_statement
+    with open(path, newline="", encoding="utf-8") as stream:
+        if report:
+            with open(report, "w", newline="", encoding="utf-8") as out:
+                summary = reconcile_statement(stream, _statement_format(path, fmt), out, batch)
+        else:
+            summary = reconcile_statement(stream, _statement_format(path, fmt), None, batch)
+    click.echo(" ".join(f"{k}={v}" for k, v in summary.items()))
+
+
+@payouts_cli.command("mock-statement")
+@click.argument("path", type=click.Path(dir_okay=False, writable=True))
+@click.option("--format", "fmt", type=click.Choice(["csv", "jsonl"]), default=None, help="Por defecto, según la extensión.")
+@click.option("--mismatch-rate", type=float, default=0.01, show_default=True)
+@click.option("--unknown-rate", type=float, default=0.01, show_default=True)
+@click.option("--failed-rate", type=float, default=0.02, show_default=True)
+@click.option("--seed", type=int, default=None)
+def payouts_mock_statement(path, fmt, mismatch_rate, unknown_rate, failed_rate, seed):
+    """Genera un extracto de un proveedor ficticio para probar la conciliación."""
+    from .services.reconcile_service import write_mock_statement
+    with open(path, "w", newline="", encoding="utf-8") as out:
+        n = write_mock_statement(out, _statement_format(path, fmt), mismatch_rate, unknown_rate, failed_rate, seed)
+    click.echo(f"wrote {n} lines to {path}")
+
+
+security_cli = AppGroup("security", help="Ajustes de seguridad.")
+
+
+@security_cli.command("calibrate")
+@click.option("--target-ms", type=float, default=None, help="Por defecto, BCRYPT_TARGET_MS.")
+def security_calibrate(target_ms):
+    """Recomienda un BCRYPT_ROUNDS para esta máquina (no cambia la configuración)."""
+    from flask import current_app
+    from .utils.security import calibrate_rounds
+    target_ms = target_ms or float(current_app.config.get("BCRYPT_TARGET_MS", 250))
+    click.echo(f"BCRYPT_ROUNDS={calibrate_rounds(target_ms)} (~{target_ms:.0f} ms per hash on this machine)")
+
+
+pool_cli = AppGroup("pool", help="Reparto del bote de propinas sin staff.")
+
+
+@pool_cli.command("allocate")
+@click.option("--restaurant-slug", default=None, help="Solo este restaurante (por defecto, todos).")
+def pool_allocate(restaurant_slug):
+    """Reparte el bote de días cerrados (hasta hoy a las 00:00 UTC) con la regla de cada restaurante."""
+    from datetime import datetime
+    from .models import Restaurant
+    from .services.pool_service import allocate_pool
+    now = datetime.utcnow()
+    until = datetime(now.year, now.month, now.day)
+    q = Restaurant.query.order_by(Restaurant.id.asc())
+    if restaurant_slug:
+        q = q.filter_by(slug=restaurant_slug)
+    for restaurant in q.all():
+        try:
+            run = allocate_pool(restaurant, until)
+        except ValueError as e:
+            click.echo(f"  {restaurant.slug}: {e}")
+            continue
+        if run:
+            click.echo(f"  {restaurant.slug}: {run.tips_count} tips, {run.total_cents / 100:.2f} ({run.rule})")
+    click.echo("pool allocation complete")
+
+
+@click.command("seed")
+@click.option("--scale", is_flag=True, help="Dataset sintético masivo en lugar de la demo.")
+@click.option("--restaurants", type=int, default=50, show_default=True)
+@click.option("--staff", type=int, default=8, show_default=True, help="Staff medio por restaurante.")
+@click.option("--users", type=int, default=20_000, show_default=True, help="Usuarios registrados.")
+@click.option("--guests", type=int, default=100_000, show_default=True, help="Invitados (por dispositivo).")
+@click.option("--tips", type=int, default=1_000_000, show_default=True)
+@click.option("--reviews", type=int, default=None, help="Por defecto, tips / 5.")
+@click.option("--redemptions", type=int, default=None, help="Por defecto, users / 2.")
+@click.option("--days", type=int, default=365, show_default=True)
+@click.option("--seed", type=int, default=None, help="Semilla para repetir el mismo dataset.")
+@click.option("--skip-stats", is_flag=True, help="No reconstruir user_stats/user_counters.")
+def seed_command(scale, restaurants, staff, users, guests, tips, reviews, redemptions, days, seed, skip_stats):
+    """Carga la demo (Cafe Luna) o, con --scale, millones de filas sintéticas."""
+    import time
+    from sqlalchemy import text
+    from .seed import seed_demo
+    from .utils.sql import dialect_name
+    if not scale:
+        seed_demo()
+        return
+    from .seed_scale import generate
+    started = time.perf_counter()
+    db.create_all()
+    summary = generate(restaurants, staff, users, guests, tips, reviews, days, redemptions, seed, progress=click.echo)
+    if not skip_stats:
+        from .services.stats_service import rebuild_user_stats
+        from .services.achievement_service import rebuild_counters
+        rebuild_user_stats()
+        rebuild_counters()
+        db.session.commit()
+        click.echo("  user_stats/user_counters rebuilt")
+    if dialect_name() == "postgresql":
+        db.session.execute(text("ANALYZE"))
+        db.session.commit()
+    click.echo(
+        f"{summary['tips']:,} tips, {summary['reviews']:,} reviews, {summary['transfers']:,} transfers, "
+        f"{summary['redemptions']:,} redemptions in {time.perf_counter() - started:.1f}s"
+    )
+    click.echo(f"first venue /r/{summary['first_slug']} (admin {summary['first_admin']}, password demo123)")
+
+
+def register_cli(app):
+    app.cli.add_command(stats_cli)
+    app.cli.add_command(coupons_cli)
+    app.cli.add_command(staff_cli)
+    app.cli.add_command(payouts_cli)
+    app.cli.add_command(pool_cli)
+    app.cli.add_command(security_cli)
+    app.cli.add_command(seed_command)
@@ -36,14 +36,97 @@ class Config:
 
         # Subidas de imagen
         self.MAX_IMAGE_MB = int(os.getenv("MAX_IMAGE_MB", "2"))
+        # Tope del cuerpo de cualquier petición (foto + resto del formulario):
+        # Werkzeug responde 413 antes de leer y guardar el multipart
+        self.MAX_REQUEST_MB = int(os.getenv("MAX_REQUEST_MB", str(self.MAX_IMAGE_MB + 1)))
+        self.MAX_CONTENT_LENGTH = self.MAX_REQUEST_MB * 1024 * 1024
+        # Límite de píxeles comprobado en la cabecera antes de decodificar
+        self.MAX_IMAGE_PIXELS = int(os.getenv("MAX_IMAGE_PIXELS", "40000000"))
         # Directorio de subidas en disco; por defecto fuera de static/
         # Ejemplos:
         #  - Local: ./uploads
         #  - Render: /opt/render/project/src/uploads
         self.UPLOADS_DIR = os.getenv("UPLOADS_DIR", "./uploads")
+        # Tamaño máximo de cada trozo en las subidas reanudables
+        self.UPLOAD_CHUNK_KB = int(os.getenv("UPLOAD_CHUNK_KB", "256"))
 
-        # Rate limiting global por defecto
+        # bcrypt: coste fijo (mínimo 12 en producción); `flask security calibrate`
+        # recomienda uno para que un hash tarde ~BCRYPT_TARGET_MS en esta máquina
+        self.BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+        self.BCRYPT_TARGET_MS = int(os.getenv("BCRYPT_TARGET_MS", "250"))
+        # Pool acotado de hashing: hashes simultáneos (0 = nº de CPUs), cola y espera máxima
+        self.HASH_MAX_CONCURRENCY = int(os.getenv("HASH_MAX_CONCURRENCY", "0"))
+        self.HASH_QUEUE_SIZE = int(os.getenv("HASH_QUEUE_SIZE", "8"))
+        self.HASH_QUEUE_TIMEOUT_MS = int(os.getenv("HASH_QUEUE_TIMEOUT_MS", "2000"))
+
+        # Importación masiva de staff: filas máximas y procesos para bcrypt (0 = nº de CPUs)
+        self.MAX_IMPORT_ROWS = int(os.getenv("MAX_IMPORT_ROWS", "5000"))
+        self.IMPORT_HASH_WORKERS = int(os.getenv("IMPORT_HASH_WORKERS", "0"))
+
+        # Tamaño de lote para campañas de cupones y el barrido de caducados
+        self.COUPON_BATCH_SIZE = int(os.getenv("COUPON_BATCH_SIZE", "2000"))
+        # Líneas del extracto del proveedor por lote al conciliar transferencias
+        self.RECONCILE_BATCH_SIZE = int(os.getenv("RECONCILE_BATCH_SIZE", "5000"))
+
+        # Rate limiting global por defecto (RATELIMIT_ENABLED=0 solo para benchmarks)
+        self.RATELIMIT_ENABLED = os.getenv("RATELIMIT_ENABLED", "1") == "1"
         self.RATELIMIT_DEFAULT = os.getenv("RATELIMIT_DEFAULT", "100 per minute")
+        # Validación/canje de cupones en el TPV (varios dispositivos tras la misma IP)
+        self.POS_RATELIMIT = os.getenv("POS_RATELIMIT", "600 per minute")
+        # Contadores compartidos entre workers en un SQLite local (WAL) con ventana deslizante
+        self.RATELIMIT_STORAGE_URI = os.getenv("RATELIMIT_STORAGE_URI", "sqlite:///ratelimit.db")
+        self.RATELIMIT_STRATEGY = os.getenv("RATELIMIT_STRATEGY", "sliding-window-counter")
+        # Clave: combinación de ip, device y restaurant separada por "+"
+        self.RATELIMIT_KEY = os.getenv("RATELIMIT_KEY", "device+restaurant")
+        # La cookie de dispositivo la elige el cliente: techo por IP para toda petición
+        self.RATELIMIT_IP_CEILING = os.getenv("RATELIMIT_IP_CEILING", "600 per minute")
+        # Intentos de login/registro por IP (relleno de credenciales)
+        self.LOGIN_RATELIMIT = os.getenv("LOGIN_RATELIMIT", "10 per minute")
+        # Proxies delante de la app (Render: 1) para tomar la IP real de X-Forwarded-For
+        self.TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "0"))
+        # Si el almacén falla, dejar pasar la petición en vez de devolver 500
+        self.RATELIMIT_SWALLOW_ERRORS = os.getenv("RATELIMIT_SWALLOW_ERRORS", "1") == "1"
+
+        # Instrumentación SQL por petición (Server-Timing, log JSON y avisos de N+1)
+        self.SQL_STATS_ENABLED = os.getenv("SQL_STATS_ENABLED", "1") == "1"
+        self.SQL_SLOW_TOP = int(os.getenv("SQL_SLOW_TOP", "5"))
+        self.SQL_NPLUSONE_THRESHOLD = int(os.getenv("SQL_NPLUSONE_THRESHOLD", "10"))
+        # Emails que pueden ver el panel de depuración (?_sql=1) fuera de debug
+        self.OPS_ADMIN_EMAILS = tuple(
+            e.strip().lower() for e in os.getenv("OPS_ADMIN_EMAILS", "").split(",") if e.strip()
+        )
+
+        # Profiler por muestreo: fracción de peticiones (0.01 = 1%) y/o todas las que superen PROFILE_SLOW_MS
+        self.PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+        self.PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "0"))
+        self.PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "10"))
+        self.PROFILE_DIR = os.getenv("PROFILE_DIR") or None
+        self.PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))
+
+        # Pico de memoria por petición con tracemalloc (opt-in; frena las asignaciones mientras mide)
+        self.MEMTRACE_ENABLED = os.getenv("MEMTRACE_ENABLED", "0") == "1"
+        self.MEMTRACE_ENDPOINTS = tuple(
+            e.strip() for e in os.getenv(
+                "MEMTRACE_ENDPOINTS",
+                "dashboard.restaurant_view,dashboard.chain_view,dashboard.breakdown_view,"
+                "dashboard.staff_view,dashboard.my_staff_panel,dashboard.staff_breakdown",
+            ).split(",") if e.strip()
+        )
+        self.MEMTRACE_BUDGET_MB = float(os.getenv("MEMTRACE_BUDGET_MB", "64"))
+        self.MEMTRACE_TOP = int(os.getenv("MEMTRACE_TOP", "10"))
+        self.MEMTRACE_FRAMES = int(os.getenv("MEMTRACE_FRAMES", "1"))
+
+        # /health/ready: refresco en segundo plano y umbrales para aceptar tráfico
+        self.HEALTH_INTERVAL_S = float(os.getenv("HEALTH_INTERVAL_S", "5"))
+        self.HEALTH_DB_MAX_MS = float(os.getenv("HEALTH_DB_MAX_MS", "250"))
+        self.HEALTH_STORAGE_MAX_MS = float(os.getenv("HEALTH_STORAGE_MAX_MS", "500"))
+        self.HEALTH_POOL_MAX = float(os.getenv("HEALTH_POOL_MAX", "0.9"))
+
+        # Métricas Prometheus en /metrics (Authorization: Bearer <token>). Sin
+        # token solo son públicas fuera de producción, salvo METRICS_PUBLIC=1
+        self.METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+        self.METRICS_TOKEN = os.getenv("METRICS_TOKEN") or None
+        self.METRICS_PUBLIC = os.getenv("METRICS_PUBLIC", "0" if self.ENV == "production" else "1") == "1"
 
         # Cookies de sesión seguras en producción
         if self.ENV == "production":
@@ -2,14 +2,19 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_login import LoginManager
 from flask_wtf import CSRFProtect
-from flask_limiter import Limiter
+from flask_limiter import ApplicationLimit, Limiter
 from flask_limiter.util import get_remote_address
+from .utils.ratelimit import ip_ceiling, rate_limit_key
 
 db = SQLAlchemy()
 migrate = Migrate()
 login_manager = LoginManager()
 csrf = CSRFProtect()
-limiter = Limiter(key_func=get_remote_address)
+# Techo por IP que se suma a cualquier otro límite (no lo anula un @limiter.limit de ruta)
+limiter = Limiter(
+    key_func=rate_limit_key,
+    application_limits=[ApplicationLimit(ip_ceiling, key_function=get_remote_address, scope="ip")],
+)
 
 login_manager.login_view = "auth.login"
 login_manager.login_message_category = "info"
@@ -1,3 +1,4 @@
+import secrets
 from datetime import datetime
 from flask_login import UserMixin
 from sqlalchemy.dialects.postgresql import JSON
@@ -11,6 +12,8 @@ class User(db.Model, UserMixin):
     password_hash = db.Column(db.String(255), nullable=True)
     name = db.Column(db.String(120), nullable=True)
     avatar_url = db.Column(db.String(512), nullable=True)
+    avatar_placeholder = db.Column(db.Text, nullable=True)
+    avatar_color = db.Column(db.String(7), nullable=True)
     device_id_hash = db.Column(db.String(64), unique=True, nullable=True)
     level = db.Column(db.Integer, default=1, nullable=False)
     xp = db.Column(db.Integer, default=0, nullable=False)
@@ -26,12 +29,45 @@ def load_user(user_id):
     return User.query.get(int(user_id))
 
 
+class UserStat(db.Model):
+    """
+    Contadores materializados por usuario (modelo de lectura de /me/summary
+    y /me/profile). bucket: total | month (key YYYY-MM) | restaurant (key id)
+    | method (key method_ui). Se mantiene en cada propina/reseña y se puede
+    reconstruir con `flask stats rebuild`.
+    """
+    __tablename__ = "user_stats"
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+    bucket = db.Column(db.String(16), primary_key=True)
+    key = db.Column(db.String(64), primary_key=True, default="")
+    tips_count = db.Column(db.Integer, default=0, nullable=False)
+    tips_cents = db.Column(db.BigInteger, default=0, nullable=False)
+    reviews_count = db.Column(db.Integer, default=0, nullable=False)
+
+
+class UserCounter(db.Model):
+    """
+    Contadores de logros/misiones por usuario. period: "all" o semana ISO
+    ("2026-W42"). Los define y actualiza achievement_service.
+    """
+    __tablename__ = "user_counters"
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+    period = db.Column(db.String(16), primary_key=True)
+    name = db.Column(db.String(32), primary_key=True)
+    value = db.Column(db.Integer, default=0, nullable=False)
+
+
 class Restaurant(db.Model):
     __tablename__ = "restaurants"
     id = db.Column(db.Integer, primary_key=True)
     slug = db.Column(db.String(120), unique=True, nullable=False)
     name = db.Column(db.String(255), nullable=False)
     logo_url = db.Column(db.String(512), nullable=True)
+    logo_placeholder = db.Column(db.Text, nullable=True)
+    logo_color = db.Column(db.String(7), nullable=True)
+    # Reparto de propinas sin staff: equal | role | hours; pesos por rol en JSON
+    pool_rule = db.Column(db.String(16), default="equal", nullable=False)
+    pool_role_weights = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
     staff = db.relationship("Staff", backref="restaurant", lazy=True)
@@ -46,6 +82,8 @@ class Staff(db.Model):
     name = db.Column(db.String(120), nullable=False)
     role = db.Column(db.String(120), nullable=True)
     avatar_url = db.Column(db.String(512), nullable=True)
+    avatar_placeholder = db.Column(db.Text, nullable=True)
+    avatar_color = db.Column(db.String(7), nullable=True)
     bio = db.Column(db.Text, nullable=True)
     rating_avg = db.Column(db.Float, default=0.0, nullable=False)
     tips_count = db.Column(db.Integer, default=0, nullable=False)
@@ -72,6 +110,22 @@ class Membership(db.Model):
     )
 
 
+class ImportJob(db.Model):
+    """Importación masiva de restaurantes/staff (CSV o JSON) con progreso."""
+    __tablename__ = "import_jobs"
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), default="staff", nullable=False)
+    status = db.Column(db.String(20), default="pending", nullable=False)  # pending|hashing|inserting|done|failed
+    total = db.Column(db.Integer, default=0, nullable=False)
+    processed = db.Column(db.Integer, default=0, nullable=False)
+    payload = db.Column(db.Text, nullable=True)  # filas normalizadas (JSON)
+    result = db.Column(db.Text, nullable=True)  # resumen (JSON)
+    error = db.Column(db.Text, nullable=True)
+    created_by_user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+
 class Tip(db.Model):
     __tablename__ = "tips"
     id = db.Column(db.Integer, primary_key=True)
@@ -82,9 +136,15 @@ class Tip(db.Model):
     method_ui = db.Column(db.Text, default="mock", nullable=False)
     status = db.Column(db.Text, default="recorded", nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    # Reparto del bote que ya incluyó esta propina (solo propinas sin staff)
+    pool_run_id = db.Column(db.Integer, db.ForeignKey("pool_runs.id"), nullable=True)
+    # Clave del cliente (service worker): un reenvío de la cola offline no duplica la propina
+    idempotency_key = db.Column(db.String(64), nullable=True)
 
     __table_args__ = (
         db.Index("ix_tips_restaurant_created", "restaurant_id", "created_at"),
+        db.Index("ix_tips_restaurant_staff", "restaurant_id", "staff_id", "amount_cents"),
+        db.Index("uq_tips_restaurant_idempotency_key", "restaurant_id", "idempotency_key", unique=True),
     )
 
 
@@ -98,11 +158,13 @@ class Review(db.Model):
     comment = db.Column(db.Text, nullable=True)
     share_allowed = db.Column(db.Boolean, default=False, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    idempotency_key = db.Column(db.String(64), nullable=True)
 
     media = db.relationship("Media", backref="review", uselist=False, lazy=True)
 
     __table_args__ = (
         db.Index("ix_reviews_restaurant_created", "restaurant_id", "created_at"),
+        db.Index("uq_reviews_restaurant_idempotency_key", "restaurant_id", "idempotency_key", unique=True),
     )
 
 
@@ -113,6 +175,8 @@ class Media(db.Model):
     url = db.Column(db.Text, nullable=False)
     width = db.Column(db.Integer, nullable=True)
     height = db.Column(db.Integer, nullable=True)
+    placeholder = db.Column(db.Text, nullable=True)
+    dominant_color = db.Column(db.String(7), nullable=True)
 
 
 class ImageAsset(db.Model):
@@ -155,6 +219,10 @@ class PayoutAccount(db.Model):
     restaurant = db.relationship("Restaurant", backref=db.backref("payout_accounts", lazy=True))
 
 
+def new_transfer_ref() -> str:
+    return f"tr_{secrets.token_hex(10)}"
+
+
 class Transfer(db.Model):
     __tablename__ = "transfers"
     id = db.Column(db.Integer, primary_key=True)
@@ -163,10 +231,70 @@ class Transfer(db.Model):
     amount_cents = db.Column(db.Integer, nullable=False)
     status = db.Column(db.String(50), default="pending", nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    # Referencia que enviamos al proveedor y que vuelve en sus extractos
+    external_ref = db.Column(db.String(40), nullable=True, default=new_transfer_ref)
+    reconciled_at = db.Column(db.DateTime, nullable=True)
 
     restaurant = db.relationship("Restaurant")
     staff_ref = db.relationship("Staff")
 
+    __table_args__ = (
+        db.Index("ix_transfers_restaurant_staff", "restaurant_id", "staff_id", "amount_cents"),
+        db.UniqueConstraint("external_ref", name="uq_transfers_external_ref"),
+        db.Index("ix_transfers_unreconciled", "reconciled_at", "created_at"),
+    )
+
+
+class StaffShift(db.Model):
+    """Horas trabajadas por día (regla de reparto "hours")."""
+    __tablename__ = "staff_shifts"
+    id = db.Column(db.Integer, primary_key=True)
+    restaurant_id = db.Column(db.Integer, db.ForeignKey("restaurants.id"), nullable=False)
+    staff_id = db.Column(db.Integer, db.ForeignKey("staff.id"), nullable=False)
+    work_date = db.Column(db.Date, nullable=False)
+    hours = db.Column(db.Float, default=0.0, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint("staff_id", "work_date", name="uq_staff_shifts_staff_date"),
+        db.Index("ix_staff_shifts_restaurant_date", "restaurant_id", "work_date"),
+    )
+
+
+class PoolRun(db.Model):
+    """Un reparto del bote: las propinas sin staff hasta period_end con una regla."""
+    __tablename__ = "pool_runs"
+    id = db.Column(db.Integer, primary_key=True)
+    restaurant_id = db.Column(db.Integer, db.ForeignKey("restaurants.id"), nullable=False)
+    rule = db.Column(db.String(16), nullable=False)
+    period_start = db.Column(db.DateTime, nullable=True)
+    period_end = db.Column(db.DateTime, nullable=False)
+    tips_count = db.Column(db.Integer, default=0, nullable=False)
+    total_cents = db.Column(db.Integer, default=0, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.Index("ix_pool_runs_restaurant_created", "restaurant_id", "created_at"),
+    )
+
+
+class PoolAllocation(db.Model):
+    """Parte del bote asignada a un miembro del staff; suma en su saldo pendiente."""
+    __tablename__ = "pool_allocations"
+    id = db.Column(db.Integer, primary_key=True)
+    run_id = db.Column(db.Integer, db.ForeignKey("pool_runs.id"), nullable=False)
+    restaurant_id = db.Column(db.Integer, db.ForeignKey("restaurants.id"), nullable=False)
+    staff_id = db.Column(db.Integer, db.ForeignKey("staff.id"), nullable=False)
+    amount_cents = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    run = db.relationship("PoolRun", backref=db.backref("allocations", lazy=True))
+    staff_ref = db.relationship("Staff")
+
+    __table_args__ = (
+        db.Index("ix_pool_allocations_restaurant_staff", "restaurant_id", "staff_id", "amount_cents"),
+        db.Index("ix_pool_allocations_run", "run_id"),
+    )
+
 
 class Coupon(db.Model):
     __tablename__ = "coupons"
@@ -182,7 +310,8 @@ class Coupon(db.Model):
     restaurant = db.relationship("Restaurant", backref=db.backref("coupons", lazy=True))
 
     __table_args__ = (
-        db.Index("ix_coupons_restaurant_active", "restaurant_id", "active"),
+        db.Index("ix_coupons_eligibility", "restaurant_id", "active", "required_xp"),
+        db.Index("ix_coupons_expires_at", "expires_at"),
     )
 
 
@@ -194,11 +323,35 @@ class CouponRedemption(db.Model):
     code = db.Column(db.String(24), unique=True, nullable=False)
     status = db.Column(db.String(20), default="claimed", nullable=False)  # claimed|used|expired
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    redeemed_at = db.Column(db.DateTime, nullable=True)
+    redeemed_by_user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True)
 
     coupon = db.relationship("Coupon", backref=db.backref("redemptions", lazy=True))
-    user = db.relationship("User", backref=db.backref("coupon_redemptions", lazy=True))
+    user = db.relationship("User", foreign_keys=[user_id], backref=db.backref("coupon_redemptions", lazy=True))
 
     __table_args__ = (
+        db.UniqueConstraint("coupon_id", "user_id", name="uq_redemptions_coupon_user"),
         db.Index("ix_redemptions_user", "user_id"),
-        db.Index("ix_redemptions_coupon", "coupon_id"),
+        # Barrido de caducados: por cupón, solo los reclamados, en orden de id
+        db.Index("ix_redemptions_coupon_status", "coupon_id", "status", "id"),
     )
+
+
+class CouponCampaign(db.Model):
+    """Emisión masiva de un cupón a un segmento de usuarios (por lotes, reanudable)."""
+    __tablename__ = "coupon_campaigns"
+    id = db.Column(db.Integer, primary_key=True)
+    coupon_id = db.Column(db.Integer, db.ForeignKey("coupons.id"), nullable=False)
+    min_xp = db.Column(db.Integer, default=0, nullable=False)
+    tipped_here = db.Column(db.Boolean, default=False, nullable=False)
+    status = db.Column(db.String(20), default="pending", nullable=False)  # pending|running|done|failed
+    issued_count = db.Column(db.Integer, default=0, nullable=False)
+    last_user_id = db.Column(db.Integer, default=0, nullable=False)  # cursor keyset
+    # Se actualiza en cada lote; sin latido reciente la campaña se da por parada
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    created_by_user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    coupon = db.relationship("Coupon", backref=db.backref("campaigns", lazy=True, cascade="all, delete-orphan"))
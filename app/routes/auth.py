@@ -1,4 +1,5 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask_limiter.util import get_remote_address
 from flask_login import current_user, login_required, logout_user
 from datetime import datetime, timedelta
 from math import ceil
@@ -7,15 +8,21 @@ from ..forms import LoginForm, RegisterForm
 from ..services.auth_service import authenticate, register_user
 from ..services.merge_service import merge_guest_into_user
 from ..utils import device as device_util
-from ..extensions import db
-from ..models import User, Restaurant, Tip, Review, Coupon, CouponRedemption, Staff, Membership
+from ..utils.security import HashingBusy
+from ..extensions import db, limiter
+from ..utils.ratelimit import login_limit
+from ..models import User, Restaurant, Staff, Membership, UserStat
 from ..services.reward_service import get_tier_progress
+from ..services.stats_service import get_user_stats
+from ..services.achievement_service import user_progress
+from ..services.coupon_service import CouponAlreadyClaimed, claim_for_user, claimed_codes, eligible_coupons
 
 
 auth_bp = Blueprint("auth", __name__)
 
 
 @auth_bp.route("/login", methods=["GET", "POST"])
+@limiter.limit(login_limit, methods=["POST"], key_func=get_remote_address)
 def login():
     form = LoginForm()
     if form.validate_on_submit():
@@ -36,10 +43,14 @@ def login():
             return redirect(next_url)
         except ValueError as e:
             flash(str(e), "danger")
+        except HashingBusy:
+            flash("Too many sign-ins right now, please try again in a moment", "warning")
+            return render_template("auth/login.html", form=form), 503
     return render_template("auth/login.html", form=form)
 
 
 @auth_bp.route("/register", methods=["GET", "POST"])
+@limiter.limit(login_limit, methods=["POST"], key_func=get_remote_address)
 def register():
     form = RegisterForm()
     if form.validate_on_submit():
@@ -50,6 +61,9 @@ def register():
             return redirect(next_url or url_for("auth.profile"))
         except ValueError as e:
             flash(str(e), "danger")
+        except HashingBusy:
+            flash("Too many sign-ups right now, please try again in a moment", "warning")
+            return render_template("auth/register.html", form=form), 503
     return render_template("auth/register.html", form=form)
 
 
@@ -68,14 +82,11 @@ def profile():
 
     user = current_user
 
-    tips = (
-        Tip.query.filter_by(user_id=user.id).order_by(Tip.created_at.desc()).limit(20).all()
-    )
-    reviews = (
-        Review.query.filter_by(user_id=user.id).order_by(Review.created_at.desc()).limit(20).all()
-    )
-    # Datos completos para logros y misión
-    restaurant_ids = {t.restaurant_id for t in tips} | {r.restaurant_id for r in reviews}
+    # Restaurantes visitados desde el modelo de lectura (sin cargar tips/reviews)
+    restaurant_ids = [
+        int(key) for (key,) in
+        db.session.query(UserStat.key).filter_by(user_id=user.id, bucket="restaurant").all()
+    ]
     restaurants = (
         Restaurant.query.filter(Restaurant.id.in_(restaurant_ids)).order_by(Restaurant.name.asc()).all()
         if restaurant_ids
@@ -90,19 +101,8 @@ def profile():
         reviews_needed = max(1, ceil(gap / 5)) if gap else 0
 
     # Rewards: available to claim vs upcoming (exclude already claimed)
-    claimed_ids = set()
-    if restaurants:
-        redemptions = CouponRedemption.query.filter_by(user_id=user.id).all()
-        claimed_ids = {cr.coupon_id for cr in redemptions}
-
-    reward_ids = [r.id for r in restaurants] if restaurants else []
-    rewards_q = Coupon.query.filter_by(active=True)
-    if reward_ids:
-        rewards_q = rewards_q.filter(Coupon.restaurant_id.in_(reward_ids))
-    rewards = rewards_q.order_by(Coupon.required_xp.asc()).all()
-
-    current_rewards = [c for c in rewards if c.required_xp <= xp and c.id not in claimed_ids]
-    upcoming_rewards = [c for c in rewards if c.required_xp > xp]
+    current_rewards, upcoming_rewards = eligible_coupons(user, restaurant_ids)
+    rewards = current_rewards + upcoming_rewards
 
     expiry_by_id = {}
     now = datetime.utcnow()
@@ -112,145 +112,77 @@ def profile():
         for c in rewards:
             expiry_by_id[c.id] = c.expires_at.strftime("%Y-%m-%d") if c.expires_at else month_end.strftime("%Y-%m-%d")
 
+    achievements, missions = user_progress(user.id)
+
     return render_template(
         "auth/profile.html",
         is_guest=False,
         user=user,
         restaurants=restaurants,
-        tips=tips,
-        reviews=reviews,
         current_tier=current_tier,
         next_tier=next_tier,
         progress_pct=progress_pct,
         current_rewards=current_rewards,
         upcoming_rewards=upcoming_rewards,
+        my_codes=claimed_codes(user),
         expiry_by_id=expiry_by_id,
         reviews_needed=reviews_needed,
+        achievements=achievements,
+        missions=missions,
     )
 
 
-def _gen_coupon_code(n: int = 10) -> str:
-    import secrets, string
-    alphabet = string.ascii_uppercase + string.digits
-    return ''.join(secrets.choice(alphabet) for _ in range(n))
-
-
 @auth_bp.route("/me/coupons/<int:coupon_id>/claim", methods=["POST"]) 
 def claim_coupon(coupon_id: int):
     # Permitir invitado (usuario creado por dispositivo)
     user = current_user if current_user.is_authenticated else device_util.get_or_create_guest_user()
-    c = Coupon.query.filter_by(id=coupon_id, active=True).first()
-    if not c:
-        flash("Coupon not available", "danger")
+    try:
+        claim_for_user(coupon_id, user)
+    except CouponAlreadyClaimed as e:
+        flash(str(e), "info")
         return redirect(url_for("auth.profile"))
-    if (user.xp or 0) < int(c.required_xp or 0):
-        flash("You haven't reached the required XP yet", "danger")
+    except ValueError as e:
+        flash(str(e), "danger")
         return redirect(url_for("auth.profile"))
-    exists = CouponRedemption.query.filter_by(coupon_id=c.id, user_id=user.id).first()
-    if exists:
-        flash("This coupon has already been claimed", "info")
-        return redirect(url_for("auth.profile"))
-
-    code = _gen_coupon_code(10)
-    tries = 0
-    while CouponRedemption.query.filter_by(code=code).first() and tries < 5:
-        code = _gen_coupon_code(10)
-        tries += 1
-
-    cr = CouponRedemption(coupon_id=c.id, user_id=user.id, code=code, status="claimed")
-    db.session.add(cr)
-    db.session.commit()
     flash("Coupon claimed", "success")
     return redirect(url_for("auth.profile"))
 
 
-# ---- Helper: achievements & mission ----
-def _compute_achievements(user: User, all_tips: list[Tip], all_reviews: list[Review]):
-    # Explorador de cafés: 3+ restaurantes distintos
-    rest_ids = {t.restaurant_id for t in all_tips} | {r.restaurant_id for r in all_reviews}
-    explorer = len([rid for rid in rest_ids if rid]) >= 3
-
-    # Fan del latte art: 5+ propinas a baristas
-    fan_latte = False
-    if all_tips:
-        staff_ids = {t.staff_id for t in all_tips if t.staff_id}
-        roles = {}
-        if staff_ids:
-            for s in Staff.query.filter(Staff.id.in_(staff_ids)).all():
-                roles[s.id] = (s.role or '').lower()
-        barista_tips = sum(1 for t in all_tips if t.staff_id and 'barista' in (roles.get(t.staff_id, '')))
-        fan_latte = barista_tips >= 5
-
-    # Crítico amable: 5+ reseñas con 4★ o más
-    critic = sum(1 for r in all_reviews if (r.rating or 0) >= 4) >= 5
-
-    return [
-        {'key': 'explorer', 'name': 'Cafe Explorer', 'earned': explorer, 'desc': 'Visit 3+ different cafés'},
-        {'key': 'latte_fan', 'name': 'Latte Art Fan', 'earned': fan_latte, 'desc': '5+ tips to baristas'},
-        {'key': 'kind_critic', 'name': 'Kind Critic', 'earned': critic, 'desc': '5+ reviews with 4★ or more'},
-    ]
-
-
-def _compute_weekly_mission(user: User):
-    # Mission: 3 tips this week
-    now = datetime.utcnow()
-    start_week = now - timedelta(days=now.weekday())
-    start_week = datetime(start_week.year, start_week.month, start_week.day)
-    count = Tip.query.filter_by(user_id=user.id).filter(Tip.created_at >= start_week).count()
-    goal = 3
-    return {
-        'title': 'Give 3 tips this week',
-        'progress': min(count, goal),
-        'goal': goal,
-        'completed': count >= goal,
-        'start': start_week,
-    }
-
-
 @auth_bp.route("/me/summary")
 def summary():
     user = current_user if current_user.is_authenticated else device_util.get_or_create_guest_user()
-    tips = Tip.query.filter_by(user_id=user.id).order_by(Tip.created_at.asc()).all()
-    reviews = Review.query.filter_by(user_id=user.id).all()
+    stats = get_user_stats(user.id)
+    total = stats["total"].get("")
 
-    total_count = len(tips)
-    total_cents = sum(int(t.amount_cents or 0) for t in tips)
+    total_count = total.tips_count if total else 0
+    total_cents = int(total.tips_cents) if total else 0
     avg_cents = int(total_cents / total_count) if total_count else 0
 
     # Top restaurantes por monto
-    by_rest = {}
-    for t in tips:
-        by_rest.setdefault(t.restaurant_id, 0)
-        by_rest[t.restaurant_id] += int(t.amount_cents or 0)
+    by_rest = {int(k): int(row.tips_cents) for k, row in stats["restaurant"].items() if row.tips_count}
     top_rest = []
     if by_rest:
-        rest_map = {r.id: r for r in Restaurant.query.filter(Restaurant.id.in_(by_rest.keys())).all()}
-        top_rest = sorted(((rest_map.get(rid), amt) for rid, amt in by_rest.items() if rest_map.get(rid)), key=lambda x: x[1], reverse=True)[:5]
+        top_ids = sorted(by_rest, key=by_rest.get, reverse=True)[:5]
+        rest_map = {r.id: r for r in Restaurant.query.filter(Restaurant.id.in_(top_ids)).all()}
+        top_rest = [(rest_map[rid], by_rest[rid]) for rid in top_ids if rid in rest_map]
 
     # Métodos más usados
-    by_method = {}
-    for t in tips:
-        key = t.method_ui or 'otro'
-        by_method[key] = by_method.get(key, 0) + 1
+    by_method = {k: row.tips_count for k, row in stats["method"].items()}
 
     # Línea de tiempo mensual (últimos 12 meses)
     timeline = []
-    if tips:
-        end = datetime.utcnow().replace(day=1)
-        months = []
-        y, m = end.year, end.month
+    if total_count:
+        y, m = datetime.utcnow().year, datetime.utcnow().month
+        labels = []
         for _ in range(12):
-            months.append((y, m))
+            labels.append(f"{y}-{m:02d}")
             m -= 1
             if m == 0:
                 m = 12
                 y -= 1
-        months = list(reversed(months))
-        for (y, m) in months:
-            start = datetime(y, m, 1)
-            nxt = datetime(y+1, 1, 1) if m == 12 else datetime(y, m+1, 1)
-            amt = sum(int(t.amount_cents or 0) for t in tips if start <= t.created_at < nxt)
-            timeline.append({'label': f"{y}-{m:02d}", 'amount_cents': amt})
+        for label in reversed(labels):
+            row = stats["month"].get(label)
+            timeline.append({'label': label, 'amount_cents': int(row.tips_cents) if row else 0})
 
     return render_template(
         "auth/summary.html",
@@ -261,7 +193,7 @@ def summary():
         top_rest=top_rest,
         by_method=by_method,
         timeline=timeline,
-        reviews_count=len(reviews),
+        reviews_count=total.reviews_count if total else 0,
     )
 
 
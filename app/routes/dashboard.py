@@ -2,11 +2,11 @@ from __future__ import annotations
 
 from datetime import datetime, timedelta, date
 from collections import defaultdict
-import secrets
-import string
+import json
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash, abort, Response
+from flask import Blueprint, render_template, request, redirect, url_for, flash, abort, Response, jsonify, session
 from sqlalchemy import func
+from sqlalchemy.orm import selectinload
 from flask_login import login_required, current_user
 
 from ..extensions import db
@@ -18,74 +18,42 @@ from ..models import (
     Membership,
     Transfer,
     Coupon,
+    CouponCampaign,
+    ImportJob,
+    PoolRun,
     User,
 )
-from ..services.image_service import process_and_save_image
+from ..services.upload_service import save_uploaded_image
+from ..services.campaign_service import claim_resume, is_stalled, start_campaign
+from ..services.chain_service import ADMIN_ROLES, admin_restaurants, chain_overview
+from ..services.payout_service import pay_staff, payout_rows, pending_for_staff, run_payouts
+from ..services.pool_service import (
+    POOL_RULES,
+    allocate_pool,
+    parse_role_weights,
+    pool_share_since,
+    role_weights,
+    save_shifts,
+    unallocated_pool,
+    week_shifts,
+)
+from ..services.staff_service import create_import_job, ensure_staff_login, parse_import, start_import
 from ..services.reward_service import add_xp, get_tier_progress
-from ..utils.security import hash_password
+from ..utils.security import HashingBusy
 
 
 dashboard_bp = Blueprint("dashboard", __name__, url_prefix="/dashboard")
 
 
-def _generate_random_password(length: int = 10) -> str:
-    alphabet = string.ascii_letters + string.digits
-    return "".join(secrets.choice(alphabet) for _ in range(length))
-
-
-def _generate_staff_email(name: str, restaurant: Restaurant) -> str:
-    base = (name or "staff").lower()
-    cleaned = []
-    for ch in base:
-        if ch.isalnum():
-            cleaned.append(ch)
-        elif ch in (" ", ".", "_", "-"):
-            cleaned.append(".")
-    base_name = "".join(cleaned).strip(".") or "staff"
-    # Use a syntactically valid domain so that WTForms Email() validator accepts it
-    domain = "example.com"
-    base_email = f"{restaurant.slug}.{base_name}@{domain}"
-    email = base_email
-    idx = 1
-    while User.query.filter_by(email=email).first() is not None:
-        email = f"{restaurant.slug}.{base_name}{idx}@{domain}"
-        idx += 1
-    return email
-
-
-def _ensure_staff_login(staff: Staff, restaurant: Restaurant) -> None:
-    if staff.user_id:
-        # Ensure legacy generated emails with old domains are migrated to a valid one
-        if staff.user and staff.user.email and staff.user.email.endswith("@staff.local"):
-            staff.user.email = _generate_staff_email(staff.name, restaurant)
-            db.session.add(staff.user)
-        return
-    email = _generate_staff_email(staff.name, restaurant)
-    raw_password = _generate_random_password()
-    user = User(email=email, name=staff.name, password_hash=hash_password(raw_password))
-    db.session.add(user)
-    db.session.flush()
-    staff.user_id = user.id
-    staff.login_initial_password = raw_password
-    db.session.add(staff)
-    existing = (
-        Membership.query.filter_by(user_id=user.id, restaurant_id=restaurant.id, role="staff")
-        .order_by(Membership.id.asc())
-        .first()
-    )
-    if not existing:
-        db.session.add(Membership(user_id=user.id, restaurant_id=restaurant.id, role="staff"))
-
-
 def _require_admin_restaurant() -> Restaurant:
     if not current_user.is_authenticated:
         abort(401)
-    m = (
-        Membership.query
-        .filter(Membership.user_id == current_user.id, Membership.role.in_(("admin", "manager")))
-        .order_by(Membership.id.asc())
-        .first()
-    )
+    q = Membership.query.filter(Membership.user_id == current_user.id, Membership.role.in_(ADMIN_ROLES))
+    # Local elegido en el selector; si ya no lo administra, el primero
+    venue_id = session.get("venue_id")
+    m = q.filter(Membership.restaurant_id == venue_id).first() if venue_id else None
+    if not m:
+        m = q.order_by(Membership.id.asc()).first()
     if not m:
         flash("You don't have admin access", "danger")
         abort(403)
@@ -134,13 +102,6 @@ def _sum_tips_q(q):
     return total
 
 
-def _sum_amounts(rows):
-    total = 0
-    for row in rows:
-        total += int(getattr(row, "amount_cents", 0) or 0)
-    return total
-
-
 def _pct_change(current: int, previous: int) -> int:
     if previous <= 0:
         return 100 if current > 0 else 0
@@ -167,12 +128,6 @@ def _totals_by_day(rows, start: datetime, days: int):
     return totals
 
 
-def _pending_balance_for_staff(restaurant_id: int, staff_id: int) -> int:
-    total = _sum_amounts(Tip.query.filter_by(restaurant_id=restaurant_id, staff_id=staff_id).all())
-    sent = _sum_amounts(Transfer.query.filter_by(restaurant_id=restaurant_id, staff_id=staff_id).all())
-    return max(0, total - sent)
-
-
 def _build_restaurant_dashboard_context(r: Restaurant, review_range: str = "week"):
     now = datetime.utcnow()
     start_today = datetime(now.year, now.month, now.day)
@@ -249,7 +204,7 @@ def _build_restaurant_dashboard_context(r: Restaurant, review_range: str = "week
     recent_reviews_q = Review.query.filter_by(restaurant_id=r.id)
     if review_start:
         recent_reviews_q = recent_reviews_q.filter(Review.created_at >= review_start)
-    recent_reviews = recent_reviews_q.order_by(Review.created_at.desc()).limit(12).all()
+    recent_reviews = recent_reviews_q.options(selectinload(Review.media)).order_by(Review.created_at.desc()).limit(12).all()
 
     today_label = now.strftime("%Y-%m-%d")
 
@@ -276,7 +231,7 @@ def _build_restaurant_dashboard_context(r: Restaurant, review_range: str = "week
 
 def _build_staff_dashboard_context(r: Restaurant, s: Staff, review_range: str = "week"):
     ctx = _build_restaurant_dashboard_context(r, review_range)
-    pending_balance = _pending_balance_for_staff(r.id, s.id)
+    pending_balance = pending_for_staff(r.id, s.id)
 
     user = s.user
     current_tier = None
@@ -304,24 +259,54 @@ def restaurant_view():
     return render_template(
         "dashboard/restaurant.html",
         restaurant=r,
+        venues=admin_restaurants(current_user.id),
         **ctx,
     )
 
 
+@dashboard_bp.route("/venue", methods=["POST"])
+@login_required
+def switch_venue():
+    target = request.form.get("restaurant_id", "")
+    if target == "all":
+        return redirect(url_for("dashboard.chain_view"))
+    venue_ids = {r.id for r in admin_restaurants(current_user.id)}
+    try:
+        venue_id = int(target)
+    except ValueError:
+        venue_id = None
+    if venue_id not in venue_ids:
+        abort(403)
+    session["venue_id"] = venue_id
+    return redirect(url_for("dashboard.restaurant_view"))
+
+
+@dashboard_bp.route("/chain")
+@login_required
+def chain_view():
+    venues = admin_restaurants(current_user.id)
+    if not venues:
+        flash("You don't have admin access", "danger")
+        abort(403)
+    ctx = chain_overview(venues)
+    return render_template("dashboard/chain.html", venues=venues, **ctx)
+
+
 @dashboard_bp.route("/restaurant/logo", methods=["POST"]) 
 @login_required
 def restaurant_logo():
     r = _require_admin_restaurant()
-    file = request.files.get("logo")
-    if not file:
-        flash("Select an image", "danger")
-        return redirect(url_for("dashboard.restaurant_view"))
     try:
-        url, _, _ = process_and_save_image(file)
+        saved = save_uploaded_image("logo")
     except ValueError as e:
         flash(str(e), "danger")
         return redirect(url_for("dashboard.restaurant_view"))
-    r.logo_url = url
+    if not saved:
+        flash("Select an image", "danger")
+        return redirect(url_for("dashboard.restaurant_view"))
+    r.logo_url = saved.url
+    r.logo_placeholder = saved.placeholder
+    r.logo_color = saved.color
     db.session.add(r)
     db.session.commit()
     flash("Logo updated", "success")
@@ -333,6 +318,8 @@ def restaurant_logo():
 def restaurant_logo_delete():
     r = _require_admin_restaurant()
     r.logo_url = None
+    r.logo_placeholder = None
+    r.logo_color = None
     db.session.add(r)
     db.session.commit()
     flash("Logo removed", "info")
@@ -344,46 +331,150 @@ def restaurant_logo_delete():
 def payouts_view():
     r = _require_admin_restaurant()
 
-    # Compute pending per staff
-    totals_by_staff: dict[int, int] = defaultdict(int)
-    for t in Tip.query.filter_by(restaurant_id=r.id).all():
-        if t.staff_id:
-            totals_by_staff[t.staff_id] += int(t.amount_cents or 0)
-    sent_by_staff: dict[int, int] = defaultdict(int)
-    for tr in Transfer.query.filter_by(restaurant_id=r.id).all():
-        if tr.staff_id:
-            sent_by_staff[tr.staff_id] += int(tr.amount_cents or 0)
-
-    staff_all = Staff.query.filter_by(restaurant_id=r.id, active=True).order_by(Staff.name.asc()).all()
-    rows = []
-    for s in staff_all:
-        pending = totals_by_staff.get(s.id, 0) - sent_by_staff.get(s.id, 0)
-        rows.append((s, max(0, pending)))
-
     if request.method == "POST":
         staff_id = request.form.get("staff_id", type=int)
-        if staff_id:
-            pending_map = {s.id: total for s, total in rows}
-            amt = pending_map.get(staff_id, 0)
-            if amt > 0:
-                tr = Transfer(restaurant_id=r.id, staff_id=staff_id, amount_cents=amt, status="sent")
-                db.session.add(tr)
-                db.session.commit()
-                flash("Transfer created", "success")
-            else:
-                flash("Nothing pending for this staff", "info")
+        if staff_id and pay_staff(r.id, staff_id):
+            db.session.commit()
+            flash("Transfer created", "success")
+        elif staff_id:
+            flash("Nothing pending for this staff", "info")
         return redirect(url_for("dashboard.payouts_view"))
 
-    transfers = Transfer.query.filter_by(restaurant_id=r.id).order_by(Transfer.created_at.desc()).limit(20).all()
+    rows = payout_rows(r.id)
+    transfers = (
+        Transfer.query.options(selectinload(Transfer.staff_ref))
+        .filter_by(restaurant_id=r.id)
+        .order_by(Transfer.created_at.desc())
+        .limit(20)
+        .all()
+    )
     return render_template("dashboard/payouts.html", restaurant=r, rows=rows, transfers=transfers)
 
 
+@dashboard_bp.route("/payouts/run", methods=["POST"])
+@login_required
+def payouts_run():
+    r = _require_admin_restaurant()
+    count, cents = run_payouts(r.id)
+    if count:
+        flash(f"{count} transfers created (${cents / 100:.2f})", "success")
+    else:
+        flash("Nothing pending", "info")
+    return redirect(url_for("dashboard.payouts_view"))
+
+
+@dashboard_bp.route("/pool")
+@login_required
+def pool_view():
+    r = _require_admin_restaurant()
+    try:
+        week_start = date.fromisoformat(request.args.get("week", ""))
+    except ValueError:
+        week_start = datetime.utcnow().date()
+    week_start -= timedelta(days=week_start.weekday())
+    days = [week_start + timedelta(days=i) for i in range(7)]
+    staff_all = Staff.query.filter_by(restaurant_id=r.id, active=True).order_by(Staff.name.asc()).all()
+    unallocated_count, unallocated_cents = unallocated_pool(r.id)
+    runs = PoolRun.query.filter_by(restaurant_id=r.id).order_by(PoolRun.created_at.desc()).limit(10).all()
+    return render_template(
+        "dashboard/pool.html",
+        restaurant=r,
+        staff_all=staff_all,
+        days=days,
+        week_start=week_start,
+        prev_week=week_start - timedelta(days=7),
+        next_week=week_start + timedelta(days=7),
+        shifts=week_shifts(r.id, week_start),
+        role_weights=role_weights(r),
+        unallocated_count=unallocated_count,
+        unallocated_cents=unallocated_cents,
+        runs=runs,
+    )
+
+
+@dashboard_bp.route("/pool/settings", methods=["POST"])
+@login_required
+def pool_settings():
+    r = _require_admin_restaurant()
+    rule = request.form.get("rule", "equal")
+    try:
+        if rule not in POOL_RULES:
+            raise ValueError("Unknown pooling rule")
+        weights = parse_role_weights(request.form.get("role_weights", ""))
+    except ValueError as e:
+        flash(str(e), "danger")
+        return redirect(url_for("dashboard.pool_view"))
+    r.pool_rule = rule
+    r.pool_role_weights = weights
+    db.session.commit()
+    flash("Pooling rule saved", "success")
+    return redirect(url_for("dashboard.pool_view"))
+
+
+@dashboard_bp.route("/pool/hours", methods=["POST"])
+@login_required
+def pool_hours():
+    r = _require_admin_restaurant()
+    staff_ids = {sid for (sid,) in db.session.query(Staff.id).filter_by(restaurant_id=r.id)}
+    hours = {}
+    # Campos hours-<staff_id>-<YYYY-MM-DD>
+    for key, value in request.form.items():
+        if not key.startswith("hours-") or value.strip() == "":
+            continue
+        try:
+            _, sid, day = key.split("-", 2)
+            sid, day, value = int(sid), date.fromisoformat(day), float(value)
+        except ValueError:
+            flash("Invalid hours", "danger")
+            return redirect(url_for("dashboard.pool_view"))
+        if sid in staff_ids and 0 <= value <= 24:
+            hours[(sid, day)] = value
+    save_shifts(r.id, hours)
+    db.session.commit()
+    flash("Hours saved", "success")
+    return redirect(url_for("dashboard.pool_view", week=request.form.get("week")))
+
+
+@dashboard_bp.route("/pool/allocate", methods=["POST"])
+@login_required
+def pool_allocate():
+    r = _require_admin_restaurant()
+    try:
+        run = allocate_pool(r)
+    except ValueError as e:
+        flash(str(e), "danger")
+        return redirect(url_for("dashboard.pool_view"))
+    if run:
+        flash(f"Allocated ${run.total_cents / 100:.2f} from {run.tips_count} pooled tips", "success")
+    else:
+        flash("No pooled tips to allocate", "info")
+    return redirect(url_for("dashboard.pool_view"))
+
+
 @dashboard_bp.route("/coupons")
 @login_required
 def coupons_manage():
     r = _require_admin_restaurant()
     coupons = Coupon.query.filter_by(restaurant_id=r.id).order_by(Coupon.created_at.desc()).all()
-    return render_template("dashboard/coupons.html", restaurant=r, coupons=coupons)
+    campaigns = (
+        CouponCampaign.query.join(Coupon)
+        .filter(Coupon.restaurant_id == r.id)
+        .order_by(CouponCampaign.created_at.desc())
+        .limit(10)
+        .all()
+    )
+    return render_template("dashboard/coupons.html", restaurant=r, coupons=coupons, campaigns=campaigns, is_stalled=is_stalled)
+
+
+def _parse_expiry(raw: str | None):
+    # Fecha del formulario (YYYY-MM-DD): el cupón vale hasta el final de ese día
+    raw = (raw or "").strip()
+    if not raw:
+        return None
+    try:
+        return datetime.strptime(raw, "%Y-%m-%d").replace(hour=23, minute=59, second=59)
+    except ValueError:
+        raise ValueError("Invalid expiry date")
 
 
 @dashboard_bp.route("/coupons/create", methods=["POST"]) 
@@ -397,7 +488,12 @@ def coupons_create():
     if not title:
         flash("Title required", "danger")
         return redirect(url_for("dashboard.coupons_manage"))
-    c = Coupon(restaurant_id=r.id, title=title, description=description, required_xp=required_xp, active=active)
+    try:
+        expires_at = _parse_expiry(request.form.get("expires_at"))
+    except ValueError as e:
+        flash(str(e), "danger")
+        return redirect(url_for("dashboard.coupons_manage"))
+    c = Coupon(restaurant_id=r.id, title=title, description=description, required_xp=required_xp, active=active, expires_at=expires_at)
     db.session.add(c)
     db.session.commit()
     flash("Coupon created", "success")
@@ -412,12 +508,55 @@ def coupons_update(coupon_id: int):
     c.title = (request.form.get("title") or c.title).strip()
     c.description = (request.form.get("description") or "").strip() or None
     c.active = True if request.form.get("active") else False
+    try:
+        c.expires_at = _parse_expiry(request.form.get("expires_at"))
+    except ValueError as e:
+        flash(str(e), "danger")
+        return redirect(url_for("dashboard.coupons_manage"))
     db.session.add(c)
     db.session.commit()
     flash("Coupon updated", "success")
     return redirect(url_for("dashboard.coupons_manage"))
 
 
+@dashboard_bp.route("/coupons/<int:coupon_id>/campaign", methods=["POST"])
+@login_required
+def coupons_campaign(coupon_id: int):
+    r = _require_admin_restaurant()
+    c = Coupon.query.filter_by(id=coupon_id, restaurant_id=r.id).first_or_404()
+    if not c.active or (c.expires_at and c.expires_at <= datetime.utcnow()):
+        flash("Coupon is inactive or expired", "danger")
+        return redirect(url_for("dashboard.coupons_manage"))
+    campaign = CouponCampaign(
+        coupon_id=c.id,
+        min_xp=max(0, request.form.get("min_xp", type=int) or 0),
+        tipped_here=bool(request.form.get("tipped_here")),
+        created_by_user_id=current_user.id,
+    )
+    db.session.add(campaign)
+    db.session.commit()
+    start_campaign(campaign.id)
+    flash("Campaign started; codes are being issued in the background", "success")
+    return redirect(url_for("dashboard.coupons_manage"))
+
+
+@dashboard_bp.route("/coupons/campaigns/<int:campaign_id>/resume", methods=["POST"])
+@login_required
+def coupons_campaign_resume(campaign_id: int):
+    r = _require_admin_restaurant()
+    campaign = (
+        CouponCampaign.query.join(Coupon)
+        .filter(CouponCampaign.id == campaign_id, Coupon.restaurant_id == r.id)
+        .first_or_404()
+    )
+    if not claim_resume(campaign.id):
+        flash("Campaign is still running", "warning")
+        return redirect(url_for("dashboard.coupons_manage"))
+    start_campaign(campaign.id)
+    flash("Campaign resumed from where it stopped", "success")
+    return redirect(url_for("dashboard.coupons_manage"))
+
+
 @dashboard_bp.route("/coupons/<int:coupon_id>/delete", methods=["POST"]) 
 @login_required
 def coupons_delete(coupon_id: int):
@@ -514,11 +653,18 @@ def staff_breakdown():
         })
     earnings_list.sort(key=lambda item: item["tips_total"], reverse=True)
 
-    reviews_week_staff = Review.query.filter_by(restaurant_id=r.id, staff_id=s.id).filter(Review.created_at >= start_week).order_by(Review.created_at.desc()).all()
+    reviews_week_staff = (
+        Review.query.filter_by(restaurant_id=r.id, staff_id=s.id)
+        .filter(Review.created_at >= start_week)
+        .options(selectinload(Review.media))
+        .order_by(Review.created_at.desc())
+        .all()
+    )
     rating_avg_week, _ = _avg_rating(reviews_week_staff)
     recent_feedback = reviews_week_staff[:12]
 
     direct_week = totals_by_staff.get(s.id, 0)
+    pool_share_week = pool_share_since(r.id, s.id, start_week)
     today_label = now.strftime("%Y-%m-%d")
     message = f"Keep it up, {s.name}, you're on track for top performer this month."
 
@@ -528,6 +674,7 @@ def staff_breakdown():
         staff=s,
         pooled_week=pooled_week,
         direct_week=direct_week,
+        pool_share_week=pool_share_week,
         rating_avg_week=rating_avg_week,
         earnings_list=earnings_list,
         recent_feedback=recent_feedback,
@@ -544,17 +691,14 @@ def staff_transfer():
         flash("No staff profile associated with this account", "info")
         return redirect(url_for("auth.profile"))
     if request.method == "POST":
-        pending = _pending_balance_for_staff(r.id, s.id)
-        if pending <= 0:
+        if not pay_staff(r.id, s.id):
             flash("No pending balance to transfer", "info")
             return redirect(url_for("dashboard.staff_transfer"))
-        tr = Transfer(restaurant_id=r.id, staff_id=s.id, amount_cents=pending, status="sent", created_at=datetime.utcnow())
-        db.session.add(tr)
         add_xp(current_user, 10)
         db.session.commit()
         return redirect(url_for("dashboard.transfer_complete"))
 
-    pending_balance = _pending_balance_for_staff(r.id, s.id)
+    pending_balance = pending_for_staff(r.id, s.id)
     return render_template(
         "dashboard/transfer.html",
         restaurant=r,
@@ -583,16 +727,17 @@ def transfer_complete():
 @dashboard_bp.route("/me/avatar", methods=["POST"])
 @login_required
 def update_profile_avatar():
-    file = request.files.get("avatar")
-    if not file or not (file.filename or "").strip():
-        flash("Select an image", "danger")
-        return redirect(request.referrer or url_for("auth.profile"))
     try:
-        url, _, _ = process_and_save_image(file)
+        saved = save_uploaded_image("avatar")
     except ValueError as e:
         flash(str(e), "danger")
         return redirect(request.referrer or url_for("auth.profile"))
-    current_user.avatar_url = url
+    if not saved:
+        flash("Select an image", "danger")
+        return redirect(request.referrer or url_for("auth.profile"))
+    current_user.avatar_url = saved.url
+    current_user.avatar_placeholder = saved.placeholder
+    current_user.avatar_color = saved.color
     db.session.add(current_user)
     db.session.commit()
     flash("Profile photo updated", "success")
@@ -606,17 +751,18 @@ def staff_avatar_update():
     if not s or not r:
         flash("No staff profile associated with this account", "info")
         return redirect(url_for("auth.profile"))
-    file = request.files.get("avatar")
-    if not file or not (file.filename or "").strip():
-        flash("Select an image", "danger")
-        return redirect(request.referrer or url_for("dashboard.my_staff_panel"))
     try:
-        url, _, _ = process_and_save_image(file)
+        saved = save_uploaded_image("avatar")
     except ValueError as e:
         flash(str(e), "danger")
         return redirect(request.referrer or url_for("dashboard.my_staff_panel"))
-    s.avatar_url = url
-    current_user.avatar_url = url
+    if not saved:
+        flash("Select an image", "danger")
+        return redirect(request.referrer or url_for("dashboard.my_staff_panel"))
+    for target in (s, current_user):
+        target.avatar_url = saved.url
+        target.avatar_placeholder = saved.placeholder
+        target.avatar_color = saved.color
     db.session.add(current_user)
     db.session.add(s)
     db.session.commit()
@@ -628,18 +774,13 @@ def staff_avatar_update():
 @login_required
 def staff_manage():
     r = _require_admin_restaurant()
-    staff_query = Staff.query.filter_by(restaurant_id=r.id).order_by(Staff.name.asc())
-    staff_list = staff_query.all()
-    changed = False
-    for s in staff_list:
-        before_email = s.user.email if s.user else None
-        before_user_id = s.user_id
-        _ensure_staff_login(s, r)
-        if s.user_id != before_user_id or (s.user and s.user.email != before_email):
-            changed = True
-    if changed:
-        db.session.commit()
-        staff_list = staff_query.all()
+    # Solo lectura: los logins pendientes los crea `flask staff backfill-logins`
+    staff_list = (
+        Staff.query.filter_by(restaurant_id=r.id)
+        .options(selectinload(Staff.user))
+        .order_by(Staff.name.asc())
+        .all()
+    )
     return render_template("dashboard/staff_manage.html", restaurant=r, staff_list=staff_list)
 
 
@@ -653,23 +794,77 @@ def staff_create():
     if not name:
         flash("Name required", "danger")
         return redirect(url_for("dashboard.staff_manage"))
-    avatar_file = request.files.get("avatar")
-    avatar_url = None
-    if avatar_file and (avatar_file.filename or "").strip():
-        try:
-            avatar_url, _, _ = process_and_save_image(avatar_file)
-        except ValueError as e:
-            flash(str(e), "danger")
-            return redirect(url_for("dashboard.staff_manage"))
-    s = Staff(restaurant_id=r.id, name=name, role=role, bio=bio, avatar_url=avatar_url)
+    try:
+        saved = save_uploaded_image("avatar")
+    except ValueError as e:
+        flash(str(e), "danger")
+        return redirect(url_for("dashboard.staff_manage"))
+    s = Staff(restaurant_id=r.id, name=name, role=role, bio=bio)
+    if saved:
+        s.avatar_url = saved.url
+        s.avatar_placeholder = saved.placeholder
+        s.avatar_color = saved.color
     db.session.add(s)
     db.session.flush()
-    _ensure_staff_login(s, r)
+    try:
+        ensure_staff_login(s, r)
+    except HashingBusy:
+        db.session.rollback()
+        flash("The server is busy, please try again in a moment", "warning")
+        return redirect(url_for("dashboard.staff_manage"))
     db.session.commit()
     flash("Staff member created", "success")
     return redirect(url_for("dashboard.staff_manage"))
 
 
+@dashboard_bp.route("/staff/import", methods=["POST"])
+@login_required
+def staff_import():
+    r = _require_admin_restaurant()
+    f = request.files.get("file")
+    if not f or not (f.filename or "").strip():
+        flash("Select a CSV or JSON file", "danger")
+        return redirect(url_for("dashboard.staff_manage"))
+    try:
+        rows = parse_import(f.read(), f.filename, default_restaurant=r)
+    except ValueError as e:
+        flash(str(e), "danger")
+        return redirect(url_for("dashboard.staff_manage"))
+    job = create_import_job(rows, current_user)
+    start_import(job.id)
+    return redirect(url_for("dashboard.staff_import_view", job_id=job.id))
+
+
+def _get_import_job(job_id: int) -> ImportJob:
+    _require_admin_restaurant()
+    job = ImportJob.query.get_or_404(job_id)
+    if job.created_by_user_id != current_user.id:
+        abort(404)
+    return job
+
+
+@dashboard_bp.route("/staff/import/<int:job_id>")
+@login_required
+def staff_import_view(job_id: int):
+    job = _get_import_job(job_id)
+    result = json.loads(job.result) if job.result else {}
+    return render_template("dashboard/staff_import.html", job=job, result=result)
+
+
+@dashboard_bp.route("/staff/import/<int:job_id>/status")
+@login_required
+def staff_import_status(job_id: int):
+    job = _get_import_job(job_id)
+    return jsonify({
+        "id": job.id,
+        "status": job.status,
+        "total": job.total,
+        "processed": job.processed,
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error,
+    })
+
+
 @dashboard_bp.route("/staff/<int:staff_id>/update", methods=["POST"]) 
 @login_required
 def staff_update(staff_id: int):
@@ -679,14 +874,15 @@ def staff_update(staff_id: int):
     s.role = (request.form.get("role") or "").strip() or None
     s.bio = (request.form.get("bio") or "").strip() or None
     s.active = True if request.form.get("active") else False
-    avatar_file = request.files.get("avatar")
-    if avatar_file and (avatar_file.filename or "").strip():
-        try:
-            url, _, _ = process_and_save_image(avatar_file)
-            s.avatar_url = url
-        except ValueError as e:
-            flash(str(e), "danger")
-            return redirect(url_for("dashboard.staff_manage"))
+    try:
+        saved = save_uploaded_image("avatar")
+    except ValueError as e:
+        flash(str(e), "danger")
+        return redirect(url_for("dashboard.staff_manage"))
+    if saved:
+        s.avatar_url = saved.url
+        s.avatar_placeholder = saved.placeholder
+        s.avatar_color = saved.color
     db.session.add(s)
     db.session.commit()
     flash("Staff member updated", "success")
@@ -1,4 +1,8 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, abort, jsonify
+
+from ..extensions import limiter
+from ..utils.metrics import metrics_authorized, metrics_response
+from ..utils.readiness import readiness
 
 health_bp = Blueprint("health", __name__)
 
@@ -6,3 +10,26 @@ health_bp = Blueprint("health", __name__)
 @health_bp.route("/health")
 def health():
     return jsonify({"ok": True})
+
+
+@health_bp.route("/health/live")
+@limiter.exempt
+def live():
+    # Solo que el proceso responde: no toca la BD
+    return jsonify({"ok": True})
+
+
+@health_bp.route("/health/ready")
+@limiter.exempt
+def ready():
+    readiness.ensure_started()
+    ok, payload = readiness.status()
+    return jsonify(payload), 200 if ok else 503
+
+
+@health_bp.route("/metrics")
+@limiter.exempt
+def metrics():
+    if not metrics_authorized():
+        abort(404)
+    return metrics_response()
@@ -0,0 +1,39 @@
+import os
+from datetime import datetime
+
+from flask import Blueprint, abort, current_app, render_template, send_from_directory
+from flask_login import login_required
+
+from ..utils.profiler import list_profiles, profile_breakdown, profile_dir
+from ..utils.security import is_ops_admin
+
+ops_bp = Blueprint("ops", __name__, url_prefix="/ops")
+
+
+@ops_bp.before_request
+@login_required
+def _require_ops_admin():
+    if not is_ops_admin():
+        abort(404)
+
+
+@ops_bp.route("/profiles")
+def profiles():
+    base_dir = profile_dir(current_app)
+    rows = list_profiles(base_dir)
+    for row in rows:
+        row["when"] = datetime.fromtimestamp(row["at"]).strftime("%Y-%m-%d %H:%M:%S")
+        row.update(profile_breakdown(os.path.join(base_dir, row["file"])))
+    return render_template(
+        "ops/profiles.html",
+        rows=rows,
+        rate=current_app.config.get("PROFILE_SAMPLE_RATE", 0),
+        slow_ms=current_app.config.get("PROFILE_SLOW_MS", 0),
+    )
+
+
+@ops_bp.route("/profiles/<path:name>")
+def profile_file(name):
+    if not name.endswith(".folded"):
+        abort(404)
+    return send_from_directory(profile_dir(current_app), name, mimetype="text/plain", as_attachment=True)
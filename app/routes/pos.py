@@ -0,0 +1,57 @@
+from flask import Blueprint, current_app, render_template, request, jsonify, abort
+from flask_login import current_user, login_required
+
+from ..extensions import limiter
+from ..models import Restaurant
+from ..services import coupon_service
+
+pos_bp = Blueprint("pos", __name__, url_prefix="/pos")
+
+# Códigos HTTP del canje según el estado devuelto por el servicio
+_REDEEM_STATUS = {"used": 409, "expired": 410, "inactive": 409, "wrong_venue": 403, "not_found": 404}
+
+
+def _json_abort(message: str, status: int):
+    resp = jsonify({"error": message})
+    resp.status_code = status
+    abort(resp)
+
+
+def _venues_or_401():
+    if not current_user.is_authenticated:
+        _json_abort("Authentication required", 401)
+    venues = coupon_service.pos_venue_ids(current_user)
+    if not venues:
+        _json_abort("No venue access", 403)
+    return venues
+
+
+def _code_from_request() -> str:
+    payload = request.get_json(silent=True) or {}
+    return str(payload.get("code") or request.form.get("code") or "")
+
+
+@pos_bp.route("")
+@login_required
+def pos_page():
+    venues = coupon_service.pos_venue_ids(current_user)
+    if not venues:
+        abort(403)
+    restaurants = Restaurant.query.filter(Restaurant.id.in_(venues)).order_by(Restaurant.name.asc()).all()
+    return render_template("dashboard/pos.html", restaurants=restaurants)
+
+
+@pos_bp.route("/coupons/validate", methods=["POST"])
+@limiter.limit(lambda: current_app.config.get("POS_RATELIMIT", "600 per minute"))
+def validate():
+    venues = _venues_or_401()
+    return jsonify(coupon_service.validate_code(_code_from_request(), venues))
+
+
+@pos_bp.route("/coupons/redeem", methods=["POST"])
+@limiter.limit(lambda: current_app.config.get("POS_RATELIMIT", "600 per minute"))
+def redeem():
+    venues = _venues_or_401()
+    result = coupon_service.redeem_code(_code_from_request(), venues, current_user)
+    status = 200 if result["redeemed"] else _REDEEM_STATUS.get(result["status"], 409)
+    return jsonify(result), status
@@ -1,11 +1,15 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, abort, make_response
+from flask import Blueprint, current_app, render_template, request, redirect, url_for, flash, abort, make_response, jsonify, send_from_directory
 from flask_login import current_user
+from flask_wtf.csrf import generate_csrf
 from ..extensions import db, limiter
 from ..models import Restaurant, Staff, Tip, Review
 from ..forms import TipForm, ReviewForm
 from ..services.tip_service import create_tip
 from ..services.review_service import create_review
 from ..services.reward_service import get_tier_progress
+from ..services.offline_service import build_offline_manifest
+from ..services.image_service import parse_upload_hint
+from ..services.upload_service import uploaded_file
 from ..utils import device as device_util
 
 
@@ -24,6 +28,14 @@ def home():
     )
 
 
+def _idempotency_key() -> str | None:
+    # UUID que pone el service worker en cada envío y conserva al reenviar desde la cola
+    key = (request.form.get("idempotency_key") or "").strip()
+    if not key or len(key) > 64 or not all(ch.isalnum() or ch == "-" for ch in key):
+        return None
+    return key
+
+
 def _get_restaurant_or_404(slug: str) -> Restaurant:
     r = Restaurant.query.filter_by(slug=slug).first()
     if not r:
@@ -45,7 +57,7 @@ def tip_page(restaurant_slug):
             abort(400)
         staff_id = int(form.staff_id.data) if form.staff_id.data else None
         user = current_user if current_user.is_authenticated else device_util.get_or_create_guest_user()
-        tip = create_tip(restaurant.id, staff_id, user, form.amount_cents.data, form.method_ui.data)
+        tip = create_tip(restaurant.id, staff_id, user, form.amount_cents.data, form.method_ui.data, _idempotency_key())
         resp = make_response(redirect(url_for("public.feedback_page", restaurant_slug=restaurant.slug, tip=tip.id)))
         device_util.ensure_device_cookie(resp)
         flash("Tip recorded. Thank you!", "success")
@@ -53,6 +65,33 @@ def tip_page(restaurant_slug):
     return render_template("public/tip.html", restaurant=restaurant, staff_list=staff_list, form=form)
 
 
+@public_bp.route("/r/<restaurant_slug>/offline-manifest.json")
+def offline_manifest(restaurant_slug):
+    restaurant = _get_restaurant_or_404(restaurant_slug)
+    manifest = build_offline_manifest(restaurant)
+    resp = jsonify(manifest)
+    resp.set_etag(manifest["version"])
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp.make_conditional(request)
+
+
+@public_bp.route("/r/<restaurant_slug>/csrf-token")
+def offline_csrf_token(restaurant_slug):
+    # Las páginas cacheadas por el service worker van sin token; lo pide aquí al enviar
+    resp = jsonify({"csrf_token": generate_csrf()})
+    resp.headers["Cache-Control"] = "no-store"
+    return resp
+
+
+@public_bp.route("/sw.js")
+def service_worker():
+    # Servido desde la raíz para que el scope pueda cubrir /r/
+    resp = send_from_directory(current_app.static_folder, "js/sw.js", mimetype="application/javascript", max_age=0)
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.headers["Service-Worker-Allowed"] = "/r/"
+    return resp
+
+
 @public_bp.route("/r/<restaurant_slug>/feedback", methods=["GET", "POST"])
 @limiter.limit("5 per minute", methods=["POST"])
 def feedback_page(restaurant_slug):
@@ -63,9 +102,10 @@ def feedback_page(restaurant_slug):
     form = ReviewForm()
     if form.validate_on_submit():
         user = current_user if current_user.is_authenticated else device_util.get_or_create_guest_user()
-        photo = request.files.get("photo")
         try:
-            review = create_review(restaurant.id, staff, user, form.rating.data, form.comment.data, form.share_allowed.data, photo)
+            hint = parse_upload_hint(request.form.get("photo_hint"))
+            with uploaded_file("photo") as photo:
+                review = create_review(restaurant.id, staff, user, form.rating.data, form.comment.data, form.share_allowed.data, photo, hint, _idempotency_key())
         except ValueError as e:
             flash(str(e), "danger")
             return render_template("public/feedback.html", restaurant=restaurant, tip=tip, staff=staff, form=form)
@@ -1,8 +1,10 @@
-from flask import Blueprint, current_app, send_from_directory, send_file, abort
+from flask import Blueprint, current_app, send_from_directory, send_file, abort, request, jsonify, make_response, url_for
 import os
 from io import BytesIO
 
 from ..models import ImageAsset
+from ..services import upload_service
+from ..utils.memtrace import memory_section
 
 uploads_bp = Blueprint("uploads", __name__)
 
@@ -21,7 +23,56 @@ def serve_upload(filename: str):
     path = os.path.join(uploads_dir, filename)
     if os.path.exists(path):
         return send_from_directory(uploads_dir, filename)
-    asset = ImageAsset.query.filter_by(filename=filename).first()
-    if not asset:
+    # Respaldo en BD: el binario entero pasa por memoria
+    with memory_section("serve_upload_db"):
+        asset = ImageAsset.query.filter_by(filename=filename).first()
+        if not asset:
+            abort(404)
+        return send_file(BytesIO(asset.data), mimetype=asset.content_type, download_name=filename)
+
+
+@uploads_bp.route("/uploads/chunked", methods=["POST"])
+def chunked_init():
+    payload = request.get_json(silent=True) or {}
+    try:
+        upload_id = upload_service.init_upload(str(payload.get("filename") or ""), int(payload.get("size") or 0))
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    resp = jsonify({"id": upload_id, "offset": 0, "chunk_size": upload_service.chunk_size()})
+    resp.status_code = 201
+    resp.headers["Location"] = url_for("uploads.chunked_append", upload_id=upload_id)
+    return resp
+
+
+@uploads_bp.route("/uploads/chunked/<upload_id>", methods=["GET"])
+def chunked_status(upload_id: str):
+    try:
+        offset, total = upload_service.upload_status(upload_id)
+    except upload_service.UploadNotFound:
+        abort(404)
+    resp = jsonify({"id": upload_id, "offset": offset, "size": total})
+    resp.headers["Upload-Offset"] = str(offset)
+    resp.headers["Upload-Length"] = str(total)
+    resp.headers["Cache-Control"] = "no-store"
+    return resp
+
+
+@uploads_bp.route("/uploads/chunked/<upload_id>", methods=["PATCH"])
+def chunked_append(upload_id: str):
+    offset = request.headers.get("Upload-Offset", type=int)
+    if offset is None:
+        return jsonify({"error": "Upload-Offset header required"}), 400
+    try:
+        new_offset = upload_service.append_chunk(upload_id, offset, request.stream)
+    except upload_service.UploadNotFound:
         abort(404)
-    return send_file(BytesIO(asset.data), mimetype=asset.content_type, download_name=filename)
+    except upload_service.UploadOffsetMismatch as e:
+        resp = jsonify({"error": str(e), "offset": e.offset})
+        resp.status_code = 409
+        resp.headers["Upload-Offset"] = str(e.offset)
+        return resp
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 413
+    resp = make_response("", 204)
+    resp.headers["Upload-Offset"] = str(new_offset)
+    return resp
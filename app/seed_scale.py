@@ -0,0 +1,345 @@
+"""
+Datos sintéticos a escala de producción (flask seed --scale): restaurantes,
+staff, usuarios registrados e invitados, propinas y reseñas con
+distribución realista por hora y día de la semana, transferencias y canjes
+de cupones. Las columnas se generan como arrays NumPy por bloques y se
+cargan con COPY en Postgres y executemany en SQLite.
+"""
+import csv
+import io
+import secrets
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import bindparam, func, select
+
+from .extensions import db
+from .models import Coupon, CouponRedemption, Membership, Restaurant, Review, Staff, Tip, Transfer, User
+from .services.coupon_service import redemption_code
+from .utils.security import hash_password
+from .utils.sql import dialect_name
+
+
+CHUNK = 500_000
+PASSWORD = "demo123"
+
+# Afluencia relativa por hora del día: desayuno, comida y cena
+HOUR_WEIGHTS = np.array([
+    0.2, 0.1, 0.05, 0.03, 0.03, 0.05, 0.2, 0.6, 1.2, 1.4, 1.0, 1.0,
+    1.8, 2.2, 1.6, 0.9, 0.8, 1.0, 1.6, 2.2, 2.4, 2.0, 1.2, 0.6,
+])
+# Lunes = 0: más movimiento de jueves a sábado
+WEEKDAY_WEIGHTS = np.array([0.8, 0.85, 0.9, 1.05, 1.3, 1.5, 1.15])
+METHODS = np.array(["apple_pay", "google_pay", "paypal", "card"])
+METHOD_P = np.array([0.4, 0.3, 0.1, 0.2])
+RATING_P = np.array([0.03, 0.04, 0.1, 0.3, 0.53])
+ROLES = np.array(["Barista", "Server", "Cook", "Host", "Bartender"])
+COMMENTS = np.array(["Excellent", "Very good", "Great coffee", "Friendly service", "Slow but nice", "Will come back"], dtype=object)
+COUPONS = (("Free Coffee", 100), ("2-for-1 Latte", 250), ("Free Merch", 500))
+
+
+class _Loader:
+    """Inserta columnas en bloque: COPY en Postgres, executemany del driver en SQLite."""
+
+    def __init__(self):
+        self.dialect = dialect_name()
+
+    def load(self, table, columns: dict) -> None:
+        names = list(columns)
+        values = [col.tolist() if isinstance(col, np.ndarray) else col for col in columns.values()]
+        rows = zip(*values)
+        raw = db.session.connection().connection.dbapi_connection
+        cursor = raw.cursor()
+        try:
+            if self.dialect == "postgresql":
+                buf = io.StringIO()
+                csv.writer(buf).writerows(rows)
+                buf.seek(0)
+                sql = f"COPY {table.name} ({', '.join(names)}) FROM STDIN WITH (FORMAT csv)"
+                if hasattr(cursor, "copy_expert"):
+                    cursor.copy_expert(sql, buf)
+                else:
+                    with cursor.copy(sql) as copy:
+                        copy.write(buf.getvalue())
+            elif self.dialect == "sqlite":
+                marks = ", ".join("?" * len(names))
+                cursor.executemany(f"INSERT INTO {table.name} ({', '.join(names)}) VALUES ({marks})", rows)
+            else:
+                db.session.execute(table.insert(), [dict(zip(names, row)) for row in rows])
+        finally:
+            cursor.close()
+
+
+def _datetimes(seconds: np.ndarray) -> np.ndarray:
+    """Segundos desde epoch -> 'YYYY-MM-DD HH:MM:SS.ffffff', el formato de DateTime en SQLite."""
+    text = np.datetime_as_string(seconds.astype("datetime64[s]").astype("datetime64[us]"), unit="us")
+    return np.char.replace(text, "T", " ")
+
+
+def _new_ids(model, before: int) -> np.ndarray:
+    return np.array(db.session.scalars(select(model.id).where(model.id > before).order_by(model.id)).all(), dtype=np.int64)
+
+
+def _max_id(model) -> int:
+    return int(db.session.scalar(select(func.coalesce(func.max(model.id), 0))))
+
+
+def _day_weights(start: datetime, days: int) -> np.ndarray:
+    weekdays = (np.arange(days) + start.weekday()) % 7
+    # Ligera tendencia creciente: el último día pesa ~30% más que el primero
+    weights = WEEKDAY_WEIGHTS[weekdays] * np.linspace(1.0, 1.3, days)
+    return weights / weights.sum()
+
+
+def _event_times(rng, n: int, start: datetime, days: int):
+    """Genera por bloques los instantes de `n` eventos, en orden cronológico."""
+    start_s = int((start - datetime(1970, 1, 1)).total_seconds())
+    hour_p = HOUR_WEIGHTS / HOUR_WEIGHTS.sum()
+    day_of_event = np.repeat(np.arange(days), rng.multinomial(n, _day_weights(start, days)))
+    for offset in range(0, n, CHUNK):
+        day = day_of_event[offset:offset + CHUNK]
+        secs = day * 86400 + rng.choice(24, size=day.size, p=hour_p) * 3600 + rng.integers(0, 3600, size=day.size)
+        yield np.sort(start_s + secs)
+
+
+def _hex_tokens(rng, n: int) -> list[str]:
+    raw = rng.bytes(32 * n).hex()
+    return [raw[i:i + 64] for i in range(0, 64 * n, 64)]
+
+
+def _skewed(rng, size: int, n: int) -> np.ndarray:
+    # Clientes habituales: unos pocos índices acumulan muchas visitas
+    return np.minimum((rng.random(size) ** 2.5 * n).astype(np.int64), n - 1)
+
+
+def generate(restaurants: int = 50, staff: int = 8, users: int = 20_000, guests: int = 100_000,
+             tips: int = 1_000_000, reviews: int | None = None, days: int = 365,
+             redemptions: int | None = None, seed: int | None = None, progress=None) -> dict:
+    """
+    Genera el dataset en la base de datos actual y devuelve un resumen. Es
+    aditivo: cada ejecución usa un prefijo nuevo en slugs y emails.
+    """
+    rng = np.random.default_rng(seed)
+    loader = _Loader()
+    token = secrets.token_hex(3)
+    now = datetime.utcnow().replace(microsecond=0)
+    start = (now - timedelta(days=days)).replace(hour=0, minute=0, second=0)
+    reviews = tips // 5 if reviews is None else reviews
+    redemptions = users // 2 if redemptions is None else redemptions
+    created = _datetimes(np.array([int((now - datetime(1970, 1, 1)).total_seconds())]))[0]
+    say = progress or (lambda msg: None)
+    timings = {}
+
+    def _step(name, started):
+        timings[name] = round(time.perf_counter() - started, 1)
+        say(f"  {name}: {timings[name]}s")
+
+    # Restaurantes y staff (tamaño de plantilla variable alrededor de `staff`)
+    t0 = time.perf_counter()
+    before = _max_id(Restaurant)
+    loader.load(Restaurant.__table__, {
+        "slug": [f"venue-{token}-{i}" for i in range(restaurants)],
+        "name": [f"Venue {token.upper()} {i}" for i in range(restaurants)],
+        "pool_rule": ["equal"] * restaurants,
+        "created_at": [created] * restaurants,
+    })
+    restaurant_ids = _new_ids(Restaurant, before)
+    team = np.maximum(1, rng.poisson(staff, size=restaurants))
+    staff_start = np.concatenate(([0], np.cumsum(team)[:-1]))
+    total_staff = int(team.sum())
+    staff_restaurant = np.repeat(restaurant_ids, team)
+    before = _max_id(Staff)
+    loader.load(Staff.__table__, {
+        "restaurant_id": staff_restaurant,
+        "name": [f"Staff {i}" for i in range(total_staff)],
+        "role": ROLES[rng.integers(0, ROLES.size, size=total_staff)],
+        "rating_avg": np.zeros(total_staff),
+        "tips_count": np.zeros(total_staff, dtype=np.int64),
+        "active": [True] * total_staff,
+    })
+    staff_ids = _new_ids(Staff, before)
+
+    # Usuarios: admins de cada local, registrados (misma contraseña) e invitados por dispositivo
+    password_hash = hash_password(PASSWORD)
+    before = _max_id(User)
+    emails = [f"admin-{token}-{i}@example.com" for i in range(restaurants)] + [f"user-{token}-{i}@example.com" for i in range(users)]
+    xp = np.concatenate((np.zeros(restaurants, dtype=np.int64), rng.gamma(1.5, 200, size=users).astype(np.int64)))
+    loader.load(User.__table__, {
+        "email": emails,
+        "password_hash": [password_hash] * len(emails),
+        "name": [f"Admin {i}" for i in range(restaurants)] + [f"User {i}" for i in range(users)],
+        "level": 1 + xp // 300,
+        "xp": xp,
+        "created_at": [created] * len(emails),
+    })
+    registered_ids = _new_ids(User, before)
+    admin_ids, registered_ids = registered_ids[:restaurants], registered_ids[restaurants:]
+    before = _max_id(User)
+    for offset in range(0, guests, CHUNK):
+        n = min(CHUNK, guests - offset)
+        loader.load(User.__table__, {
+            "device_id_hash": _hex_tokens(rng, n),
+            "name": ["Guest"] * n,
+            "level": np.ones(n, dtype=np.int64),
+            "xp": np.zeros(n, dtype=np.int64),
+            "created_at": [created] * n,
+        })
+    guest_ids = _new_ids(User, before)
+    loader.load(Membership.__table__, {
+        "user_id": admin_ids,
+        "restaurant_id": restaurant_ids,
+        "role": ["admin"] * restaurants,
+    })
+    db.session.commit()
+    _step("venues, staff and users", t0)
+
+    # Popularidad de los locales tipo Zipf
+    popularity = 1.0 / np.arange(1, restaurants + 1) ** 0.8
+    popularity = rng.permutation(popularity / popularity.sum())
+
+    def _people(n):
+        r = rng.choice(restaurants, size=n, p=popularity)
+        s = staff_start[r] + (rng.random(n) * team[r]).astype(np.int64)
+        who = rng.random(n)
+        user_id = np.where(
+            who < 0.3,
+            registered_ids[_skewed(rng, n, registered_ids.size)] if registered_ids.size else 0,
+            guest_ids[_skewed(rng, n, guest_ids.size)] if guest_ids.size else 0,
+        )
+        user_id = [int(u) if u else None for u in user_id.tolist()]
+        return r, s, user_id
+
+    # Propinas: importe log-normal redondeado a 50 céntimos; 10% al bote (sin staff)
+    t0 = time.perf_counter()
+    tips_by_staff = np.zeros(total_staff, dtype=np.int64)
+    cents_by_staff = np.zeros(total_staff, dtype=np.int64)
+    loaded = 0
+    for when in _event_times(rng, tips, start, days):
+        n = when.size
+        r, s, user_id = _people(n)
+        amount = np.clip(np.round(np.exp(rng.normal(np.log(450), 0.6, size=n)) / 50) * 50, 100, 50000).astype(np.int64)
+        pooled = rng.random(n) < 0.1
+        tips_by_staff += np.bincount(s[~pooled], minlength=total_staff)
+        cents_by_staff += np.bincount(s[~pooled], weights=amount[~pooled], minlength=total_staff).astype(np.int64)
+        loader.load(Tip.__table__, {
+            "restaurant_id": restaurant_ids[r],
+            "staff_id": [None if p else int(x) for p, x in zip(pooled.tolist(), staff_ids[s].tolist())],
+            "user_id": user_id,
+            "amount_cents": amount,
+            "method_ui": METHODS[rng.choice(METHODS.size, size=n, p=METHOD_P)],
+            "status": ["recorded"] * n,
+            "created_at": _datetimes(when),
+        })
+        db.session.commit()
+        loaded += n
+        say(f"  tips: {loaded:,}/{tips:,}")
+    _step("tips", t0)
+
+    t0 = time.perf_counter()
+    rating_sum = np.zeros(total_staff, dtype=np.int64)
+    rating_count = np.zeros(total_staff, dtype=np.int64)
+    for when in _event_times(rng, reviews, start, days):
+        n = when.size
+        r, s, user_id = _people(n)
+        rating = rng.choice(5, size=n, p=RATING_P) + 1
+        rating_sum += np.bincount(s, weights=rating, minlength=total_staff).astype(np.int64)
+        rating_count += np.bincount(s, minlength=total_staff)
+        comment = COMMENTS[rng.integers(0, COMMENTS.size, size=n)]
+        comment[rng.random(n) < 0.5] = None
+        loader.load(Review.__table__, {
+            "restaurant_id": restaurant_ids[r],
+            "staff_id": staff_ids[s],
+            "user_id": user_id,
+            "rating": rating,
+            "comment": comment,
+            "share_allowed": (rng.random(n) < 0.3).tolist(),
+            "created_at": _datetimes(when),
+        })
+        db.session.commit()
+    _step("reviews", t0)
+
+    # Transferencias semanales (lunes 03:00) por ~90% de lo ganado; la última aún sin conciliar
+    t0 = time.perf_counter()
+    weeks = max(1, days // 7)
+    start_s = int((start - datetime(1970, 1, 1)).total_seconds())
+    monday = start_s + ((7 - start.weekday()) % 7) * 86400 + 3 * 3600
+    week_of = np.tile(np.arange(weeks), total_staff)
+    who = np.repeat(np.arange(total_staff), weeks)
+    amount = (cents_by_staff[who] * 0.9 / weeks * rng.uniform(0.6, 1.4, size=who.size)).astype(np.int64)
+    keep = amount > 0
+    who, week_of, amount = who[keep], week_of[keep], amount[keep]
+    when = monday + week_of * 7 * 86400
+    settled = week_of < weeks - 1
+    count = int(who.size)
+    loader.load(Transfer.__table__, {
+        "restaurant_id": staff_restaurant[who],
+        "staff_id": staff_ids[who],
+        "amount_cents": amount,
+        "status": np.where(settled, "settled", "sent"),
+        "created_at": _datetimes(when),
+        "external_ref": [f"tr_seed{token}{i:010x}" for i in range(count)],
+        "reconciled_at": [str(t) if ok else None for t, ok in zip(_datetimes(when + 86400).tolist(), settled.tolist())],
+    })
+    db.session.commit()
+    _step("transfers", t0)
+
+    # Cupones por local y canjes de usuarios registrados (pares cupón-usuario únicos)
+    t0 = time.perf_counter()
+    before = _max_id(Coupon)
+    loader.load(Coupon.__table__, {
+        "restaurant_id": np.repeat(restaurant_ids, len(COUPONS)),
+        "title": [title for _ in range(restaurants) for title, _ in COUPONS],
+        "required_xp": [xp_needed for _ in range(restaurants) for _, xp_needed in COUPONS],
+        "active": [True] * (restaurants * len(COUPONS)),
+        "created_at": [created] * (restaurants * len(COUPONS)),
+    })
+    coupon_ids = _new_ids(Coupon, before)
+    redeemed = 0
+    if registered_ids.size and coupon_ids.size and redemptions:
+        pairs = np.unique(
+            rng.integers(0, coupon_ids.size, size=redemptions) * registered_ids.size
+            + _skewed(rng, redemptions, registered_ids.size)
+        )
+        coupon = coupon_ids[pairs // registered_ids.size]
+        user = registered_ids[pairs % registered_ids.size]
+        redeemed = int(pairs.size)
+        claimed_at = start_s + rng.integers(0, days * 86400, size=redeemed)
+        used = rng.random(redeemed) < 0.6
+        loader.load(CouponRedemption.__table__, {
+            "coupon_id": coupon,
+            "user_id": user,
+            "code": [redemption_code(c, u) for c, u in zip(coupon.tolist(), user.tolist())],
+            "status": np.where(used, "used", "claimed"),
+            "created_at": _datetimes(claimed_at),
+            "redeemed_at": [str(t) if ok else None for t, ok in zip(_datetimes(claimed_at + 3600).tolist(), used.tolist())],
+        })
+    db.session.commit()
+    _step("coupons", t0)
+
+    # Agregados del staff calculados con NumPy al generar: un UPDATE por lotes
+    t0 = time.perf_counter()
+    avg = np.divide(rating_sum, rating_count, out=np.zeros(total_staff), where=rating_count > 0)
+    db.session.execute(
+        Staff.__table__.update().where(Staff.__table__.c.id == bindparam("sid")).values(
+            tips_count=bindparam("n"), rating_avg=bindparam("avg")
+        ),
+        [{"sid": sid, "n": n, "avg": a} for sid, n, a in zip(staff_ids.tolist(), tips_by_staff.tolist(), avg.tolist())],
+    )
+    db.session.commit()
+    _step("staff aggregates", t0)
+
+    return {
+        "token": token,
+        "restaurants": restaurants,
+        "staff": total_staff,
+        "users": users,
+        "guests": guests,
+        "tips": tips,
+        "reviews": reviews,
+        "transfers": count,
+        "redemptions": redeemed,
+        "first_slug": f"venue-{token}-0",
+        "first_admin": f"admin-{token}-0@example.com",
+        "timings": timings,
+    }
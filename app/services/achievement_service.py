@@ -0,0 +1,198 @@
+from datetime import datetime, timedelta
+from typing import Callable, NamedTuple
+
+from sqlalchemy import func, literal, select, union_all
+
+from ..extensions import db
+from ..models import Review, Staff, Tip, UserCounter, UserStat
+from ..utils.sql import upsert_insert
+
+
+# Motor declarativo de logros y misiones. Cada evento (propina/reseña)
+# incrementa un número acotado de contadores en user_counters; el perfil
+# solo lee esas filas, nunca el histórico.
+ALL_TIME = "all"
+WEEK = "week"
+
+
+class Event(NamedTuple):
+    kind: str  # tip | review
+    user_id: int
+    restaurant_id: int
+    at: datetime
+    new_restaurant: bool = False
+    staff_role: str = ""
+    rating: int = 0
+
+
+class Counter(NamedTuple):
+    matches: Callable[[Event], bool]
+    # Filas (user_id, at) equivalentes en el histórico, para `flask stats rebuild`
+    history: Callable[[], object]
+
+
+class Goal(NamedTuple):
+    key: str
+    name: str
+    desc: str
+    counter: str
+    target: int
+    period: str = ALL_TIME
+
+
+def _tip_rows():
+    return select(Tip.user_id.label("user_id"), Tip.created_at.label("at")).where(Tip.user_id.isnot(None))
+
+
+def _review_rows():
+    return select(Review.user_id.label("user_id"), Review.created_at.label("at")).where(Review.user_id.isnot(None))
+
+
+def _first_visit_rows():
+    visits = union_all(
+        select(Tip.user_id, Tip.restaurant_id, Tip.created_at.label("at")).where(Tip.user_id.isnot(None)),
+        select(Review.user_id, Review.restaurant_id, Review.created_at.label("at")).where(Review.user_id.isnot(None)),
+    ).subquery()
+    return select(visits.c.user_id, func.min(visits.c.at).label("at")).group_by(visits.c.user_id, visits.c.restaurant_id)
+
+
+def _barista_tip_rows():
+    return _tip_rows().join(Staff, Staff.id == Tip.staff_id).where(func.lower(Staff.role).like("%barista%"))
+
+
+def _kind_review_rows():
+    return _review_rows().where(Review.rating >= 4)
+
+
+COUNTERS: dict[str, Counter] = {
+    "tips": Counter(lambda ev: ev.kind == "tip", _tip_rows),
+    "reviews": Counter(lambda ev: ev.kind == "review", _review_rows),
+    "restaurants": Counter(lambda ev: ev.new_restaurant, _first_visit_rows),
+    "barista_tips": Counter(lambda ev: ev.kind == "tip" and "barista" in ev.staff_role, _barista_tip_rows),
+    "kind_reviews": Counter(lambda ev: ev.kind == "review" and ev.rating >= 4, _kind_review_rows),
+}
+
+ACHIEVEMENTS = (
+    Goal("explorer", "Cafe Explorer", "Visit 3+ different cafés", "restaurants", 3),
+    Goal("latte_fan", "Latte Art Fan", "5+ tips to baristas", "barista_tips", 5),
+    Goal("kind_critic", "Kind Critic", "5+ reviews with 4★ or more", "kind_reviews", 5),
+    Goal("regular", "Regular", "25+ tips in total", "tips", 25),
+)
+
+MISSIONS = (
+    Goal("weekly_tips", "Give 3 tips this week", "Weekly goal", "tips", 3, WEEK),
+    Goal("weekly_reviews", "Leave 2 reviews this week", "Weekly goal", "reviews", 2, WEEK),
+)
+
+# Solo se mantienen los contadores que usa alguna definición
+_TRACKED = sorted({(g.period, g.counter) for g in ACHIEVEMENTS + MISSIONS})
+
+
+def week_key(at: datetime) -> str:
+    year, week, _ = at.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def week_start(at: datetime) -> datetime:
+    start = at - timedelta(days=at.weekday())
+    return datetime(start.year, start.month, start.day)
+
+
+def _period_key(period: str, at: datetime) -> str:
+    return week_key(at) if period == WEEK else ALL_TIME
+
+
+def _is_new_restaurant(user_id: int, restaurant_id: int) -> bool:
+    # Lectura por clave primaria de user_stats; debe hacerse antes de record_tip/record_review
+    return db.session.get(UserStat, (user_id, "restaurant", str(restaurant_id))) is None
+
+
+def tip_event(tip: Tip) -> Event:
+    staff = db.session.get(Staff, tip.staff_id) if tip.staff_id else None
+    return Event(
+        kind="tip",
+        user_id=tip.user_id,
+        restaurant_id=tip.restaurant_id,
+        at=tip.created_at or datetime.utcnow(),
+        new_restaurant=_is_new_restaurant(tip.user_id, tip.restaurant_id),
+        staff_role=(staff.role or "").lower() if staff else "",
+    )
+
+
+def review_event(review: Review) -> Event:
+    return Event(
+        kind="review",
+        user_id=review.user_id,
+        restaurant_id=review.restaurant_id,
+        at=review.created_at or datetime.utcnow(),
+        new_restaurant=_is_new_restaurant(review.user_id, review.restaurant_id),
+        rating=int(review.rating or 0),
+    )
+
+
+def record_event(ev: Event) -> list[Goal]:
+    """Incrementa los contadores afectados y devuelve los logros/misiones recién completados."""
+    if not ev.user_id:
+        return []
+    rows = [
+        {"user_id": ev.user_id, "period": _period_key(period, ev.at), "name": name, "value": 1}
+        for period, name in _TRACKED
+        if COUNTERS[name].matches(ev)
+    ]
+    if not rows:
+        return []
+    table = UserCounter.__table__
+    stmt = upsert_insert(table).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.period, table.c.name],
+        set_={"value": table.c.value + stmt.excluded.value},
+    ).returning(table.c.period, table.c.name, table.c.value)
+    values = {
+        (ALL_TIME if period == ALL_TIME else WEEK, name): value
+        for period, name, value in db.session.execute(stmt)
+    }
+    return [g for g in ACHIEVEMENTS + MISSIONS if values.get((g.period, g.counter)) == g.target]
+
+
+def user_progress(user_id: int, now: datetime | None = None) -> tuple[list[dict], list[dict]]:
+    """(logros, misiones de la semana) a partir de user_counters."""
+    now = now or datetime.utcnow()
+    current_week = week_key(now)
+    rows = UserCounter.query.filter(
+        UserCounter.user_id == user_id, UserCounter.period.in_((ALL_TIME, current_week))
+    ).all()
+    values = {(ALL_TIME if r.period == ALL_TIME else WEEK, r.name): r.value for r in rows}
+
+    def _render(goal: Goal) -> dict:
+        value = values.get((goal.period, goal.counter), 0)
+        return {
+            "key": goal.key,
+            "name": goal.name,
+            "desc": goal.desc,
+            "progress": min(value, goal.target),
+            "goal": goal.target,
+            "earned": value >= goal.target,
+        }
+
+    return [_render(g) for g in ACHIEVEMENTS], [_render(g) for g in MISSIONS]
+
+
+def rebuild_counters(user_id: int | None = None, now: datetime | None = None) -> None:
+    """Recalcula user_counters desde el histórico (todo el tiempo + semana actual)."""
+    now = now or datetime.utcnow()
+    table = UserCounter.__table__
+    delete = table.delete()
+    if user_id is not None:
+        delete = delete.where(table.c.user_id == user_id)
+    db.session.execute(delete)
+
+    start = week_start(now)
+    for period, name in _TRACKED:
+        rows = COUNTERS[name].history().subquery()
+        q = select(rows.c.user_id, literal(_period_key(period, now)), literal(name), func.count())
+        if period == WEEK:
+            q = q.where(rows.c.at >= start)
+        if user_id is not None:
+            q = q.where(rows.c.user_id == user_id)
+        q = q.group_by(rows.c.user_id)
+        db.session.execute(table.insert().from_select(["user_id", "period", "name", "value"], q))
@@ -3,7 +3,7 @@ from flask_login import login_user
 from sqlalchemy.exc import IntegrityError
 from ..extensions import db
 from ..models import User
-from ..utils.security import hash_password, verify_password
+from ..utils.security import hash_password, verify_and_update
 
 
 def register_user(email: str, password: str, name: str) -> User:
@@ -20,7 +20,14 @@ def register_user(email: str, password: str, name: str) -> User:
 
 def authenticate(email: str, password: str) -> User:
     user = User.query.filter_by(email=email.lower().strip()).first()
-    if not user or not user.password_hash or not verify_password(password, user.password_hash):
+    if not user or not user.password_hash:
         raise ValueError("Invalid credentials")
+    ok, new_hash = verify_and_update(password, user.password_hash)
+    if not ok:
+        raise ValueError("Invalid credentials")
+    if new_hash:
+        # El coste de bcrypt cambió: guardamos el hash con los parámetros actuales
+        user.password_hash = new_hash
+        db.session.commit()
     login_user(user)
     return user
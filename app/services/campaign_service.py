@@ -0,0 +1,187 @@
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, exists, or_, select, update
+
+from ..extensions import db
+from ..models import Coupon, CouponCampaign, CouponRedemption, User, UserStat
+from ..utils.background import run_in_background
+from ..utils.sql import upsert_insert
+from .coupon_service import redemption_code
+
+
+# Sin latido durante este tiempo, una campaña en curso se da por muerta
+STALE_AFTER = timedelta(minutes=10)
+
+
+def batch_size() -> int:
+    return int(current_app.config.get("COUPON_BATCH_SIZE", 2000))
+
+
+def _segment_batch(campaign: CouponCampaign, coupon: Coupon, limit: int) -> list[int]:
+    """
+    Siguiente lote de usuarios del segmento (keyset sobre users.id). Solo
+    usuarios con actividad en el restaurante del cupón (propinas, o también
+    reseñas si no se pide tipped_here): lectura por clave primaria en
+    user_stats, bucket restaurant.
+    """
+    activity = UserStat.tips_count > 0
+    if not campaign.tipped_here:
+        activity = or_(activity, UserStat.reviews_count > 0)
+    q = select(User.id).where(
+        User.id > campaign.last_user_id,
+        User.xp >= campaign.min_xp,
+        exists().where(
+            UserStat.user_id == User.id,
+            UserStat.bucket == "restaurant",
+            UserStat.key == str(coupon.restaurant_id),
+            activity,
+        ),
+    )
+    return [uid for (uid,) in db.session.execute(q.order_by(User.id.asc()).limit(limit))]
+
+
+def run_campaign(campaign_id: int, size: int | None = None) -> CouponCampaign:
+    """
+    Emite el cupón al segmento por lotes. Cada lote es un INSERT con
+    ON CONFLICT DO NOTHING en su propia transacción, así que la tabla
+    nunca queda bloqueada toda la emisión y se puede reanudar desde
+    `last_user_id` si el proceso muere.
+    """
+    size = size or batch_size()
+    campaign = db.session.get(CouponCampaign, campaign_id)
+    if not campaign:
+        raise LookupError(f"Campaign {campaign_id} not found")
+    coupon = campaign.coupon
+    now = datetime.utcnow()
+    if not coupon.active or (coupon.expires_at and coupon.expires_at <= now):
+        campaign.status = "failed"
+        campaign.error = "Coupon is inactive or expired"
+        db.session.commit()
+        return campaign
+
+    campaign.status = "running"
+    campaign.error = None
+    campaign.heartbeat_at = datetime.utcnow()
+    db.session.commit()
+    table = CouponRedemption.__table__
+    # Sentencia fija + executemany: se compila una vez y el driver la agrupa
+    # en INSERTs multi-fila (insertmanyvalues); RETURNING cuenta las emitidas
+    stmt = (
+        upsert_insert(table)
+        .on_conflict_do_nothing(index_elements=[table.c.coupon_id, table.c.user_id])
+        .returning(table.c.id)
+    )
+    try:
+        while True:
+            user_ids = _segment_batch(campaign, coupon, size)
+            if not user_ids:
+                break
+            rows = [
+                {"coupon_id": coupon.id, "user_id": uid, "code": redemption_code(coupon.id, uid), "status": "claimed", "created_at": now}
+                for uid in user_ids
+            ]
+            campaign.issued_count += len(db.session.execute(stmt, rows).all())
+            campaign.last_user_id = user_ids[-1]
+            campaign.heartbeat_at = datetime.utcnow()
+            db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        campaign.status = "failed"
+        campaign.error = str(e)[:500]
+        db.session.commit()
+        raise
+    campaign.status = "done"
+    campaign.finished_at = datetime.utcnow()
+    db.session.commit()
+    return campaign
+
+
+def start_campaign(campaign_id: int) -> None:
+    """Lanza la emisión en segundo plano."""
+    run_in_background(f"campaign-{campaign_id}", run_campaign, campaign_id)
+
+
+def _stalled(now: datetime):
+    # pending/running sin latido reciente (el hilo murió con el proceso o nunca arrancó)
+    cutoff = now - STALE_AFTER
+    return and_(
+        CouponCampaign.status.in_(("pending", "running")),
+        or_(
+            CouponCampaign.heartbeat_at < cutoff,
+            and_(CouponCampaign.heartbeat_at.is_(None), CouponCampaign.created_at < cutoff),
+        ),
+    )
+
+
+def is_stalled(campaign: CouponCampaign, now: datetime | None = None) -> bool:
+    cutoff = (now or datetime.utcnow()) - STALE_AFTER
+    return campaign.status in ("pending", "running") and (campaign.heartbeat_at or campaign.created_at) < cutoff
+
+
+def claim_resume(campaign_id: int) -> bool:
+    """
+    Reserva una campaña fallida o parada para reanudarla (UPDATE
+    condicional): si dos procesos lo intentan a la vez, solo uno gana.
+    """
+    now = datetime.utcnow()
+    result = db.session.execute(
+        update(CouponCampaign)
+        .where(CouponCampaign.id == campaign_id, or_(CouponCampaign.status == "failed", _stalled(now)))
+        .values(status="pending", heartbeat_at=now),
+        execution_options={"synchronize_session": False},
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def resume_stalled(size: int | None = None) -> list[CouponCampaign]:
+    """Reanuda desde last_user_id las campañas paradas (pensado para cron)."""
+    ids = [cid for (cid,) in db.session.execute(select(CouponCampaign.id).where(_stalled(datetime.utcnow())))]
+    resumed = []
+    for cid in ids:
+        if not claim_resume(cid):
+            continue
+        try:
+            resumed.append(run_campaign(cid, size))
+        except Exception:
+            # run_campaign ya la dejó en failed con el error; se sigue con las demás
+            current_app.logger.exception("Campaign %s failed while resuming", cid)
+    return resumed
+
+
+def expire_claimed(size: int | None = None, now: datetime | None = None) -> int:
+    """
+    Pasa a `expired` los códigos reclamados de cupones caducados. Recorre
+    cada cupón por el índice (coupon_id, status, id) en trozos ordenados
+    por id, con un commit por trozo.
+    """
+    size = size or batch_size()
+    now = now or datetime.utcnow()
+    coupon_ids = [cid for (cid,) in db.session.query(Coupon.id).filter(Coupon.expires_at <= now)]
+    total = 0
+    for coupon_id in coupon_ids:
+        last_id = 0
+        while True:
+            ids = [
+                rid for (rid,) in db.session.query(CouponRedemption.id)
+                .filter(
+                    CouponRedemption.coupon_id == coupon_id,
+                    CouponRedemption.status == "claimed",
+                    CouponRedemption.id > last_id,
+                )
+                .order_by(CouponRedemption.id.asc())
+                .limit(size)
+            ]
+            if not ids:
+                break
+            result = db.session.execute(
+                update(CouponRedemption)
+                .where(CouponRedemption.id.in_(ids), CouponRedemption.status == "claimed")
+                .values(status="expired"),
+                execution_options={"synchronize_session": False},
+            )
+            db.session.commit()
+            total += result.rowcount or 0
+            last_id = ids[-1]
+    return total
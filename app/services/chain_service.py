@@ -0,0 +1,163 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, func
+
+from ..extensions import db
+from ..models import Membership, Restaurant, Review, Staff, Tip
+from ..utils.sql import day_key
+
+
+ADMIN_ROLES = ("admin", "manager")
+
+
+def admin_restaurants(user_id: int) -> list[Restaurant]:
+    """Restaurantes que el usuario administra (admin o manager), por nombre."""
+    ids = db.session.query(Membership.restaurant_id).filter(
+        Membership.user_id == user_id, Membership.role.in_(ADMIN_ROLES)
+    )
+    return Restaurant.query.filter(Restaurant.id.in_(ids)).order_by(Restaurant.name.asc()).all()
+
+
+def _pct_change(current: int, previous: int) -> int:
+    if previous <= 0:
+        return 100 if current > 0 else 0
+    return int(round(((current - previous) / previous) * 100))
+
+
+def _sum_if(cond, value):
+    return func.coalesce(func.sum(case((cond, value), else_=0)), 0)
+
+
+def chain_overview(restaurants: list[Restaurant], top: int = 10) -> dict:
+    """
+    Resumen de varios locales con consultas agrupadas por restaurant_id
+    (propinas, valoraciones, propinas diarias de la semana y ranking de
+    staff): el número de consultas no depende de cuántos locales haya.
+    """
+    now = datetime.utcnow()
+    start_today = datetime(now.year, now.month, now.day)
+    start_yesterday = start_today - timedelta(days=1)
+    start_week = start_today - timedelta(days=start_today.weekday())
+    start_last_week = start_week - timedelta(days=7)
+    start_month = datetime(now.year, now.month, 1)
+    ids = [r.id for r in restaurants]
+
+    amount = Tip.amount_cents
+    tips = {
+        row.restaurant_id: row
+        for row in db.session.query(
+            Tip.restaurant_id,
+            _sum_if(Tip.created_at >= start_today, amount).label("today"),
+            _sum_if((Tip.created_at >= start_yesterday) & (Tip.created_at < start_today), amount).label("yesterday"),
+            _sum_if(Tip.created_at >= start_week, amount).label("week"),
+            _sum_if((Tip.created_at >= start_last_week) & (Tip.created_at < start_week), amount).label("last_week"),
+            _sum_if(Tip.created_at >= start_month, amount).label("month"),
+        )
+        .filter(Tip.restaurant_id.in_(ids))
+        .filter(Tip.created_at >= min(start_last_week, start_month))
+        .group_by(Tip.restaurant_id)
+    }
+    reviews = {
+        row.restaurant_id: row
+        for row in db.session.query(
+            Review.restaurant_id,
+            _sum_if(Review.created_at >= start_week, Review.rating).label("rating_sum"),
+            _sum_if(Review.created_at >= start_week, 1).label("week"),
+            _sum_if(Review.created_at < start_week, 1).label("last_week"),
+        )
+        .filter(Review.restaurant_id.in_(ids), Review.created_at >= start_last_week)
+        .group_by(Review.restaurant_id)
+    }
+
+    venues = []
+    totals = {"today": 0, "yesterday": 0, "week": 0, "last_week": 0, "month": 0, "rating_sum": 0, "reviews_week": 0, "reviews_last_week": 0}
+    for r in restaurants:
+        t, rv = tips.get(r.id), reviews.get(r.id)
+        row = {
+            "restaurant": r,
+            "tips_today": int(t.today) if t else 0,
+            "tips_yesterday": int(t.yesterday) if t else 0,
+            "tips_week": int(t.week) if t else 0,
+            "tips_last_week": int(t.last_week) if t else 0,
+            "tips_month": int(t.month) if t else 0,
+            "reviews_week_count": int(rv.week) if rv else 0,
+            "reviews_last_week": int(rv.last_week) if rv else 0,
+        }
+        rating_sum = int(rv.rating_sum) if rv else 0
+        row["rating_avg_week"] = rating_sum / row["reviews_week_count"] if row["reviews_week_count"] else 0.0
+        row["week_growth_pct"] = _pct_change(row["tips_week"], row["tips_last_week"])
+        venues.append(row)
+        totals["today"] += row["tips_today"]
+        totals["yesterday"] += row["tips_yesterday"]
+        totals["week"] += row["tips_week"]
+        totals["last_week"] += row["tips_last_week"]
+        totals["month"] += row["tips_month"]
+        totals["rating_sum"] += rating_sum
+        totals["reviews_week"] += row["reviews_week_count"]
+        totals["reviews_last_week"] += row["reviews_last_week"]
+    venues.sort(key=lambda v: v["tips_week"], reverse=True)
+
+    # Propinas diarias de la semana sumando todos los locales
+    day = day_key(Tip.created_at)
+    by_day = dict(
+        db.session.query(day, func.sum(Tip.amount_cents))
+        .filter(Tip.restaurant_id.in_(ids), Tip.created_at >= start_week)
+        .group_by(day)
+    )
+    week_totals = [int(by_day.get((start_week + timedelta(days=i)).strftime("%Y-%m-%d")) or 0) for i in range(7)]
+
+    return {
+        "venues_summary": venues,
+        "tips_today": totals["today"],
+        "tips_week": totals["week"],
+        "tips_month": totals["month"],
+        "tips_growth_pct": _pct_change(totals["today"], totals["yesterday"]),
+        "week_growth_pct": _pct_change(totals["week"], totals["last_week"]),
+        "rating_avg_week": totals["rating_sum"] / totals["reviews_week"] if totals["reviews_week"] else 0.0,
+        "reviews_week_count": totals["reviews_week"],
+        "reviews_delta": totals["reviews_week"] - totals["reviews_last_week"],
+        "week_labels": ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"],
+        "week_totals": week_totals,
+        "top_staff": staff_leaderboard(ids, start_week, top),
+        "today_label": now.strftime("%Y-%m-%d"),
+    }
+
+
+def staff_leaderboard(restaurant_ids: list[int], since: datetime, limit: int = 10) -> list[dict]:
+    """Ranking de staff de varios locales por propinas desde `since`, con su valoración media."""
+    tips = (
+        db.session.query(Tip.staff_id, func.sum(Tip.amount_cents).label("tips_total"))
+        .filter(Tip.restaurant_id.in_(restaurant_ids), Tip.created_at >= since, Tip.staff_id.isnot(None))
+        .group_by(Tip.staff_id)
+        .subquery()
+    )
+    ratings = (
+        db.session.query(
+            Review.staff_id,
+            func.avg(Review.rating).label("rating_avg"),
+            func.count(Review.id).label("reviews_count"),
+        )
+        .filter(Review.restaurant_id.in_(restaurant_ids), Review.created_at >= since, Review.staff_id.isnot(None))
+        .group_by(Review.staff_id)
+        .subquery()
+    )
+    rows = (
+        db.session.query(Staff, Restaurant.name, tips.c.tips_total, ratings.c.rating_avg, ratings.c.reviews_count)
+        .join(tips, tips.c.staff_id == Staff.id)
+        .join(Restaurant, Restaurant.id == Staff.restaurant_id)
+        .outerjoin(ratings, ratings.c.staff_id == Staff.id)
+        .filter(Staff.active.is_(True))
+        .order_by(tips.c.tips_total.desc(), Staff.id.asc())
+        .limit(limit)
+        .all()
+    )
+    return [
+        {
+            "staff": staff,
+            "restaurant_name": restaurant_name,
+            "tips_total": int(tips_total or 0),
+            "rating_avg": float(rating_avg or 0),
+            "reviews_count": int(reviews_count or 0),
+        }
+        for staff, restaurant_name, tips_total, rating_avg, reviews_count in rows
+    ]
@@ -0,0 +1,225 @@
+import re
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import exists, literal, or_, select, update
+
+from ..extensions import db
+from ..models import Coupon, CouponRedemption, Membership, Staff, User
+from ..utils.cache import TTLCache
+from ..utils.codes import CODE_ALPHABET, CODE_LENGTH, sequence_code
+from ..utils.sql import upsert_insert
+
+
+# Códigos inexistentes ya consultados (por proceso). Un código solo pasa a
+# existir al canjearlo en este mismo proceso o, como mucho, tras el TTL.
+negative_codes = TTLCache(ttl=60, maxsize=50000, name="coupon_negative_codes")
+# Locales en los que puede canjear cada usuario del TPV
+_venues_by_user = TTLCache(ttl=30, maxsize=5000, name="pos_venues_by_user")
+_CODE_RE = re.compile(r"^[0-9A-Z]{6,24}$")
+_CROCKFORD_FOLD = str.maketrans("OIL", "011")
+_CROCKFORD_CHARS = frozenset(CODE_ALPHABET)
+
+
+class CouponAlreadyClaimed(LookupError):
+    pass
+
+
+def redemption_code(coupon_id: int, user_id: int) -> str:
+    """
+    Código determinista por (cupón, usuario). Como ese par es único, la
+    permutación con clave garantiza que el código también lo es: no hace
+    falta buscar colisiones en la tabla.
+    """
+    key = current_app.config["SECRET_KEY"] + "|coupon-codes"
+    return sequence_code((int(coupon_id) << 32) | int(user_id), key)
+
+
+def _available():
+    now = datetime.utcnow()
+    return Coupon.query.filter(
+        Coupon.active.is_(True),
+        or_(Coupon.expires_at.is_(None), Coupon.expires_at > now),
+    )
+
+
+def eligible_coupons(user: User, restaurant_ids: list[int]) -> tuple[list[Coupon], list[Coupon]]:
+    """
+    (canjeables ahora, próximos). Ambas consultas recorren el índice
+    (restaurant_id, active, required_xp). Sin restaurantes visitados se
+    muestran los cupones activos de todos.
+    """
+    xp = int(user.xp or 0)
+    base = _available()
+    if restaurant_ids:
+        base = base.filter(Coupon.restaurant_id.in_(restaurant_ids))
+    claimed = exists().where(CouponRedemption.coupon_id == Coupon.id, CouponRedemption.user_id == user.id)
+    current = base.filter(Coupon.required_xp <= xp, ~claimed).order_by(Coupon.required_xp.asc()).all()
+    upcoming = base.filter(Coupon.required_xp > xp).order_by(Coupon.required_xp.asc()).all()
+    return current, upcoming
+
+
+def claimed_codes(user: User, limit: int = 20) -> list[tuple[CouponRedemption, Coupon]]:
+    """Códigos pendientes de usar del usuario (reclamados o emitidos por campaña)."""
+    return (
+        db.session.query(CouponRedemption, Coupon)
+        .join(Coupon, Coupon.id == CouponRedemption.coupon_id)
+        .filter(CouponRedemption.user_id == user.id, CouponRedemption.status == "claimed")
+        .order_by(CouponRedemption.id.desc())
+        .limit(limit)
+        .all()
+    )
+
+
+def claim_for_user(coupon_id: int, user: User) -> str:
+    """
+    Canje atómico: INSERT ... SELECT con las condiciones de elegibilidad y
+    ON CONFLICT (coupon_id, user_id) DO NOTHING, en un único viaje. Solo si
+    no inserta nada se consulta el motivo.
+    """
+    xp = int(user.xp or 0)
+    now = datetime.utcnow()
+    table = CouponRedemption.__table__
+    eligible = select(
+        literal(int(coupon_id)), literal(user.id), literal(redemption_code(coupon_id, user.id)),
+        literal("claimed"), literal(now),
+    ).where(
+        exists().where(
+            Coupon.id == coupon_id,
+            Coupon.active.is_(True),
+            Coupon.required_xp <= xp,
+            or_(Coupon.expires_at.is_(None), Coupon.expires_at > now),
+        )
+    )
+    stmt = upsert_insert(table).from_select(["coupon_id", "user_id", "code", "status", "created_at"], eligible)
+    stmt = stmt.on_conflict_do_nothing(index_elements=[table.c.coupon_id, table.c.user_id])
+    row = db.session.execute(stmt.returning(table.c.code)).first()
+    db.session.commit()
+    if row:
+        negative_codes.discard(row.code)
+        return row.code
+
+    if CouponRedemption.query.filter_by(coupon_id=coupon_id, user_id=user.id).first():
+        raise CouponAlreadyClaimed("This coupon has already been claimed")
+    coupon = _available().filter(Coupon.id == coupon_id).first()
+    if not coupon:
+        raise ValueError("Coupon not available")
+    raise ValueError("You haven't reached the required XP yet")
+
+
+# ---- TPV: validación y canje en mostrador ----
+
+def normalize_code(raw: str | None) -> str:
+    # Se ignoran guiones/espacios; O/I/L solo se corrigen en code_candidates
+    return re.sub(r"[\s-]", "", (raw or "").upper())
+
+
+def code_candidates(code: str) -> list[str]:
+    """
+    Códigos a buscar para lo tecleado: el literal y, si tiene la forma de
+    un código Crockford (redemption_code), la versión con O/I/L leídas
+    como 0/1. Los códigos antiguos (A-Z y 0-9) contienen esas letras y no
+    se pueden corregir sin romperlos.
+    """
+    folded = code.translate(_CROCKFORD_FOLD)
+    if folded != code and len(folded) == CODE_LENGTH and set(folded) <= _CROCKFORD_CHARS:
+        return [code, folded]
+    return [code]
+
+
+def pos_venue_ids(user: User) -> frozenset[int]:
+    """Restaurantes donde `user` trabaja (admin, manager o staff)."""
+    venues = _venues_by_user.get(user.id)
+    if venues is None:
+        ids = {rid for (rid,) in db.session.query(Membership.restaurant_id).filter(Membership.user_id == user.id)}
+        ids |= {rid for (rid,) in db.session.query(Staff.restaurant_id).filter(Staff.user_id == user.id, Staff.active.is_(True))}
+        venues = frozenset(ids)
+        _venues_by_user.set(user.id, venues)
+    return venues
+
+
+def _lookup(code: str):
+    # Si existen ambos, gana el literal
+    return db.session.execute(
+        select(
+            CouponRedemption.id, CouponRedemption.code, CouponRedemption.status, CouponRedemption.redeemed_at,
+            Coupon.restaurant_id, Coupon.title, Coupon.active, Coupon.expires_at,
+        )
+        .join(Coupon, Coupon.id == CouponRedemption.coupon_id)
+        .where(CouponRedemption.code.in_(code_candidates(code)))
+        .order_by((CouponRedemption.code == code).desc())
+        .limit(1)
+    ).first()
+
+
+def validate_code(raw: str | None, venue_ids: frozenset[int]) -> dict:
+    """
+    Estado de un código para el TPV: valid | used | expired | inactive |
+    wrong_venue | not_found. Un código reclamado cuyo cupón ha caducado
+    pasa a `expired` en ese momento.
+    """
+    code = normalize_code(raw)
+    if not _CODE_RE.match(code) or negative_codes.get(code):
+        return {"code": code, "status": "not_found"}
+    row = _lookup(code)
+    if row is None:
+        negative_codes.set(code, True)
+        return {"code": code, "status": "not_found"}
+    code = row.code
+    if row.restaurant_id not in venue_ids:
+        return {"code": code, "status": "wrong_venue"}
+
+    out = {"code": code, "title": row.title, "status": row.status}
+    if row.status == "used":
+        out["redeemed_at"] = row.redeemed_at.isoformat() if row.redeemed_at else None
+    elif row.status == "claimed":
+        if row.expires_at and row.expires_at <= datetime.utcnow():
+            db.session.execute(
+                update(CouponRedemption)
+                .where(CouponRedemption.id == row.id, CouponRedemption.status == "claimed")
+                .values(status="expired"),
+                execution_options={"synchronize_session": False},
+            )
+            db.session.commit()
+            out["status"] = "expired"
+        elif not row.active:
+            out["status"] = "inactive"
+        else:
+            out["status"] = "valid"
+    return out
+
+
+def redeem_code(raw: str | None, venue_ids: frozenset[int], user: User) -> dict:
+    """
+    Canje atómico: UPDATE condicional claimed -> used filtrado por local,
+    cupón activo y no caducado. Si no actualiza ninguna fila se devuelve
+    el motivo (status distinto de `used` con `redeemed` False).
+    """
+    code = normalize_code(raw)
+    if not venue_ids or not _CODE_RE.match(code) or negative_codes.get(code):
+        return {"code": code, "status": "not_found", "redeemed": False}
+    now = datetime.utcnow()
+    usable = select(Coupon.id).where(
+        Coupon.restaurant_id.in_(venue_ids),
+        Coupon.active.is_(True),
+        or_(Coupon.expires_at.is_(None), Coupon.expires_at > now),
+    )
+    # Primero el literal; la versión corregida solo si aquel no se canjea
+    for candidate in code_candidates(code):
+        row = db.session.execute(
+            update(CouponRedemption)
+            .where(
+                CouponRedemption.code == candidate,
+                CouponRedemption.status == "claimed",
+                CouponRedemption.coupon_id.in_(usable),
+            )
+            .values(status="used", redeemed_at=now, redeemed_by_user_id=user.id)
+            .returning(CouponRedemption.id),
+            execution_options={"synchronize_session": False},
+        ).first()
+        db.session.commit()
+        if row:
+            return {"code": candidate, "status": "used", "redeemed": True, "redeemed_at": now.isoformat()}
+    out = validate_code(code, venue_ids)
+    out["redeemed"] = False
+    return out
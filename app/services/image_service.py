@@ -1,14 +1,45 @@
+import base64
+import json
 import os
+import re
 import secrets
+import tempfile
+import time
 from io import BytesIO
+from typing import NamedTuple
 from PIL import Image
 from flask import current_app, url_for
+from itsdangerous import BadSignature, URLSafeTimedSerializer
 
 from ..extensions import db
 from ..models import ImageAsset
+from ..utils.memtrace import memory_section
+from ..utils.metrics import IMAGE_BYTES, IMAGE_SECONDS
 
 
 ALLOWED_EXTS = {"jpg", "jpeg", "png"}
+MAX_SIDE = 1600
+# Validez de la política firmada que el navegador devuelve junto a la foto
+UPLOAD_POLICY_MAX_AGE = 24 * 3600
+# Hasta este tamaño la subida se mantiene en memoria; por encima va a disco
+SPOOL_MEMORY_BYTES = 256 * 1024
+_COPY_BLOCK = 64 * 1024
+PLACEHOLDER_SIDE = 16
+# Segmentos que puede traer un JPEG/PNG de canvas sin metadatos: cualquier
+# otro (EXIF/XMP/ICC, comentarios, texto PNG...) obliga a recodificar
+_JPEG_SEGMENTS = {0xC0, 0xC1, 0xC4, 0xDB, 0xDD, 0xE0, 0xEE}
+_JPEG_SCAN_MARKER = re.compile(rb"\xff[^\x00\xd0-\xd7]")
+_PNG_CHUNKS = {b"IHDR", b"PLTE", b"IDAT", b"IEND", b"tRNS", b"sRGB", b"gAMA", b"cHRM", b"pHYs"}
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+class SavedImage(NamedTuple):
+    url: str
+    width: int
+    height: int
+    # Vista previa de ~16px como data URI y color dominante (#rrggbb)
+    placeholder: str | None = None
+    color: str | None = None
 
 
 def _secure_ext(filename: str) -> str:
@@ -16,43 +47,232 @@ def _secure_ext(filename: str) -> str:
     return ext if ext in ALLOWED_EXTS else "jpg"
 
 
-def process_and_save_image(file_storage):
+def _policy_serializer() -> URLSafeTimedSerializer:
+    return URLSafeTimedSerializer(current_app.config["SECRET_KEY"], salt="upload-policy")
+
+
+def upload_policy_token() -> str:
+    """Política firmada que el JS usa para reescalar antes de subir."""
     max_mb = int(current_app.config.get("MAX_IMAGE_MB", 2))
-    file_storage.stream.seek(0, os.SEEK_END)
-    size = file_storage.stream.tell()
-    file_storage.stream.seek(0)
-    if size > max_mb * 1024 * 1024:
-        raise ValueError("Image exceeds size limit")
-
-    raw = file_storage.stream.read()
-    file_storage.stream.seek(0)
-    img = Image.open(BytesIO(raw))
-    img = img.convert("RGB") if img.mode in ("P", "RGBA") else img
-
-    max_side = 1600
-    w, h = img.size
-    if max(w, h) > max_side:
-        if w > h:
-            new_w = max_side
-            new_h = int(h * (max_side / w))
-        else:
-            new_h = max_side
-            new_w = int(w * (max_side / h))
-        img = img.resize((new_w, new_h), Image.LANCZOS)
+    return _policy_serializer().dumps({"max_side": MAX_SIDE, "max_bytes": max_mb * 1024 * 1024, "formats": ["jpeg", "png"]})
+
+
+def parse_upload_hint(raw: str | None) -> dict | None:
+    """
+    Decodifica la pista enviada por el navegador ({policy, width, height, format}).
+    Devuelve None si falta, está mal formada o la política no es válida.
+    """
+    if not raw:
+        return None
+    try:
+        hint = json.loads(raw)
+        policy = _policy_serializer().loads(hint["policy"], max_age=UPLOAD_POLICY_MAX_AGE)
+        return {
+            "width": int(hint["width"]),
+            "height": int(hint["height"]),
+            "format": str(hint["format"]).lower(),
+            "max_side": int(policy["max_side"]),
+        }
+    except (ValueError, KeyError, TypeError, BadSignature):
+        return None
+
+
+def _fits_hint(img: Image.Image, hint: dict | None) -> bool:
+    # Fast path: el navegador ya reescaló y recodificó (sin EXIF) dentro de los límites
+    if not hint or img.format not in ("JPEG", "PNG"):
+        return False
+    if img.format.lower() != hint["format"] or img.size != (hint["width"], hint["height"]):
+        return False
+    if max(img.size) > min(MAX_SIDE, hint["max_side"]):
+        return False
+    if "exif" in img.info or img.mode not in ("RGB", "RGBA", "L"):
+        return False
+    return True
+
+
+def _jpeg_only_pixels(data: bytes) -> bool:
+    if not data.startswith(b"\xff\xd8"):
+        return False
+    pos = 2
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            return False
+        marker = data[pos + 1]
+        if marker == 0xFF:
+            pos += 1
+            continue
+        length = int.from_bytes(data[pos + 2:pos + 4], "big")
+        if marker == 0xDA:
+            # Un único scan (baseline) hasta EOI, sin nada detrás
+            end = len(data) - 2
+            return data.endswith(b"\xff\xd9") and not _JPEG_SCAN_MARKER.search(data, pos + 2 + length, end)
+        if marker not in _JPEG_SEGMENTS:
+            return False
+        if marker == 0xE0 and data[pos + 4:pos + 9] != b"JFIF\x00":
+            return False
+        pos += 2 + length
+    return False
+
+
+def _png_only_pixels(data: bytes) -> bool:
+    if not data.startswith(_PNG_SIGNATURE):
+        return False
+    pos = len(_PNG_SIGNATURE)
+    while pos + 8 <= len(data):
+        length = int.from_bytes(data[pos:pos + 4], "big")
+        chunk = data[pos + 4:pos + 8]
+        if chunk not in _PNG_CHUNKS:
+            return False
+        pos += 12 + length
+        if chunk == b"IEND":
+            return pos == len(data)
+    return False
+
+
+def _only_pixels(data: bytes, fmt: str) -> bool:
+    """True si los bytes no llevan metadatos ni datos añadidos tras la imagen."""
+    return _jpeg_only_pixels(data) if fmt == "JPEG" else _png_only_pixels(data)
+
+
+def _spool_upload(file_storage, max_bytes: int):
+    """
+    Copia la imagen a un fichero temporal (en memoria hasta
+    SPOOL_MEMORY_BYTES) y aborta en cuanto supera `max_bytes`. El cuerpo
+    de la petición ya viene acotado por MAX_CONTENT_LENGTH; esto limita la
+    imagen en sí, también la de una subida por trozos.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_BYTES)
+    total = 0
+    stream = file_storage.stream
+    try:
+        stream.seek(0)
+    except (AttributeError, OSError):
+        pass
+    try:
+        while True:
+            block = stream.read(_COPY_BLOCK)
+            if not block:
+                break
+            total += len(block)
+            if total > max_bytes:
+                raise ValueError("Image exceeds size limit")
+            spool.write(block)
+    except Exception:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+
+def _target_size(w: int, h: int, max_side: int) -> tuple[int, int]:
+    if max(w, h) <= max_side:
+        return w, h
+    if w > h:
+        return max_side, max(1, int(h * (max_side / w)))
+    return max(1, int(w * (max_side / h))), max_side
+
+
+def _placeholder(img: Image.Image) -> tuple[str, str]:
+    """Calcula la vista previa diminuta (data URI JPEG) y el color dominante."""
+    thumb = img.resize(_target_size(*img.size, PLACEHOLDER_SIDE), Image.BILINEAR, reducing_gap=2.0)
+    if thumb.mode in ("RGBA", "LA", "P"):
+        thumb = thumb.convert("RGBA")
+        bg = Image.new("RGB", thumb.size, (255, 255, 255))
+        bg.paste(thumb, mask=thumb.getchannel("A"))
+        thumb = bg
+    elif thumb.mode != "RGB":
+        thumb = thumb.convert("RGB")
+
+    quant = thumb.quantize(colors=4)
+    _, idx = max(quant.getcolors())
+    r, g, b = quant.getpalette()[idx * 3: idx * 3 + 3]
+    color = f"#{r:02x}{g:02x}{b:02x}"
+
+    out = BytesIO()
+    thumb.save(out, format="JPEG", quality=50)
+    return "data:image/jpeg;base64," + base64.b64encode(out.getvalue()).decode("ascii"), color
+
+
+def process_and_save_image(file_storage, hint: dict | None = None):
+    with memory_section("process_and_save_image"):
+        return _process_and_save_image(file_storage, hint)
+
+
+def _process_and_save_image(file_storage, hint: dict | None):
+    max_mb = int(current_app.config.get("MAX_IMAGE_MB", 2))
+    max_pixels = int(current_app.config.get("MAX_IMAGE_PIXELS", 40_000_000))
+    started = time.perf_counter()
+    spool = _spool_upload(file_storage, max_mb * 1024 * 1024)
+    with spool:
+        in_bytes = spool.seek(0, os.SEEK_END)
+        spool.seek(0)
+        try:
+            # Image.open solo lee la cabecera: dimensiones antes de decodificar
+            img = Image.open(spool)
+        except Image.DecompressionBombError:
+            raise ValueError("Image dimensions too large")
+        except Exception:
+            raise ValueError("Invalid image")
         w, h = img.size
+        if w * h > max_pixels:
+            raise ValueError("Image dimensions too large")
+
+        passthrough = _fits_hint(img, hint)
+        if passthrough:
+            try:
+                img.verify()
+            except Exception:
+                raise ValueError("Invalid image")
+            spool.seek(0)
+            data = spool.read()
+            # Con metadatos (XMP, ICC, comentarios, texto PNG) se recodifica
+            passthrough = _only_pixels(data, img.format)
+            spool.seek(0)
+            img = Image.open(spool)
+        if passthrough:
+            # Guardamos los bytes tal cual, sin decodificar ni recodificar
+            save_format = img.format
+            ext = "jpg" if save_format == "JPEG" else "png"
+            if img.format == "JPEG":
+                img.draft(None, (PLACEHOLDER_SIDE, PLACEHOLDER_SIDE))
+            placeholder, color = _placeholder(img)
+            mode = "passthrough"
+        else:
+            new_w, new_h = _target_size(w, h, MAX_SIDE)
+            if img.format == "JPEG" and (new_w, new_h) != (w, h):
+                # Decodificación DCT a escala reducida (1/2, 1/4, 1/8)
+                img.draft(None, (new_w, new_h))
+            try:
+                img = img.convert("RGB") if img.mode in ("P", "RGBA") else img
+                if img.size != (new_w, new_h):
+                    # reducing_gap aplica reduce() entero antes del LANCZOS
+                    img = img.resize((new_w, new_h), Image.LANCZOS, reducing_gap=3.0)
+            except Image.DecompressionBombError:
+                raise ValueError("Image dimensions too large")
+            except OSError:
+                raise ValueError("Invalid image")
+            w, h = img.size
+            placeholder, color = _placeholder(img)
+
+            ext = _secure_ext(file_storage.filename or "")
+            save_format = "JPEG" if ext in {"jpg", "jpeg"} else "PNG"
+            # Pillow copia de img.info el perfil ICC y los comentarios al guardar
+            img.info = {}
+            out = BytesIO()
+            save_kwargs = {"format": save_format, "optimize": True}
+            if save_format == "JPEG":
+                save_kwargs["quality"] = 85
+            img.save(out, **save_kwargs)
+            data = out.getvalue()
+            mode = "reencode"
+    IMAGE_SECONDS.labels(mode).observe(time.perf_counter() - started)
+    IMAGE_BYTES.labels("input").observe(in_bytes)
+    IMAGE_BYTES.labels("output").observe(len(data))
 
-    ext = _secure_ext(file_storage.filename or "")
     name = f"{secrets.token_hex(8)}.{ext}"
     uploads_dir = current_app.config.get("UPLOADS_DIR", "./uploads")
     os.makedirs(uploads_dir, exist_ok=True)
     path = os.path.join(uploads_dir, name)
-    save_format = "JPEG" if ext in {"jpg", "jpeg"} else "PNG"
-    out = BytesIO()
-    save_kwargs = {"format": save_format, "optimize": True}
-    if save_format == "JPEG":
-        save_kwargs["quality"] = 85
-    img.save(out, **save_kwargs)
-    data = out.getvalue()
     with open(path, "wb") as f:
         f.write(data)
 
@@ -66,4 +286,4 @@ def process_and_save_image(file_storage):
     except RuntimeError:
         # En contextos sin petición (por ejemplo scripts) devolvemos ruta relativa
         url = f"/uploads/{name}"
-    return url, w, h
+    return SavedImage(url, w, h, placeholder, color)
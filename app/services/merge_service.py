@@ -1,6 +1,8 @@
 from ..extensions import db
-from ..models import Tip, Review, User
+from ..models import Tip, Review, User, UserStat, UserCounter
 from .reward_service import recalc_level
+from .stats_service import rebuild_user_stats
+from .achievement_service import rebuild_counters
 
 
 def merge_guest_into_user(guest: User, user: User):
@@ -10,5 +12,9 @@ def merge_guest_into_user(guest: User, user: User):
     Review.query.filter_by(user_id=guest.id).update({"user_id": user.id})
     user.xp = (user.xp or 0) + (guest.xp or 0)
     recalc_level(user)
+    UserStat.query.filter_by(user_id=guest.id).delete()
+    UserCounter.query.filter_by(user_id=guest.id).delete()
+    rebuild_user_stats(user.id)
+    rebuild_counters(user.id)
     db.session.delete(guest)
     db.session.commit()
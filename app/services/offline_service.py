@@ -0,0 +1,68 @@
+import hashlib
+import os
+from flask import current_app, url_for
+
+from ..models import Restaurant, Staff
+
+
+# Recursos estáticos que forman el "shell" de la página de propinas
+SHELL_ASSETS = (
+    "css/custom.css",
+    "css/luxe.css",
+    "js/app.js",
+    "logos/Xinra_icon_color.svg",
+)
+
+
+def _asset_mtimes() -> list[tuple[str, int]]:
+    static_dir = current_app.static_folder or "static"
+    out = []
+    for rel in SHELL_ASSETS:
+        try:
+            out.append((rel, int(os.stat(os.path.join(static_dir, rel)).st_mtime)))
+        except OSError:
+            out.append((rel, 0))
+    return out
+
+
+def build_offline_manifest(restaurant: Restaurant) -> dict:
+    """
+    Manifest versionado que usa el service worker para precachear la
+    página de propinas. La versión cambia cuando cambia la plantilla de
+    staff, el logo o cualquiera de los recursos estáticos del shell.
+    """
+    staff_list = (
+        Staff.query.filter_by(restaurant_id=restaurant.id, active=True)
+        .order_by(Staff.name.asc())
+        .all()
+    )
+    roster = [
+        {"id": s.id, "name": s.name, "role": s.role, "avatar_url": s.avatar_url}
+        for s in staff_list
+    ]
+    assets = _asset_mtimes()
+
+    digest = hashlib.sha1()
+    digest.update(f"{restaurant.id}|{restaurant.name}|{restaurant.logo_url or ''}".encode())
+    for s in roster:
+        digest.update(f"|{s['id']}:{s['name']}:{s['role'] or ''}:{s['avatar_url'] or ''}".encode())
+    for rel, mtime in assets:
+        digest.update(f"|{rel}:{mtime}".encode())
+    version = digest.hexdigest()[:16]
+
+    precache = [
+        url_for("public.tip_page", restaurant_slug=restaurant.slug),
+        url_for("public.feedback_page", restaurant_slug=restaurant.slug),
+    ]
+    precache += [url_for("static", filename=rel) for rel, _ in assets]
+    # Solo imágenes del mismo origen; las externas se cachean en tiempo de ejecución
+    for url in [restaurant.logo_url] + [s["avatar_url"] for s in roster]:
+        if url and url.startswith("/") and url not in precache:
+            precache.append(url)
+
+    return {
+        "version": version,
+        "restaurant": {"slug": restaurant.slug, "name": restaurant.name, "logo_url": restaurant.logo_url},
+        "staff": roster,
+        "precache": precache,
+    }
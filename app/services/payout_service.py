@@ -0,0 +1,108 @@
+from datetime import datetime
+
+from sqlalchemy import func, insert, literal, select, union_all
+
+from ..extensions import db
+from ..models import PoolAllocation, Restaurant, Staff, Tip, Transfer
+from ..utils.sql import advisory_xact_lock
+
+
+# Primer entero del advisory lock de pagos (el segundo es el restaurante)
+PAYOUT_LOCK = 4107
+
+
+def _balances(restaurant_id: int, staff_id: int | None = None):
+    """Subconsulta (staff_id, pending): propinas y bote repartido menos transferencias, agrupado en SQL."""
+    tips = select(Tip.staff_id, Tip.amount_cents.label("amount")).where(
+        Tip.restaurant_id == restaurant_id, Tip.staff_id.isnot(None)
+    )
+    pool = select(PoolAllocation.staff_id, PoolAllocation.amount_cents).where(
+        PoolAllocation.restaurant_id == restaurant_id
+    )
+    # Las transferencias que el proveedor rechazó vuelven a quedar pendientes
+    sent = select(Transfer.staff_id, (literal(0) - Transfer.amount_cents).label("amount")).where(
+        Transfer.restaurant_id == restaurant_id, Transfer.staff_id.isnot(None), Transfer.status != "failed"
+    )
+    if staff_id is not None:
+        tips = tips.where(Tip.staff_id == staff_id)
+        pool = pool.where(PoolAllocation.staff_id == staff_id)
+        sent = sent.where(Transfer.staff_id == staff_id)
+    movements = union_all(tips, pool, sent).subquery()
+    return (
+        select(movements.c.staff_id, func.sum(movements.c.amount).label("pending"))
+        .group_by(movements.c.staff_id)
+        .subquery()
+    )
+
+
+def pending_by_staff(restaurant_id: int) -> dict[int, int]:
+    balances = _balances(restaurant_id)
+    return {staff_id: max(0, int(pending or 0)) for staff_id, pending in db.session.execute(select(balances))}
+
+
+def pending_for_staff(restaurant_id: int, staff_id: int) -> int:
+    balances = _balances(restaurant_id, staff_id)
+    return max(0, int(db.session.scalar(select(balances.c.pending)) or 0))
+
+
+def payout_rows(restaurant_id: int) -> list[tuple[Staff, int]]:
+    """[(staff activo, pendiente)] por nombre, en una sola consulta."""
+    balances = _balances(restaurant_id)
+    rows = (
+        db.session.query(Staff, func.coalesce(balances.c.pending, 0))
+        .outerjoin(balances, balances.c.staff_id == Staff.id)
+        .filter(Staff.restaurant_id == restaurant_id, Staff.active.is_(True))
+        .order_by(Staff.name.asc())
+        .all()
+    )
+    return [(staff, max(0, int(pending))) for staff, pending in rows]
+
+
+def pay_staff(restaurant_id: int, staff_id: int) -> Transfer | None:
+    """Transfiere todo lo pendiente a un miembro del staff. None si no hay nada."""
+    advisory_xact_lock(PAYOUT_LOCK, restaurant_id)
+    amount = pending_for_staff(restaurant_id, staff_id)
+    if amount <= 0:
+        db.session.rollback()
+        return None
+    tr = Transfer(restaurant_id=restaurant_id, staff_id=staff_id, amount_cents=amount, status="sent", created_at=datetime.utcnow())
+    db.session.add(tr)
+    return tr
+
+
+def run_payouts(restaurant_id: int, min_cents: int = 1) -> tuple[int, int]:
+    """
+    Paga a todo el staff con pendiente >= min_cents: un INSERT por lotes en
+    una transacción, bajo un advisory lock por restaurante para que dos
+    ejecuciones a la vez (botón + cron) no paguen dos veces.
+    Devuelve (transferencias, céntimos).
+    """
+    advisory_xact_lock(PAYOUT_LOCK, restaurant_id)
+    balances = _balances(restaurant_id)
+    due = db.session.execute(
+        select(balances.c.staff_id, balances.c.pending)
+        .join(Staff, Staff.id == balances.c.staff_id)
+        .where(Staff.active.is_(True), balances.c.pending >= max(1, min_cents))
+    ).all()
+    if not due:
+        db.session.rollback()
+        return 0, 0
+    now = datetime.utcnow()
+    db.session.execute(insert(Transfer), [
+        {"restaurant_id": restaurant_id, "staff_id": staff_id, "amount_cents": int(pending), "status": "sent", "created_at": now}
+        for staff_id, pending in due
+    ])
+    db.session.commit()
+    return len(due), sum(int(pending) for _, pending in due)
+
+
+def run_all_payouts(min_cents: int = 1, progress=None) -> tuple[int, int]:
+    """Pagos nocturnos: cada restaurante en su propia transacción."""
+    count = total = 0
+    for (restaurant_id,) in db.session.query(Restaurant.id).order_by(Restaurant.id.asc()).all():
+        n, cents = run_payouts(restaurant_id, min_cents)
+        count += n
+        total += cents
+        if progress and n:
+            progress(restaurant_id, n, cents)
+    return count, total
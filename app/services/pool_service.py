@@ -0,0 +1,216 @@
+import json
+import math
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from sqlalchemy import func, insert, select, update
+
+from ..extensions import db
+from ..models import PoolAllocation, PoolRun, Restaurant, Staff, StaffShift, Tip
+from ..utils.sql import advisory_xact_lock, upsert_insert
+
+
+POOL_RULES = ("equal", "role", "hours")
+# Primer entero del advisory lock de repartos (el segundo es el restaurante)
+POOL_LOCK = 4108
+# Ids por UPDATE al marcar propinas (límite de parámetros de SQLite)
+MARK_BATCH = 5000
+
+
+def allocate_cents(pooled: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """
+    Reparte cada fila de `pooled` (céntimos por día, forma D) entre las
+    columnas de `weights` (D x S) proporcionalmente, con redondeo de mayor
+    resto: cada fila suma exactamente lo del día. Las filas sin peso se
+    reparten a partes iguales.
+    """
+    pooled = np.asarray(pooled, dtype=np.int64)
+    weights = np.asarray(weights, dtype=np.float64)
+    if not np.isfinite(weights).all() or (weights < 0).any():
+        raise ValueError("Pool weights must be finite and non-negative")
+    if weights.ndim == 1:
+        weights = np.broadcast_to(weights, (pooled.shape[0], weights.shape[0]))
+    weights = np.where(weights.sum(axis=1, keepdims=True) > 0, weights, 1.0)
+    exact = pooled[:, None] * (weights / weights.sum(axis=1, keepdims=True))
+    base = np.floor(exact).astype(np.int64)
+    short = pooled - base.sum(axis=1)
+    # Un céntimo más a los `short` mayores restos de cada fila (empates: primera columna)
+    order = np.argsort(base - exact, axis=1, kind="stable")
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(order.shape[1])[None, :], axis=1)
+    return base + (ranks < short[:, None])
+
+
+def role_weights(restaurant: Restaurant) -> dict[str, float]:
+    try:
+        raw = json.loads(restaurant.pool_role_weights or "{}")
+    except ValueError:
+        return {}
+    if not isinstance(raw, dict):
+        return {}
+    # Pesos guardados antes de validar inf/nan: se ignoran (peso 1 por defecto)
+    weights = {}
+    for k, v in raw.items():
+        try:
+            weight = float(v)
+        except (TypeError, ValueError):
+            continue
+        if math.isfinite(weight) and weight >= 0:
+            weights[str(k).strip().lower()] = weight
+    return weights
+
+
+def parse_role_weights(text: str) -> str | None:
+    """'Barista=1, Chef=1.5' -> JSON. ValueError si el formato no es válido."""
+    weights = {}
+    for part in (text or "").replace("\n", ",").split(","):
+        if not part.strip():
+            continue
+        role, sep, value = part.partition("=")
+        if not sep or not role.strip():
+            raise ValueError("Use role=weight, separated by commas")
+        try:
+            weight = float(value)
+        except ValueError:
+            raise ValueError(f"Invalid weight for {role.strip()}")
+        if not math.isfinite(weight):
+            raise ValueError(f"Invalid weight for {role.strip()}")
+        if weight < 0:
+            raise ValueError("Weights can't be negative")
+        weights[role.strip()] = weight
+    return json.dumps(weights) if weights else None
+
+
+def _weight_matrix(restaurant: Restaurant, rule: str, staff: list[Staff], days: list[date]) -> np.ndarray:
+    if rule == "hours":
+        col = {s.id: j for j, s in enumerate(staff)}
+        row = {d: i for i, d in enumerate(days)}
+        matrix = np.zeros((len(days), len(staff)))
+        shifts = db.session.execute(
+            select(StaffShift.staff_id, StaffShift.work_date, StaffShift.hours).where(
+                StaffShift.restaurant_id == restaurant.id,
+                StaffShift.work_date >= days[0],
+                StaffShift.work_date <= days[-1],
+            )
+        ).all()
+        known = [(row[d], col[sid], h) for sid, d, h in shifts if sid in col and d in row]
+        if known:
+            i, j, h = map(np.array, zip(*known))
+            matrix[i, j] = h
+        return matrix
+    if rule == "role":
+        weights = role_weights(restaurant)
+        return np.array([weights.get((s.role or "").strip().lower(), 1.0) for s in staff])
+    return np.ones(len(staff))
+
+
+def allocate_pool(restaurant: Restaurant, until: datetime | None = None, rule: str | None = None) -> PoolRun | None:
+    """
+    Reparte las propinas sin staff aún no repartidas anteriores a `until`
+    entre el staff activo según la regla del restaurante. Agrupa por día,
+    reparte con NumPy y escribe una fila de PoolAllocation por persona en
+    la misma transacción que marca (por id) las propinas. None si no hay bote.
+    """
+    until = until or datetime.utcnow()
+    rule = rule or restaurant.pool_rule or "equal"
+    if rule not in POOL_RULES:
+        raise ValueError(f"Unknown pool rule {rule}")
+    advisory_xact_lock(POOL_LOCK, restaurant.id)
+    staff = Staff.query.filter_by(restaurant_id=restaurant.id, active=True).order_by(Staff.id.asc()).all()
+    # Se leen los ids: el UPDATE marca exactamente lo que se ha sumado, aunque
+    # entre tanto entren propinas nuevas (no toman POOL_LOCK)
+    tips = db.session.execute(
+        select(Tip.id, Tip.amount_cents, Tip.created_at).where(
+            Tip.restaurant_id == restaurant.id,
+            Tip.staff_id.is_(None),
+            Tip.pool_run_id.is_(None),
+            Tip.created_at < until,
+        ).order_by(Tip.created_at)
+    ).all()
+    if not staff or not tips:
+        db.session.rollback()
+        return None
+
+    tip_ids = [tip_id for tip_id, _, _ in tips]
+    by_day = {}
+    for _, amount, created_at in tips:
+        by_day[created_at.date()] = by_day.get(created_at.date(), 0) + int(amount or 0)
+    days = sorted(by_day)
+    pooled = np.array([by_day[d] for d in days], dtype=np.int64)
+    shares = allocate_cents(pooled, _weight_matrix(restaurant, rule, staff, days)).sum(axis=0)
+
+    run = PoolRun(
+        restaurant_id=restaurant.id,
+        rule=rule,
+        period_start=tips[0].created_at,
+        period_end=until,
+        tips_count=len(tips),
+        total_cents=int(pooled.sum()),
+    )
+    db.session.add(run)
+    db.session.flush()
+    marked = 0
+    for i in range(0, len(tip_ids), MARK_BATCH):
+        marked += db.session.execute(
+            update(Tip)
+            .where(Tip.id.in_(tip_ids[i:i + MARK_BATCH]), Tip.pool_run_id.is_(None))
+            .values(pool_run_id=run.id)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+    if marked != run.tips_count:
+        # Otro reparto marcó alguna de estas propinas: no se paga dos veces
+        db.session.rollback()
+        raise ValueError("Pooled tips changed during the allocation, please try again")
+    now = datetime.utcnow()
+    db.session.execute(insert(PoolAllocation), [
+        {"run_id": run.id, "restaurant_id": restaurant.id, "staff_id": s.id, "amount_cents": int(cents), "created_at": now}
+        for s, cents in zip(staff, shares)
+        if cents > 0
+    ])
+    db.session.commit()
+    return run
+
+
+def unallocated_pool(restaurant_id: int) -> tuple[int, int]:
+    """(propinas, céntimos) del bote pendiente de repartir."""
+    count, total = db.session.execute(
+        select(func.count(Tip.id), func.coalesce(func.sum(Tip.amount_cents), 0)).where(
+            Tip.restaurant_id == restaurant_id, Tip.staff_id.is_(None), Tip.pool_run_id.is_(None)
+        )
+    ).one()
+    return int(count), int(total)
+
+
+def pool_share_since(restaurant_id: int, staff_id: int, since: datetime) -> int:
+    return int(db.session.scalar(
+        select(func.coalesce(func.sum(PoolAllocation.amount_cents), 0)).where(
+            PoolAllocation.restaurant_id == restaurant_id,
+            PoolAllocation.staff_id == staff_id,
+            PoolAllocation.created_at >= since,
+        )
+    ) or 0)
+
+
+def week_shifts(restaurant_id: int, week_start: date) -> dict[tuple[int, date], float]:
+    rows = StaffShift.query.filter(
+        StaffShift.restaurant_id == restaurant_id,
+        StaffShift.work_date >= week_start,
+        StaffShift.work_date < week_start + timedelta(days=7),
+    ).all()
+    return {(s.staff_id, s.work_date): s.hours for s in rows}
+
+
+def save_shifts(restaurant_id: int, hours: dict[tuple[int, date], float]) -> None:
+    """Upsert de horas por (staff, día); 0 horas = no cuenta en el reparto de ese día."""
+    if not hours:
+        return
+    table = StaffShift.__table__
+    stmt = upsert_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.staff_id, table.c.work_date],
+        set_={"hours": stmt.excluded.hours},
+    )
+    db.session.execute(stmt, [
+        {"restaurant_id": restaurant_id, "staff_id": staff_id, "work_date": day, "hours": value}
+        for (staff_id, day), value in hours.items()
+    ])
@@ -0,0 +1,223 @@
+import csv
+import json
+import random
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from typing import Iterator, NamedTuple, TextIO
+
+from flask import current_app
+from sqlalchemy import bindparam, select, update
+
+from ..extensions import db
+from ..models import Transfer
+
+
+# Estados del proveedor -> estado de nuestra transferencia
+PROVIDER_STATUS = {
+    "settled": "settled",
+    "paid": "settled",
+    "completed": "settled",
+    "failed": "failed",
+    "returned": "failed",
+    "rejected": "failed",
+}
+REPORT_FIELDS = ("kind", "reference", "transfer_id", "our_amount_cents", "provider_amount_cents", "provider_status", "line")
+# Margen tras la última liquidación del extracto para dar por perdida una transferencia
+MISSING_GRACE = timedelta(days=1)
+
+
+class StatementLine(NamedTuple):
+    line: int
+    reference: str
+    amount_cents: int | None
+    status: str
+    settled_at: datetime | None
+
+
+def batch_size() -> int:
+    return int(current_app.config.get("RECONCILE_BATCH_SIZE", 5000))
+
+
+def _cents(row: dict) -> int | None:
+    try:
+        if row.get("amount_cents") not in (None, ""):
+            return int(row["amount_cents"])
+        if row.get("amount") not in (None, ""):
+            return int((Decimal(str(row["amount"])) * 100).to_integral_value())
+    except (InvalidOperation, ValueError):
+        pass
+    return None
+
+
+def _timestamp(raw) -> datetime | None:
+    if not raw:
+        return None
+    try:
+        return datetime.fromisoformat(str(raw).replace("Z", "+00:00")).replace(tzinfo=None)
+    except ValueError:
+        return None
+
+
+def _json_rows(stream: TextIO) -> Iterator[dict | None]:
+    # Una línea que no es un objeto JSON no aborta el resto: sale como {} (bad_line)
+    for line in stream:
+        if not line.strip():
+            yield None
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield row if isinstance(row, dict) else {}
+
+
+def iter_statement(stream: TextIO, fmt: str = "csv") -> Iterator[StatementLine]:
+    """
+    Lee el extracto línea a línea sin cargarlo entero: CSV con cabecera
+    (reference, amount_cents o amount, status, settled_at) o JSON Lines
+    con esos mismos campos. Las líneas ilegibles se devuelven vacías y
+    se cuentan como bad_line.
+    """
+    rows = _json_rows(stream) if fmt == "jsonl" else csv.DictReader(stream)
+    for n, row in enumerate(rows, start=1):
+        if row is None:
+            continue
+        yield StatementLine(
+            line=n,
+            reference=str(row.get("reference") or row.get("external_ref") or "").strip(),
+            amount_cents=_cents(row),
+            status=str(row.get("status") or "").strip().lower(),
+            settled_at=_timestamp(row.get("settled_at")),
+        )
+
+
+def _chunks(lines: Iterator[StatementLine], size: int) -> Iterator[list[StatementLine]]:
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def reconcile_statement(stream: TextIO, fmt: str = "csv", report: TextIO | None = None, size: int | None = None, progress=None) -> dict:
+    """
+    Concilia un extracto del proveedor con `transfers`. Por cada lote de
+    líneas: una consulta por external_ref, cruce en memoria (hash join del
+    lote) y un UPDATE por lotes con el estado liquidado; commit por lote.
+    La memoria depende del tamaño de lote, no del fichero. Las
+    discrepancias se escriben como CSV en `report`.
+    """
+    size = size or batch_size()
+    writer = csv.DictWriter(report, fieldnames=REPORT_FIELDS) if report else None
+    if writer:
+        writer.writeheader()
+    summary = {"lines": 0, "matched": 0, "already": 0, "amount_mismatch": 0, "unknown_reference": 0, "bad_line": 0, "missing": 0}
+    last_settled = None
+
+    def _report(kind, line=None, transfer=None):
+        summary[kind] += 1
+        if writer:
+            writer.writerow({
+                "kind": kind,
+                "reference": line.reference if line else transfer.external_ref,
+                "transfer_id": transfer.id if transfer else "",
+                "our_amount_cents": transfer.amount_cents if transfer else "",
+                "provider_amount_cents": line.amount_cents if line and line.amount_cents is not None else "",
+                "provider_status": line.status if line else "",
+                "line": line.line if line else "",
+            })
+
+    # UPDATE de Core con executemany: un statement por lote
+    table = Transfer.__table__
+    stmt = (
+        update(table)
+        .where(table.c.id == bindparam("tid"))
+        .values(status=bindparam("new_status"), reconciled_at=bindparam("at"))
+    )
+    for chunk in _chunks(iter_statement(stream, fmt), size):
+        summary["lines"] += len(chunk)
+        refs = {line.reference for line in chunk if line.reference}
+        by_ref = {
+            t.external_ref: t
+            for t in db.session.execute(
+                select(Transfer.id, Transfer.external_ref, Transfer.amount_cents, Transfer.status, Transfer.reconciled_at)
+                .where(Transfer.external_ref.in_(refs))
+            )
+        } if refs else {}
+        now = datetime.utcnow()
+        updates = []
+        for line in chunk:
+            if line.settled_at and (last_settled is None or line.settled_at > last_settled):
+                last_settled = line.settled_at
+            new_status = PROVIDER_STATUS.get(line.status)
+            if not line.reference or line.amount_cents is None or not new_status:
+                _report("bad_line", line)
+                continue
+            transfer = by_ref.get(line.reference)
+            if transfer is None:
+                _report("unknown_reference", line)
+            elif transfer.amount_cents != line.amount_cents:
+                _report("amount_mismatch", line, transfer)
+            elif transfer.reconciled_at and transfer.status == new_status:
+                summary["already"] += 1
+            else:
+                updates.append({"tid": transfer.id, "new_status": new_status, "at": line.settled_at or now})
+        if updates:
+            db.session.connection().execute(stmt, updates)
+            summary["matched"] += len(updates)
+        db.session.commit()
+        if progress:
+            progress(summary["lines"])
+
+    if last_settled:
+        # Enviadas antes del extracto y que el proveedor no ha liquidado
+        missing = db.session.execute(
+            select(Transfer.id, Transfer.external_ref, Transfer.amount_cents)
+            .where(Transfer.reconciled_at.is_(None), Transfer.created_at < last_settled - MISSING_GRACE)
+            .order_by(Transfer.id.asc())
+            .execution_options(yield_per=size)
+        )
+        for transfer in missing:
+            _report("missing", transfer=transfer)
+    return summary
+
+
+def write_mock_statement(out: TextIO, fmt: str = "csv", mismatch_rate: float = 0.01, unknown_rate: float = 0.01,
+                         failed_rate: float = 0.02, seed: int | None = None) -> int:
+    """
+    Genera un extracto de un proveedor ficticio a partir de las
+    transferencias pendientes de conciliar, con una fracción de importes
+    erróneos, referencias desconocidas y pagos fallidos. Devuelve las líneas.
+    """
+    rng = random.Random(seed)
+    writer = None
+    if fmt != "jsonl":
+        writer = csv.DictWriter(out, fieldnames=("reference", "amount_cents", "status", "settled_at"))
+        writer.writeheader()
+    n = 0
+    rows = db.session.execute(
+        select(Transfer.external_ref, Transfer.amount_cents, Transfer.created_at)
+        .where(Transfer.reconciled_at.is_(None), Transfer.external_ref.isnot(None))
+        .order_by(Transfer.id.asc())
+        .execution_options(yield_per=5000)
+    )
+    for ref, amount, created in rows:
+        if rng.random() < unknown_rate:
+            ref = f"tr_unknown{n:010d}"
+        if rng.random() < mismatch_rate:
+            amount += rng.choice((-100, -1, 1, 100))
+        row = {
+            "reference": ref,
+            "amount_cents": amount,
+            "status": "failed" if rng.random() < failed_rate else "settled",
+            "settled_at": (created + timedelta(hours=rng.randint(1, 48))).isoformat(timespec="seconds"),
+        }
+        if writer:
+            writer.writerow(row)
+        else:
+            out.write(json.dumps(row) + "\n")
+        n += 1
+    return n
@@ -1,17 +1,40 @@
 from statistics import mean
+from sqlalchemy.exc import IntegrityError
 from ..extensions import db
 from ..models import Review, Media, Staff, User
 from .image_service import process_and_save_image
 from .reward_service import add_xp
+from .stats_service import record_review
+from .achievement_service import record_event, review_event
+from ..utils.metrics import timed_write
 
 
-def create_review(restaurant_id: int, staff: Staff | None, user: User | None, rating: int, comment: str | None, share_allowed: bool, file_storage) -> Review:
-    review = Review(restaurant_id=restaurant_id, staff_id=staff.id if staff else None, user_id=user.id if user else None, rating=rating, comment=comment or None, share_allowed=share_allowed)
+def create_review(restaurant_id: int, staff: Staff | None, user: User | None, rating: int, comment: str | None, share_allowed: bool, file_storage, photo_hint: dict | None = None, idempotency_key: str | None = None) -> Review:
+    # Reenvío de la cola offline: no se vuelve a procesar la foto ni a sumar XP
+    if idempotency_key:
+        existing = Review.query.filter_by(restaurant_id=restaurant_id, idempotency_key=idempotency_key).first()
+        if existing:
+            return existing
+    with timed_write("review"):
+        try:
+            review = _insert_review(restaurant_id, staff, user, rating, comment, share_allowed, file_storage, photo_hint, idempotency_key)
+        except IntegrityError:
+            # Dos reenvíos simultáneos con la misma clave: se queda el primero
+            db.session.rollback()
+            existing = Review.query.filter_by(restaurant_id=restaurant_id, idempotency_key=idempotency_key).first() if idempotency_key else None
+            if not existing:
+                raise
+            return existing
+    return review
+
+
+def _insert_review(restaurant_id, staff, user, rating, comment, share_allowed, file_storage, photo_hint, idempotency_key) -> Review:
+    review = Review(restaurant_id=restaurant_id, staff_id=staff.id if staff else None, user_id=user.id if user else None, rating=rating, comment=comment or None, share_allowed=share_allowed, idempotency_key=idempotency_key)
     db.session.add(review)
     photo_saved = False
     if file_storage and getattr(file_storage, "filename", None):
-        url, width, height = process_and_save_image(file_storage)
-        media = Media(review=review, url=url, width=width, height=height)
+        saved = process_and_save_image(file_storage, photo_hint)
+        media = Media(review=review, url=saved.url, width=saved.width, height=saved.height, placeholder=saved.placeholder, dominant_color=saved.color)
         db.session.add(media)
         photo_saved = True
 
@@ -25,6 +48,8 @@ def create_review(restaurant_id: int, staff: Staff | None, user: User | None, ra
             gained += 5
         if gained:
             add_xp(user, gained)
+        record_event(review_event(review))
+        record_review(review)
 
     db.session.flush()
 
@@ -0,0 +1,339 @@
+import csv
+import io
+import json
+import multiprocessing
+import os
+import re
+import secrets
+import string
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import partial
+
+from flask import current_app
+from sqlalchemy import insert, or_
+
+from ..extensions import db
+from ..models import ImportJob, Membership, Restaurant, Staff, User
+from ..utils.background import run_in_background
+from .chain_service import ADMIN_ROLES
+from ..utils.security import current_rounds, hash_password, hash_password_rounds
+
+
+# Dominio sintácticamente válido para que el validador Email() de WTForms lo acepte
+STAFF_EMAIL_DOMAIN = "example.com"
+LEGACY_EMAIL_SUFFIX = "@staff.local"
+# Por debajo de esto no compensa arrancar el pool de procesos
+BULK_HASH_MIN = 8
+IMPORT_FIELDS = ("restaurant_name", "restaurant_slug", "name", "role", "bio")
+
+
+def generate_random_password(length: int = 10) -> str:
+    alphabet = string.ascii_letters + string.digits
+    return "".join(secrets.choice(alphabet) for _ in range(length))
+
+
+def slugify(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", (text or "").lower()).strip("-")[:120]
+
+
+def _email_local_part(name: str, restaurant_slug: str) -> str:
+    cleaned = []
+    for ch in (name or "staff").lower():
+        if ch.isalnum():
+            cleaned.append(ch)
+        elif ch in (" ", ".", "_", "-"):
+            cleaned.append(".")
+    base_name = "".join(cleaned).strip(".") or "staff"
+    return f"{restaurant_slug}.{base_name}"
+
+
+def allocate_staff_emails(candidates: list[tuple[str, str]]) -> list[str]:
+    """
+    Emails únicos para [(slug del restaurante, nombre)], en orden. Una sola
+    consulta trae los emails ya usados bajo esos slugs y los sufijos se
+    asignan en memoria (también entre candidatos repetidos).
+    """
+    if not candidates:
+        return []
+    slugs = sorted({slug for slug, _ in candidates})
+    taken = {
+        email for (email,) in db.session.query(User.email).filter(
+            or_(*[User.email.like(f"{slug}.%@{STAFF_EMAIL_DOMAIN}") for slug in slugs])
+        )
+    }
+    out = []
+    for slug, name in candidates:
+        base = _email_local_part(name, slug)
+        email = f"{base}@{STAFF_EMAIL_DOMAIN}"
+        idx = 1
+        while email in taken:
+            email = f"{base}{idx}@{STAFF_EMAIL_DOMAIN}"
+            idx += 1
+        taken.add(email)
+        out.append(email)
+    return out
+
+
+def hash_passwords_bulk(passwords: list[str], progress=None) -> list[str]:
+    """
+    bcrypt en paralelo con un pool de procesos (spawn, seguro desde hilos).
+    `progress(n)` se llama a medida que se completan hashes.
+    """
+    if len(passwords) < BULK_HASH_MIN:
+        return [hash_password(p) for p in passwords]
+    workers = int(current_app.config.get("IMPORT_HASH_WORKERS") or 0) or os.cpu_count() or 1
+    ctx = multiprocessing.get_context("spawn")
+    out = []
+    with ProcessPoolExecutor(max_workers=min(workers, len(passwords)), mp_context=ctx) as pool:
+        hasher = partial(hash_password_rounds, rounds=current_rounds())
+        for hashed in pool.map(hasher, passwords, chunksize=4):
+            out.append(hashed)
+            if progress and len(out) % 10 == 0:
+                progress(len(out))
+    return out
+
+
+def ensure_staff_login(staff: Staff, restaurant: Restaurant) -> None:
+    if staff.user_id:
+        # Migrar emails heredados con el dominio antiguo
+        if staff.user and staff.user.email and staff.user.email.endswith(LEGACY_EMAIL_SUFFIX):
+            staff.user.email = allocate_staff_emails([(restaurant.slug, staff.name)])[0]
+            db.session.add(staff.user)
+        return
+    email = allocate_staff_emails([(restaurant.slug, staff.name)])[0]
+    raw_password = generate_random_password()
+    user = User(email=email, name=staff.name, password_hash=hash_password(raw_password))
+    db.session.add(user)
+    db.session.flush()
+    staff.user_id = user.id
+    staff.login_initial_password = raw_password
+    db.session.add(staff)
+    existing = (
+        Membership.query.filter_by(user_id=user.id, restaurant_id=restaurant.id, role="staff")
+        .order_by(Membership.id.asc())
+        .first()
+    )
+    if not existing:
+        db.session.add(Membership(user_id=user.id, restaurant_id=restaurant.id, role="staff"))
+
+
+# ---- Importación masiva ----
+
+def parse_import(raw: bytes, filename: str, default_restaurant: Restaurant | None = None) -> list[dict]:
+    """
+    Acepta CSV (cabeceras: restaurant_name, restaurant_slug, name, role, bio)
+    o JSON: lista de filas con esos campos, o {"restaurants": [{"name",
+    "slug", "staff": [...]}]}. Las filas sin restaurante van al actual.
+    """
+    text = raw.decode("utf-8-sig", errors="replace")
+    if (filename or "").lower().endswith(".json") or text.lstrip().startswith(("[", "{")):
+        try:
+            data = json.loads(text)
+        except ValueError:
+            raise ValueError("Invalid JSON file")
+        if isinstance(data, dict):
+            items = []
+            for r in data.get("restaurants") or []:
+                for s in r.get("staff") or []:
+                    items.append({**s, "restaurant_name": r.get("name"), "restaurant_slug": r.get("slug")})
+        else:
+            items = data if isinstance(data, list) else []
+    else:
+        items = list(csv.DictReader(io.StringIO(text)))
+
+    max_rows = int(current_app.config.get("MAX_IMPORT_ROWS", 5000))
+    if len(items) > max_rows:
+        raise ValueError(f"Too many rows (max {max_rows})")
+    rows = []
+    for item in items:
+        if not isinstance(item, dict):
+            raise ValueError("Invalid row")
+        row = {k: (str(item.get(k) or "")).strip() for k in IMPORT_FIELDS}
+        if not row["name"]:
+            continue
+        if not row["restaurant_slug"] and not row["restaurant_name"]:
+            if not default_restaurant:
+                raise ValueError(f"Missing restaurant for {row['name']}")
+            row["restaurant_slug"], row["restaurant_name"] = default_restaurant.slug, default_restaurant.name
+        row["restaurant_slug"] = slugify(row["restaurant_slug"] or row["restaurant_name"])
+        row["restaurant_name"] = row["restaurant_name"] or row["restaurant_slug"]
+        if not row["restaurant_slug"]:
+            raise ValueError(f"Invalid restaurant for {row['name']}")
+        rows.append(row)
+    if not rows:
+        raise ValueError("No staff rows found")
+    return rows
+
+
+def create_import_job(rows: list[dict], user: User | None) -> ImportJob:
+    job = ImportJob(kind="staff", total=len(rows), payload=json.dumps(rows), created_by_user_id=user.id if user else None)
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def _authorize_rows(rows: list[dict], user_id: int | None) -> tuple[list[dict], list[dict], dict]:
+    """
+    Separa las filas que apuntan a restaurantes existentes que `user_id` no
+    administra (admin o manager): se rechazan como errores de fila en vez
+    de crear staff en locales ajenos. Devuelve también {slug: id} de los
+    existentes autorizados; los slugs nuevos se crean al insertar.
+    """
+    slugs = {row["restaurant_slug"] for row in rows}
+    existing = dict(db.session.query(Restaurant.slug, Restaurant.id).filter(Restaurant.slug.in_(slugs)).all())
+    managed = set()
+    if user_id and existing:
+        managed = {
+            rid for (rid,) in db.session.query(Membership.restaurant_id).filter(
+                Membership.user_id == user_id,
+                Membership.role.in_(ADMIN_ROLES),
+                Membership.restaurant_id.in_(existing.values()),
+            )
+        }
+    allowed, rejected = [], []
+    for line, row in enumerate(rows, start=1):
+        rid = existing.get(row["restaurant_slug"])
+        if rid is not None and rid not in managed:
+            rejected.append({"row": line, "name": row["name"], "error": f"No permission for restaurant '{row['restaurant_slug']}'"})
+        else:
+            allowed.append(row)
+    return allowed, rejected, {slug: rid for slug, rid in existing.items() if rid in managed}
+
+
+def run_import(job_id: int) -> ImportJob:
+    """
+    Ejecuta la importación: hashes en paralelo (con progreso) y luego
+    inserciones masivas de restaurantes, usuarios, staff y memberships en
+    una sola transacción.
+    """
+    job = db.session.get(ImportJob, job_id)
+    if not job:
+        raise LookupError(f"Import job {job_id} not found")
+    rows = json.loads(job.payload or "[]")
+    try:
+        rows, rejected, restaurant_ids = _authorize_rows(rows, job.created_by_user_id)
+        job.status = "hashing"
+        job.processed = 0
+        db.session.commit()
+
+        def _progress(n: int):
+            job.processed = n
+            db.session.commit()
+
+        passwords = [generate_random_password() for _ in rows]
+        hashes = hash_passwords_bulk(passwords, _progress)
+
+        job.status = "inserting"
+        job.processed = len(rows)
+        db.session.commit()
+
+        new_slugs = []
+        # Todo rechazado: executemany con lista vacía insertaría una fila por defecto
+        if rows:
+            names_by_slug = {}
+            for row in rows:
+                names_by_slug.setdefault(row["restaurant_slug"], row["restaurant_name"])
+            # Solo ids ya autorizados: si otro crea uno de los slugs nuevos entretanto,
+            # la restricción única hace fallar el job en vez de escribir en su local
+            new_slugs = [slug for slug in names_by_slug if slug not in restaurant_ids]
+            if new_slugs:
+                ids = db.session.scalars(
+                    insert(Restaurant).returning(Restaurant.id, sort_by_parameter_order=True),
+                    [{"slug": slug, "name": names_by_slug[slug]} for slug in new_slugs],
+                ).all()
+                restaurant_ids.update(zip(new_slugs, ids))
+                if job.created_by_user_id:
+                    # Quien importa administra los restaurantes nuevos
+                    db.session.execute(insert(Membership), [
+                        {"user_id": job.created_by_user_id, "restaurant_id": restaurant_ids[slug], "role": "admin"}
+                        for slug in new_slugs
+                    ])
+
+            emails = allocate_staff_emails([(row["restaurant_slug"], row["name"]) for row in rows])
+            user_ids = db.session.scalars(
+                insert(User).returning(User.id, sort_by_parameter_order=True),
+                [{"email": email, "name": row["name"], "password_hash": hashed} for row, email, hashed in zip(rows, emails, hashes)],
+            ).all()
+            db.session.execute(insert(Staff), [
+                {
+                    "restaurant_id": restaurant_ids[row["restaurant_slug"]],
+                    "name": row["name"],
+                    "role": row["role"] or None,
+                    "bio": row["bio"] or None,
+                    "user_id": user_id,
+                    "login_initial_password": password,
+                }
+                for row, user_id, password in zip(rows, user_ids, passwords)
+            ])
+            db.session.execute(insert(Membership), [
+                {"user_id": user_id, "restaurant_id": restaurant_ids[row["restaurant_slug"]], "role": "staff"}
+                for row, user_id in zip(rows, user_ids)
+            ])
+
+        job.status = "done"
+        job.result = json.dumps({"restaurants_created": len(new_slugs), "staff_created": len(rows), "rejected": rejected})
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        job.status = "failed"
+        job.error = str(e)[:500]
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        raise
+    return job
+
+
+def start_import(job_id: int) -> None:
+    run_in_background(f"import-{job_id}", run_import, job_id)
+
+
+def backfill_staff_logins(batch_size: int = 200, progress=None) -> int:
+    """
+    Crea logins para el staff que no tiene usuario y migra emails heredados
+    (@staff.local), en lotes por id con un commit por lote. Se puede
+    interrumpir y relanzar: cada lote solo selecciona filas pendientes.
+    """
+    done = 0
+    last_id = 0
+    while True:
+        batch = (
+            db.session.query(Staff, Restaurant.slug, User)
+            .join(Restaurant, Restaurant.id == Staff.restaurant_id)
+            .outerjoin(User, User.id == Staff.user_id)
+            .filter(Staff.id > last_id)
+            .filter(or_(Staff.user_id.is_(None), User.email.like(f"%{LEGACY_EMAIL_SUFFIX}")))
+            .order_by(Staff.id.asc())
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            break
+        last_id = batch[-1][0].id
+        emails = allocate_staff_emails([(slug, staff.name) for staff, slug, _ in batch])
+
+        legacy = [(user, email) for (staff, _, user), email in zip(batch, emails) if user is not None]
+        for user, email in legacy:
+            user.email = email
+
+        missing = [(staff, email) for (staff, _, user), email in zip(batch, emails) if user is None]
+        if missing:
+            passwords = [generate_random_password() for _ in missing]
+            hashes = hash_passwords_bulk(passwords)
+            user_ids = db.session.scalars(
+                insert(User).returning(User.id, sort_by_parameter_order=True),
+                [{"email": email, "name": staff.name, "password_hash": hashed} for (staff, email), hashed in zip(missing, hashes)],
+            ).all()
+            for (staff, _), user_id, password in zip(missing, user_ids, passwords):
+                staff.user_id = user_id
+                staff.login_initial_password = password
+            db.session.execute(insert(Membership), [
+                {"user_id": user_id, "restaurant_id": staff.restaurant_id, "role": "staff"}
+                for (staff, _), user_id in zip(missing, user_ids)
+            ])
+        db.session.commit()
+        done += len(batch)
+        if progress:
+            progress(done)
+    return done
@@ -0,0 +1,109 @@
+from datetime import datetime
+from sqlalchemy import String, cast, literal, select, or_
+from ..extensions import db
+from ..models import Tip, Review, UserStat
+from ..utils.sql import month_key, upsert_insert
+
+
+def _bump(rows: list[dict]) -> None:
+    table = UserStat.__table__
+    stmt = upsert_insert(table).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.bucket, table.c.key],
+        set_={
+            "tips_count": table.c.tips_count + stmt.excluded.tips_count,
+            "tips_cents": table.c.tips_cents + stmt.excluded.tips_cents,
+            "reviews_count": table.c.reviews_count + stmt.excluded.reviews_count,
+        },
+    )
+    db.session.execute(stmt)
+
+
+def record_tip(tip: Tip) -> None:
+    if not tip.user_id:
+        return
+    created = tip.created_at or datetime.utcnow()
+    amount = int(tip.amount_cents or 0)
+    keys = [
+        ("total", ""),
+        ("month", created.strftime("%Y-%m")),
+        ("restaurant", str(tip.restaurant_id)),
+        ("method", tip.method_ui or "otro"),
+    ]
+    _bump([
+        {"user_id": tip.user_id, "bucket": b, "key": k, "tips_count": 1, "tips_cents": amount, "reviews_count": 0}
+        for b, k in keys
+    ])
+
+
+def record_review(review: Review) -> None:
+    if not review.user_id:
+        return
+    _bump([
+        {"user_id": review.user_id, "bucket": b, "key": k, "tips_count": 0, "tips_cents": 0, "reviews_count": 1}
+        for b, k in (("total", ""), ("restaurant", str(review.restaurant_id)))
+    ])
+
+
+def get_user_stats(user_id: int, months: int = 12) -> dict[str, dict[str, UserStat]]:
+    """Lee todos los contadores del usuario (meses limitados a los últimos `months`)."""
+    now = datetime.utcnow()
+    y, m = now.year, now.month - (months - 1)
+    while m <= 0:
+        m += 12
+        y -= 1
+    first_month = f"{y}-{m:02d}"
+    rows = (
+        UserStat.query.filter(UserStat.user_id == user_id)
+        .filter(or_(UserStat.bucket != "month", UserStat.key >= first_month))
+        .all()
+    )
+    out: dict[str, dict[str, UserStat]] = {"total": {}, "month": {}, "restaurant": {}, "method": {}}
+    for row in rows:
+        out.setdefault(row.bucket, {})[row.key] = row
+    return out
+
+
+def rebuild_user_stats(user_id: int | None = None) -> None:
+    """Reconstruye los contadores desde tips/reviews con INSERT ... SELECT agrupados."""
+    table = UserStat.__table__
+    delete = table.delete()
+    if user_id is not None:
+        delete = delete.where(table.c.user_id == user_id)
+    db.session.execute(delete)
+
+    def _scope(q, model):
+        q = q.where(model.user_id.isnot(None))
+        if user_id is not None:
+            q = q.where(model.user_id == user_id)
+        return q
+
+    tip_groups = [
+        (literal("total"), literal("")),
+        (literal("month"), month_key(Tip.created_at)),
+        (literal("restaurant"), cast(Tip.restaurant_id, String)),
+        (literal("method"), db.func.coalesce(Tip.method_ui, "otro")),
+    ]
+    for bucket, key in tip_groups:
+        q = select(
+            Tip.user_id, bucket, key,
+            db.func.count(Tip.id), db.func.coalesce(db.func.sum(Tip.amount_cents), 0), literal(0),
+        )
+        q = _scope(q, Tip).group_by(Tip.user_id, key)
+        db.session.execute(
+            table.insert().from_select(
+                ["user_id", "bucket", "key", "tips_count", "tips_cents", "reviews_count"], q
+            )
+        )
+
+    for bucket, key in ((literal("total"), literal("")), (literal("restaurant"), cast(Review.restaurant_id, String))):
+        q = select(Review.user_id, bucket, key, literal(0), literal(0), db.func.count(Review.id))
+        q = _scope(q, Review).group_by(Review.user_id, key)
+        stmt = upsert_insert(table).from_select(
+            ["user_id", "bucket", "key", "tips_count", "tips_cents", "reviews_count"], q
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.bucket, table.c.key],
+            set_={"reviews_count": stmt.excluded.reviews_count},
+        )
+        db.session.execute(stmt)
@@ -1,13 +1,33 @@
 from datetime import datetime
+from sqlalchemy.exc import IntegrityError
 from ..extensions import db
 from ..models import Tip, User
 from .reward_service import add_xp
+from .stats_service import record_tip
+from .achievement_service import record_event, tip_event
+from ..utils.metrics import timed_write
 
 
-def create_tip(restaurant_id: int, staff_id: int | None, user: User | None, amount_cents: int, method_ui: str) -> Tip:
-    tip = Tip(restaurant_id=restaurant_id, staff_id=staff_id, user_id=user.id if user else None, amount_cents=amount_cents, method_ui=method_ui, status="recorded", created_at=datetime.utcnow())
-    db.session.add(tip)
-    if user:
-        add_xp(user, 10)
-    db.session.commit()
+def create_tip(restaurant_id: int, staff_id: int | None, user: User | None, amount_cents: int, method_ui: str, idempotency_key: str | None = None) -> Tip:
+    """Con `idempotency_key`, un reenvío de la misma propina devuelve la ya registrada."""
+    if idempotency_key:
+        existing = Tip.query.filter_by(restaurant_id=restaurant_id, idempotency_key=idempotency_key).first()
+        if existing:
+            return existing
+    with timed_write("tip"):
+        try:
+            tip = Tip(restaurant_id=restaurant_id, staff_id=staff_id, user_id=user.id if user else None, amount_cents=amount_cents, method_ui=method_ui, status="recorded", created_at=datetime.utcnow(), idempotency_key=idempotency_key)
+            db.session.add(tip)
+            if user:
+                add_xp(user, 10)
+                record_event(tip_event(tip))
+                record_tip(tip)
+            db.session.commit()
+        except IntegrityError:
+            # Dos reenvíos simultáneos con la misma clave: se queda el primero
+            db.session.rollback()
+            existing = Tip.query.filter_by(restaurant_id=restaurant_id, idempotency_key=idempotency_key).first() if idempotency_key else None
+            if not existing:
+                raise
+            return existing
     return tip
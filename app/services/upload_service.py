@@ -0,0 +1,211 @@
+import errno
+import json
+import os
+import re
+import secrets
+import time
+from contextlib import contextmanager
+
+from flask import current_app, request
+from werkzeug.datastructures import FileStorage
+
+from .image_service import ALLOWED_EXTS, parse_upload_hint, process_and_save_image
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+# Subidas por trozos (init/append/finalize, estilo tus). Los trozos se
+# escriben en UPLOADS_DIR/.partial y la imagen solo se procesa al enviar
+# el formulario que referencia el id de la subida.
+PARTIAL_DIRNAME = ".partial"
+PARTIAL_TTL_SECONDS = 24 * 3600
+_ID_RE = re.compile(r"^[A-Za-z0-9_-]{16,64}$")
+_COPY_BLOCK = 64 * 1024
+
+
+# En Windows msvcrt bloquea rangos de bytes de forma obligatoria: se bloquea
+# un byte muy por encima de cualquier subida para no estorbar lecturas/escrituras
+_WIN_LOCK_OFFSET = 2 ** 31 - 2
+
+
+class UploadNotFound(LookupError):
+    pass
+
+
+class UploadOffsetMismatch(ValueError):
+    def __init__(self, offset: int):
+        super().__init__("Upload offset mismatch")
+        self.offset = offset
+
+
+def _partial_dir() -> str:
+    path = os.path.join(current_app.config.get("UPLOADS_DIR", "./uploads"), PARTIAL_DIRNAME)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _paths(upload_id: str) -> tuple[str, str]:
+    if not upload_id or not _ID_RE.match(upload_id):
+        raise UploadNotFound(upload_id)
+    base = os.path.join(_partial_dir(), upload_id)
+    return base + ".json", base + ".part"
+
+
+def _load_meta(upload_id: str) -> tuple[dict, str]:
+    meta_path, part_path = _paths(upload_id)
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        raise UploadNotFound(upload_id)
+    return meta, part_path
+
+
+def chunk_size() -> int:
+    return int(current_app.config.get("UPLOAD_CHUNK_KB", 256)) * 1024
+
+
+def _purge_stale() -> None:
+    cutoff = time.time() - PARTIAL_TTL_SECONDS
+    folder = _partial_dir()
+    for name in os.listdir(folder):
+        path = os.path.join(folder, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def init_upload(filename: str, size: int) -> str:
+    max_bytes = int(current_app.config.get("MAX_IMAGE_MB", 2)) * 1024 * 1024
+    ext = filename.rsplit(".", 1)[-1].lower() if "." in (filename or "") else ""
+    if ext not in ALLOWED_EXTS:
+        raise ValueError("JPG/PNG only")
+    if size <= 0 or size > max_bytes:
+        raise ValueError("Image exceeds size limit")
+    _purge_stale()
+    upload_id = secrets.token_urlsafe(18)
+    meta_path, part_path = _paths(upload_id)
+    with open(meta_path, "w") as f:
+        json.dump({"filename": filename, "size": int(size), "created": int(time.time())}, f)
+    open(part_path, "wb").close()
+    return upload_id
+
+
+def upload_status(upload_id: str) -> tuple[int, int]:
+    """Devuelve (offset actual, tamaño total)."""
+    meta, part_path = _load_meta(upload_id)
+    try:
+        offset = os.path.getsize(part_path)
+    except OSError:
+        raise UploadNotFound(upload_id)
+    return offset, int(meta["size"])
+
+
+@contextmanager
+def _file_lock(f, shared: bool = False):
+    """Lock del fichero abierto `f` entre procesos (en Windows siempre exclusivo)."""
+    if fcntl is not None:
+        fcntl.flock(f, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+        return
+    pos = f.tell()
+    f.seek(_WIN_LOCK_OFFSET)
+    while True:
+        try:
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            break
+        except OSError as e:
+            # LK_LOCK se rinde tras ~10 s; se sigue esperando como flock
+            if e.errno != errno.EDEADLOCK:
+                raise
+    f.seek(pos)
+    try:
+        yield
+    finally:
+        pos = f.tell()
+        f.seek(_WIN_LOCK_OFFSET)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        f.seek(pos)
+
+
+def append_chunk(upload_id: str, offset: int, stream) -> int:
+    meta, part_path = _load_meta(upload_id)
+    total = int(meta["size"])
+    try:
+        f = open(part_path, "r+b")
+    except OSError:
+        raise UploadNotFound(upload_id)
+    # Lock exclusivo: un reintento que se solapa con el PATCH anterior
+    # espera y vuelve a comprobar el offset en vez de escribir encima
+    with f, _file_lock(f):
+        current = os.fstat(f.fileno()).st_size
+        if offset != current:
+            raise UploadOffsetMismatch(current)
+        limit = min(chunk_size(), total - current)
+        f.seek(current)
+        written = 0
+        while True:
+            block = stream.read(min(_COPY_BLOCK, limit - written + 1))
+            if not block:
+                break
+            written += len(block)
+            if written > limit:
+                # Descartamos el trozo entero para que el cliente reintente desde el offset previo
+                f.truncate(current)
+                raise ValueError("Chunk too large")
+            f.write(block)
+        f.flush()
+    return current + written
+
+
+def discard_upload(upload_id: str) -> None:
+    for path in _paths(upload_id):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+@contextmanager
+def uploaded_file(field: str):
+    """
+    Devuelve el fichero del campo `field`: el adjunto multipart habitual o,
+    si el formulario trae `<field>_upload`, la subida por trozos completada
+    (que se elimina al terminar correctamente).
+    """
+    direct = request.files.get(field)
+    if direct and (direct.filename or "").strip():
+        yield direct
+        return
+    upload_id = (request.form.get(f"{field}_upload") or "").strip()
+    if not upload_id:
+        yield None
+        return
+    try:
+        meta, part_path = _load_meta(upload_id)
+        fh = open(part_path, "rb")
+    except (UploadNotFound, OSError):
+        raise ValueError("Upload expired, please try again")
+    # Compartido: no se procesa mientras un PATCH rezagado sigue escribiendo
+    with fh, _file_lock(fh, shared=True):
+        if os.fstat(fh.fileno()).st_size != int(meta["size"]):
+            raise ValueError("Upload incomplete")
+        yield FileStorage(stream=fh, filename=meta["filename"], name=field)
+    discard_upload(upload_id)
+
+
+def save_uploaded_image(field: str):
+    """Procesa la imagen del campo `field` (directa o por trozos); None si no hay."""
+    with uploaded_file(field) as file_storage:
+        if file_storage is None:
+            return None
+        return process_and_save_image(file_storage, parse_upload_hint(request.form.get(f"{field}_hint")))
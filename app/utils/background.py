@@ -0,0 +1,19 @@
+import threading
+
+from flask import current_app
+
+
+def run_in_background(name: str, fn, *args) -> threading.Thread:
+    """Ejecuta `fn(*args)` en un hilo daemon con su propio contexto de app."""
+    app = current_app._get_current_object()
+
+    def _worker():
+        with app.app_context():
+            try:
+                fn(*args)
+            except Exception:
+                app.logger.exception("Background task %s failed", name)
+
+    thread = threading.Thread(target=_worker, name=name, daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,65 @@
+import threading
+import time
+from collections import OrderedDict
+
+from .metrics import CACHE_REQUESTS
+
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Caché en memoria por proceso con caducidad y tamaño máximo (LRU).
+    Lleva contadores de aciertos/fallos para poder exponer el ratio; con
+    `name` también se exportan en /metrics (cache_requests_total).
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 10000, name: str | None = None):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._hit_metric = CACHE_REQUESTS.labels(name, "hit") if name else None
+        self._miss_metric = CACHE_REQUESTS.labels(name, "miss") if name else None
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING and item[0] > now:
+                self._data.move_to_end(key)
+                self.hits += 1
+                value = item[1]
+            else:
+                if item is not _MISSING:
+                    del self._data[key]
+                self.misses += 1
+                value = _MISSING
+        if value is _MISSING:
+            if self._miss_metric:
+                self._miss_metric.inc()
+            return default
+        if self._hit_metric:
+            self._hit_metric.inc()
+        return value
+
+    def set(self, key, value) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def discard(self, key) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
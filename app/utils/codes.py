@@ -1,3 +1,5 @@
+import hashlib
+import hmac
 import random
 import string
 
@@ -6,3 +8,35 @@ def generate_code(length: int = 8) -> str:
     alphabet = string.ascii_uppercase + string.digits
     return ''.join(random.choice(alphabet) for _ in range(length))
 
+
+# Base32 Crockford: sin I, L, O, U para que los códigos se puedan dictar
+CODE_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+# 13 caracteres de 5 bits cubren los 64 bits de la permutación
+CODE_LENGTH = 13
+_HALF_BITS = 32
+_HALF_MASK = (1 << _HALF_BITS) - 1
+_ROUNDS = 4
+
+
+def _round_fn(key: bytes, rnd: int, half: int) -> int:
+    digest = hmac.digest(key, bytes((rnd,)) + half.to_bytes(4, "big"), hashlib.sha256)
+    return int.from_bytes(digest[:4], "big")
+
+
+def permute64(value: int, key: bytes) -> int:
+    """Permutación Feistel con clave sobre 64 bits: biyectiva, así que no hay colisiones."""
+    left, right = (value >> _HALF_BITS) & _HALF_MASK, value & _HALF_MASK
+    for rnd in range(_ROUNDS):
+        left, right = right, left ^ _round_fn(key, rnd, right)
+    return (left << _HALF_BITS) | right
+
+
+def encode_base32(value: int, length: int = CODE_LENGTH) -> str:
+    return "".join(CODE_ALPHABET[(value >> (5 * i)) & 31] for i in range(length - 1, -1, -1))
+
+
+def sequence_code(seq: int, key: str | bytes) -> str:
+    """Código único y no adivinable para un número de secuencia de 64 bits."""
+    if isinstance(key, str):
+        key = key.encode()
+    return encode_base32(permute64(seq & ((1 << 64) - 1), key))
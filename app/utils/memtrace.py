@@ -0,0 +1,144 @@
+import json
+import os
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+from flask import current_app, g, has_request_context, request
+
+from .metrics import MEMORY_PEAK
+
+
+_lock = threading.Lock()
+_users = 0
+_owned = False
+_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def current_rss_bytes() -> int:
+    """RSS actual del proceso (Linux); en otros sistemas, el pico (ru_maxrss) o 0."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return _max_rss_bytes()
+
+
+def _acquire(frames: int) -> None:
+    # tracemalloc es global del proceso: se arranca con la primera medición y
+    # se para con la última (salvo que ya viniera activo, p. ej. PYTHONTRACEMALLOC)
+    global _users, _owned
+    with _lock:
+        if _users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+            _owned = True
+        _users += 1
+
+
+def _release() -> None:
+    global _users, _owned
+    with _lock:
+        _users -= 1
+        if _users == 0 and _owned:
+            tracemalloc.stop()
+            _owned = False
+
+
+def _max_rss_bytes() -> int:
+    """Pico de RSS (ru_maxrss); 0 donde no hay `resource` (Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _top_sites(limit: int) -> list[str]:
+    stats = tracemalloc.take_snapshot().filter_traces(_FILTERS).statistics("lineno")
+    return [
+        f"{s.traceback[0].filename}:{s.traceback[0].lineno} {s.size / 1024:.0f} KiB x{s.count}"
+        for s in stats[:limit]
+    ]
+
+
+def _note_peak(peak: int) -> None:
+    if has_request_context() and "memtrace" in g:
+        g.memtrace["peak"] = max(g.memtrace["peak"], peak)
+
+
+def _report(label: str, used: int, rss_growth: int) -> None:
+    cfg = current_app.config
+    MEMORY_PEAK.labels(label).observe(used)
+    budget = float(cfg.get("MEMTRACE_BUDGET_MB", 64)) * 1024 * 1024
+    # Los buffers de píxeles de Pillow no pasan por tracemalloc: el
+    # crecimiento del pico de RSS del proceso los delata
+    if used <= budget and rss_growth <= budget:
+        return
+    # Se toma al final: muestra lo que sigue vivo (respuesta, imagen, identity map)
+    current_app.logger.warning(json.dumps({
+        "event": "memory_budget",
+        "label": label,
+        "path": request.path if has_request_context() else None,
+        "peak_mb": round(used / 1024 / 1024, 1),
+        "max_rss_growth_mb": round(rss_growth / 1024 / 1024, 1),
+        "budget_mb": cfg.get("MEMTRACE_BUDGET_MB", 64),
+        "rss_mb": round(current_rss_bytes() / 1024 / 1024, 1),
+        "top": _top_sites(int(cfg.get("MEMTRACE_TOP", 10))),
+    }))
+
+
+@contextmanager
+def memory_section(label: str):
+    """
+    Mide el pico de memoria asignada dentro del bloque (p. ej. procesar una
+    imagen) aunque el endpoint no esté en MEMTRACE_ENDPOINTS. Sin
+    MEMTRACE_ENABLED no hace nada.
+    """
+    if not current_app.config.get("MEMTRACE_ENABLED"):
+        yield
+        return
+    _acquire(int(current_app.config.get("MEMTRACE_FRAMES", 1)))
+    try:
+        # reset_peak borra el pico de la petición que nos contiene: se guarda antes
+        _note_peak(tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        max_rss = _max_rss_bytes()
+        yield
+    finally:
+        peak = tracemalloc.get_traced_memory()[1]
+        _note_peak(peak)
+        _report(label, peak - base, _max_rss_bytes() - max_rss)
+        _release()
+
+
+def init_memtrace(app) -> None:
+    """Pico de memoria por petición (tracemalloc) para los endpoints de MEMTRACE_ENDPOINTS."""
+    if not app.config.get("MEMTRACE_ENABLED"):
+        return
+    endpoints = set(app.config.get("MEMTRACE_ENDPOINTS") or ())
+    frames = int(app.config.get("MEMTRACE_FRAMES", 1))
+
+    @app.before_request
+    def _start_memtrace():
+        if request.endpoint not in endpoints:
+            return
+        _acquire(frames)
+        tracemalloc.reset_peak()
+        g.memtrace = {"base": tracemalloc.get_traced_memory()[0], "peak": 0, "max_rss": _max_rss_bytes()}
+
+    @app.teardown_request
+    def _stop_memtrace(exc=None):
+        state = g.pop("memtrace", None)
+        if state is None:
+            return
+        try:
+            peak = max(state["peak"], tracemalloc.get_traced_memory()[1])
+            _report(request.endpoint, peak - state["base"], _max_rss_bytes() - state["max_rss"])
+        finally:
+            _release()
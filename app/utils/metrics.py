@@ -0,0 +1,163 @@
+import hmac
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+from flask import Response, current_app, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+
+# Con PROMETHEUS_MULTIPROC_DIR definido (antes de importar prometheus_client)
+# cada worker escribe sus valores en ficheros mmap de ese directorio y
+# /metrics los agrega todos al servir la petición.
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Request latency by endpoint",
+    ("blueprint", "endpoint", "method", "status"), buckets=_LATENCY_BUCKETS,
+)
+WRITES = Counter("app_writes_total", "Tips and reviews written", ("kind", "outcome"))
+WRITE_LATENCY = Histogram(
+    "app_write_duration_seconds", "Tip and review write latency", ("kind",), buckets=_LATENCY_BUCKETS,
+)
+IMAGE_SECONDS = Histogram(
+    "image_processing_seconds", "Image processing duration", ("mode",),
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+IMAGE_BYTES = Histogram(
+    "image_processing_bytes", "Image size before and after processing", ("stage",),
+    buckets=(16e3, 64e3, 128e3, 256e3, 512e3, 1e6, 2e6, 5e6, 10e6),
+)
+POOL_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Time waiting for a pooled DB connection",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30),
+)
+POOL_SIZE = Gauge("db_pool_size", "Configured pool size (all workers)", multiprocess_mode="livesum")
+POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "Connections in use (all workers)", multiprocess_mode="livesum")
+CACHE_REQUESTS = Counter("cache_requests_total", "In-process cache lookups", ("cache", "result"))
+MEMORY_PEAK = Histogram(
+    "memory_peak_bytes", "Peak traced allocation per request or section (MEMTRACE_ENABLED)", ("label",),
+    buckets=tuple(mb * 1024 * 1024 for mb in (1, 4, 16, 32, 64, 128, 256, 512)),
+)
+WORKER_RSS = Gauge("worker_rss_bytes", "Resident memory of the largest live worker", multiprocess_mode="livemax")
+RATELIMIT_REJECTIONS = Counter("ratelimit_rejections_total", "Requests rejected by the rate limiter", ("endpoint",))
+
+
+@contextmanager
+def timed_write(kind: str):
+    """Cuenta y cronometra una escritura (propina, reseña); outcome=error si lanza."""
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        WRITE_LATENCY.labels(kind).observe(time.perf_counter() - started)
+        WRITES.labels(kind, outcome).inc()
+
+
+def _instrument_pool(pool) -> None:
+    if not isinstance(pool, QueuePool) or getattr(pool, "_metrics_timed", False):
+        return
+    POOL_SIZE.set(pool.size())
+    # No hay evento público "antes del checkout": la espera se cronometra
+    # envolviendo la obtención del pool, solo si esta versión la tiene
+    do_get = getattr(pool, "_do_get", None)
+    if not callable(do_get):
+        logging.getLogger(__name__).warning("QueuePool._do_get not found: db_pool_checkout_wait_seconds disabled")
+        return
+
+    def _timed_do_get():
+        started = time.perf_counter()
+        try:
+            return do_get()
+        finally:
+            POOL_WAIT.observe(time.perf_counter() - started)
+
+    pool._do_get = _timed_do_get
+    pool._metrics_timed = True
+
+
+def _instrument_engine(engine) -> None:
+    if not isinstance(engine.pool, QueuePool):
+        return
+    _instrument_pool(engine.pool)
+
+    # Se lee del pool en vez de llevar la cuenta: no deriva con conexiones invalidadas
+    def _checked_out(*args):
+        POOL_CHECKED_OUT.set(engine.pool.checkedout())
+
+    def _checked_in(*args):
+        # "checkin" se emite antes de devolver la conexión a la cola
+        POOL_CHECKED_OUT.set(max(engine.pool.checkedout() - 1, 0))
+
+    event.listen(engine, "connect", _checked_out)
+    event.listen(engine, "checkout", _checked_out)
+    event.listen(engine, "checkin", _checked_in)
+
+    @event.listens_for(engine, "engine_disposed")
+    def _recreated(eng):
+        # dispose() sustituye el pool por uno nuevo (con los mismos listeners)
+        _instrument_pool(eng.pool)
+        POOL_CHECKED_OUT.set(eng.pool.checkedout())
+
+
+def metrics_response() -> Response:
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+
+def init_metrics(app) -> None:
+    """Latencia por endpoint, rechazos del limitador y métricas del pool de BD."""
+    if not app.config.get("METRICS_ENABLED", True):
+        return
+
+    from ..extensions import db
+    with app.app_context():
+        for engine in db.engines.values():
+            _instrument_engine(engine)
+
+    def _start_request_timer():
+        g.metrics_started = time.perf_counter()
+
+    # Primero de todos, antes que el limitador: así también cuentan los 429
+    app.before_request_funcs.setdefault(None, []).insert(0, _start_request_timer)
+
+    @app.after_request
+    def _observe_request(response):
+        started = g.pop("metrics_started", None)
+        if started is None:
+            return response
+        # Sin endpoint (404) se agrupa todo en "-" para acotar la cardinalidad
+        endpoint = request.endpoint or "-"
+        REQUEST_LATENCY.labels(
+            request.blueprint or "-", endpoint, request.method, str(response.status_code)
+        ).observe(time.perf_counter() - started)
+        if response.status_code == 429:
+            RATELIMIT_REJECTIONS.labels(endpoint).inc()
+        return response
+
+
+def metrics_authorized() -> bool:
+    token = current_app.config.get("METRICS_TOKEN")
+    if not token:
+        return bool(current_app.config.get("METRICS_PUBLIC"))
+    return hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}")
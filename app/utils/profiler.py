@@ -0,0 +1,185 @@
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+from flask import g, request
+
+
+_SAFE_NAME = re.compile(r"[^A-Za-z0-9_.-]+")
+# Nombre de fichero: <epoch_ms>-<duración_ms>ms-<pid>.folded
+_FILE_RE = re.compile(r"^(\d+)-(\d+)ms-(\d+)\.folded$")
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__") or os.path.basename(code.co_filename)
+    return f"{module}:{code.co_name}:{code.co_firstlineno}"
+
+
+def _collapse(frame) -> str:
+    # Formato "collapsed" (flamegraph.pl / speedscope): raíz primero, separado por ';'
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class SamplingProfiler:
+    """
+    Profiler estadístico por proceso: un único hilo que cada `interval`
+    segundos lee las pilas (sys._current_frames) de los hilos con una
+    petición perfilada en curso. Sin peticiones perfiladas el hilo duerme,
+    así que con un muestreo del 1% el coste es prácticamente nulo.
+    """
+
+    def __init__(self):
+        self._active: dict[int, Counter] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pid = None
+        self.interval = 0.01
+
+    def _ensure_thread(self) -> None:
+        # Tras el fork de gunicorn el hilo del padre no existe
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._active = {}
+        threading.Thread(target=self._run, name="sampling-profiler", daemon=True).start()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while True:
+            if not self._active:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, samples in self._active.items():
+                    frame = frames.get(ident)
+                    if frame is not None and ident != own:
+                        samples[_collapse(frame)] += 1
+            del frames
+
+    def start(self) -> None:
+        self._ensure_thread()
+        with self._lock:
+            self._active[threading.get_ident()] = Counter()
+        self._wake.set()
+
+    def stop(self) -> Counter:
+        with self._lock:
+            return self._active.pop(threading.get_ident(), Counter())
+
+
+profiler = SamplingProfiler()
+
+
+def profile_dir(app) -> str:
+    return app.config.get("PROFILE_DIR") or os.path.join(app.instance_path, "profiles")
+
+
+def _write_profile(base_dir: str, endpoint: str, ms: float, samples: Counter, keep: int) -> None:
+    folder = os.path.join(base_dir, _SAFE_NAME.sub("_", endpoint))
+    os.makedirs(folder, exist_ok=True)
+    name = f"{int(time.time() * 1000)}-{int(ms)}ms-{os.getpid()}.folded"
+    tmp = os.path.join(folder, f".{name}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        for stack, n in samples.most_common():
+            f.write(f"{stack} {n}\n")
+    os.replace(tmp, os.path.join(folder, name))
+    # Solo las `keep` más recientes por endpoint
+    files = sorted(fn for fn in os.listdir(folder) if _FILE_RE.match(fn))
+    for old in files[:-keep]:
+        try:
+            os.remove(os.path.join(folder, old))
+        except OSError:
+            pass
+
+
+def list_profiles(base_dir: str, limit: int = 50) -> list[dict]:
+    """Las muestras más lentas guardadas (todas las del directorio, de todos los workers)."""
+    found = []
+    if not os.path.isdir(base_dir):
+        return found
+    for endpoint in os.listdir(base_dir):
+        folder = os.path.join(base_dir, endpoint)
+        if not os.path.isdir(folder):
+            continue
+        for fn in os.listdir(folder):
+            m = _FILE_RE.match(fn)
+            if m:
+                found.append({
+                    "endpoint": endpoint,
+                    "file": f"{endpoint}/{fn}",
+                    "at": int(m.group(1)) / 1000,
+                    "ms": int(m.group(2)),
+                    "pid": int(m.group(3)),
+                })
+    found.sort(key=lambda p: p["ms"], reverse=True)
+    return found[:limit]
+
+
+def profile_breakdown(path: str) -> dict:
+    """Reparto de muestras entre SQL, plantillas Jinja y el resto (Python)."""
+    totals = Counter()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            stack, _, n = line.rstrip("\n").rpartition(" ")
+            if not n.isdigit():
+                continue
+            if "sqlalchemy." in stack:
+                kind = "sql"
+            elif "jinja2." in stack:
+                kind = "jinja"
+            else:
+                kind = "python"
+            totals[kind] += int(n)
+    total = sum(totals.values()) or 1
+    return {"samples": sum(totals.values()), **{k: round(100 * totals[k] / total) for k in ("sql", "jinja", "python")}}
+
+
+def init_profiler(app) -> None:
+    """
+    Perfila una fracción PROFILE_SAMPLE_RATE de las peticiones y, con
+    PROFILE_SLOW_MS, todas las que superen ese tiempo (en ese caso se
+    muestrean todas y solo se guardan las lentas). Cada perfil se escribe
+    como pila colapsada en PROFILE_DIR/<endpoint>/.
+    """
+    rate = float(app.config.get("PROFILE_SAMPLE_RATE", 0) or 0)
+    slow_ms = float(app.config.get("PROFILE_SLOW_MS", 0) or 0)
+    if rate <= 0 and slow_ms <= 0:
+        return
+    profiler.interval = max(0.001, float(app.config.get("PROFILE_INTERVAL_MS", 10)) / 1000)
+    keep = max(1, int(app.config.get("PROFILE_KEEP", 50)))
+    base_dir = profile_dir(app)
+
+    @app.before_request
+    def _start_profile():
+        sampled = rate > 0 and random.random() < rate
+        if sampled or slow_ms > 0:
+            g.profile = (time.perf_counter(), sampled)
+            profiler.start()
+
+    @app.teardown_request
+    def _stop_profile(exc=None):
+        started = g.pop("profile", None)
+        if started is None:
+            return
+        samples = profiler.stop()
+        ms = (time.perf_counter() - started[0]) * 1000
+        if samples and (started[1] or (slow_ms > 0 and ms >= slow_ms)):
+            try:
+                _write_profile(base_dir, request.endpoint or "-", ms, samples, keep)
+            except OSError:
+                app.logger.exception("Could not write profile")
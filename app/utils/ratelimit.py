@@ -0,0 +1,198 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from math import floor
+
+from flask import current_app, request
+from flask_limiter.util import get_remote_address
+from limits.storage import SlidingWindowCounterSupport, Storage
+from limits.storage.base import TimestampedSlidingWindow
+
+
+# Cada cuánto (segundos) un proceso purga contadores caducados
+_PURGE_EVERY = 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ratelimit (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL,
+    expires_at REAL NOT NULL
+) WITHOUT ROWID
+"""
+
+# Suma a un contador; si había caducado empieza de cero con la nueva expiración
+_INCR = """
+INSERT INTO ratelimit (key, value, expires_at) VALUES (:key, :amount, :expires_at)
+ON CONFLICT(key) DO UPDATE SET
+    value = CASE WHEN expires_at <= :now THEN excluded.value ELSE value + excluded.value END,
+    expires_at = CASE WHEN expires_at <= :now THEN excluded.expires_at ELSE expires_at END
+RETURNING value
+"""
+
+
+class SQLiteStorage(Storage, SlidingWindowCounterSupport, TimestampedSlidingWindow):
+    """
+    Almacén de Flask-Limiter en un fichero SQLite local (WAL) compartido
+    por todos los workers de la máquina, así los límites no se multiplican
+    por el número de procesos ni se pierden al reiniciar.
+
+    URI: ``sqlite:///ratelimit.db`` (relativa) o ``sqlite:////ruta/absoluta.db``.
+    Una conexión por hilo y proceso; cada comprobación es una transacción
+    corta sobre una tabla WITHOUT ROWID (decenas de microsegundos).
+    """
+
+    STORAGE_SCHEME = ["sqlite"]
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False, timeout: float = 1.0, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        path = uri.split("://", 1)[1]
+        # Misma convención que SQLAlchemy: sqlite:///rel.db, sqlite:////abs.db
+        self.path = path[1:] if path.startswith("/") else path
+        if not self.path:
+            raise ValueError("RATELIMIT_STORAGE_URI needs a file path, e.g. sqlite:///ratelimit.db")
+        self.timeout = float(timeout)
+        self._local = threading.local()
+        self._next_purge = 0.0
+        self._connection().execute(_SCHEMA)
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _connection(self) -> sqlite3.Connection:
+        # Tras un fork (gunicorn --preload) no se reutiliza la conexión del padre
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # En WAL, NORMAL no hace fsync en cada commit; perder contadores en un corte da igual
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _maybe_purge(self, conn: sqlite3.Connection, now: float) -> None:
+        if now < self._next_purge:
+            return
+        self._next_purge = now + _PURGE_EVERY
+        conn.execute("DELETE FROM ratelimit WHERE expires_at <= ?", (now,))
+
+    # ---- Ventana fija ----
+
+    def incr(self, key: str, expiry: float, amount: int = 1) -> int:
+        now = time.time()
+        conn = self._connection()
+        row = conn.execute(_INCR, {"key": key, "amount": amount, "expires_at": now + expiry, "now": now}).fetchone()
+        self._maybe_purge(conn, now)
+        return row[0]
+
+    def get(self, key: str) -> int:
+        row = self._connection().execute(
+            "SELECT value FROM ratelimit WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else 0
+
+    def get_expiry(self, key: str) -> float:
+        row = self._connection().execute("SELECT expires_at FROM ratelimit WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else time.time()
+
+    def clear(self, key: str) -> None:
+        self._connection().execute("DELETE FROM ratelimit WHERE key = ?", (key,))
+
+    def check(self) -> bool:
+        try:
+            self._connection().execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self) -> int | None:
+        return self._connection().execute("DELETE FROM ratelimit").rowcount
+
+    # ---- Ventana deslizante (contador actual + anterior ponderado) ----
+
+    def _window(self, conn, previous_key: str, current_key: str, expiry: int, now: float):
+        counts = dict(conn.execute(
+            "SELECT key, value FROM ratelimit WHERE key IN (?, ?) AND expires_at > ?",
+            (previous_key, current_key, now),
+        ).fetchall())
+        previous_count = counts.get(previous_key, 0)
+        previous_ttl = (1 - (((now - expiry) / expiry) % 1)) * expiry if previous_count else 0.0
+        current_ttl = (1 - ((now / expiry) % 1)) * expiry + expiry
+        return previous_count, previous_ttl, counts.get(current_key, 0), current_ttl
+
+    def acquire_sliding_window_entry(self, key: str, limit: int, expiry: int, amount: int = 1) -> bool:
+        if amount > limit:
+            return False
+        now = time.time()
+        previous_key, current_key = self.sliding_window_keys(key, expiry, now)
+        conn = self._connection()
+        # BEGIN IMMEDIATE: leer y sumar de forma atómica entre procesos
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            previous_count, previous_ttl, current_count, _ = self._window(conn, previous_key, current_key, expiry, now)
+            allowed = floor(previous_count * previous_ttl / expiry + current_count) + amount <= limit
+            if allowed:
+                # El contador actual se guarda dos ventanas: luego hace de "anterior"
+                conn.execute(_INCR, {"key": current_key, "amount": amount, "expires_at": now + 2 * expiry, "now": now})
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._maybe_purge(conn, now)
+        return allowed
+
+    def get_sliding_window(self, key: str, expiry: int) -> tuple[int, float, int, float]:
+        now = time.time()
+        previous_key, current_key = self.sliding_window_keys(key, expiry, now)
+        return self._window(self._connection(), previous_key, current_key, expiry, now)
+
+    def clear_sliding_window(self, key: str, expiry: int) -> None:
+        previous_key, current_key = self.sliding_window_keys(key, expiry, time.time())
+        self._connection().execute("DELETE FROM ratelimit WHERE key IN (?, ?)", (previous_key, current_key))
+
+
+def _device_key() -> str | None:
+    from .device import get_device_id
+
+    did = get_device_id()
+    if not did:
+        return None
+    try:
+        return str(uuid.UUID(did))
+    except ValueError:
+        return None
+
+
+def ip_ceiling() -> str:
+    return current_app.config.get("RATELIMIT_IP_CEILING") or "600 per minute"
+
+
+def login_limit() -> str:
+    return current_app.config.get("LOGIN_RATELIMIT") or "10 per minute"
+
+
+def rate_limit_key() -> str:
+    """
+    Clave de rate limiting según RATELIMIT_KEY: partes unidas con "+" de
+    ip, device (cookie del dispositivo) y restaurant (slug de la URL).
+    El Wi-Fi del local saca a todos por la misma IP, así que por defecto
+    se limita por dispositivo y restaurante; sin cookie válida se usa la IP.
+    La cookie la controla el cliente, así que además hay un techo por IP
+    (RATELIMIT_IP_CEILING) y el login se limita solo por IP (LOGIN_RATELIMIT).
+    """
+    parts = []
+    for part in current_app.config.get("RATELIMIT_KEY", "device+restaurant").split("+"):
+        part = part.strip()
+        if part == "device":
+            did = _device_key()
+            parts.append(f"d:{did}" if did else f"ip:{get_remote_address()}")
+        elif part == "restaurant":
+            slug = (request.view_args or {}).get("restaurant_slug")
+            if slug:
+                parts.append(f"r:{slug}")
+        else:
+            parts.append(f"ip:{get_remote_address()}")
+    return "|".join(parts) or f"ip:{get_remote_address()}"
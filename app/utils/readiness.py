@@ -0,0 +1,120 @@
+import os
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import inspect, text
+from sqlalchemy.pool import QueuePool
+
+from ..extensions import db
+from .background import run_in_background
+
+
+class ReadinessProbe:
+    """
+    Estado de preparación de este proceso. Un hilo en segundo plano mide
+    cada HEALTH_INTERVAL_S la latencia de la BD, la saturación del pool, la
+    revisión de migraciones y la escritura en UPLOADS_DIR; /health/ready
+    solo lee la última foto, así que el probe no cuesta nada.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._heads = None
+        self.snapshot = None
+        self.checked_at = 0.0
+
+    def ensure_started(self) -> None:
+        # Un hilo por proceso: tras el fork de gunicorn el del padre no existe
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        run_in_background("readiness-probe", self._loop)
+
+    def _loop(self) -> None:
+        interval = float(current_app.config.get("HEALTH_INTERVAL_S", 5))
+        while True:
+            self.refresh()
+            time.sleep(interval)
+
+    def refresh(self) -> dict:
+        cfg = current_app.config
+        checks = {
+            "database": self._check(self._database, float(cfg.get("HEALTH_DB_MAX_MS", 250))),
+            "pool": self._check(self._pool),
+            "migrations": self._check(self._migrations),
+            "storage": self._check(self._storage, float(cfg.get("HEALTH_STORAGE_MAX_MS", 500))),
+        }
+        snapshot = {"ready": all(c["ok"] for c in checks.values()), "checks": checks}
+        self.snapshot, self.checked_at = snapshot, time.monotonic()
+        return snapshot
+
+    def status(self) -> tuple[bool, dict]:
+        snapshot = self.snapshot
+        if snapshot is None:
+            return False, {"ready": False, "reason": "starting"}
+        age = time.monotonic() - self.checked_at
+        # Si el hilo lleva tres intervalos sin refrescar, algo está colgado
+        if age > 3 * float(current_app.config.get("HEALTH_INTERVAL_S", 5)):
+            return False, {**snapshot, "ready": False, "reason": "stale", "age_s": round(age, 1)}
+        return snapshot["ready"], {**snapshot, "age_s": round(age, 1)}
+
+    @staticmethod
+    def _check(fn, *args) -> dict:
+        try:
+            return fn(*args)
+        except Exception as e:
+            return {"ok": False, "error": f"{type(e).__name__}: {e}"[:200]}
+
+    @staticmethod
+    def _database(max_ms: float) -> dict:
+        started = time.perf_counter()
+        with db.engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        ms = (time.perf_counter() - started) * 1000
+        return {"ok": ms <= max_ms, "latency_ms": round(ms, 1)}
+
+    @staticmethod
+    def _pool() -> dict:
+        pool = db.engine.pool
+        if not isinstance(pool, QueuePool):
+            return {"ok": True}
+        capacity = pool.size() + max(pool._max_overflow, 0)
+        in_use = pool.checkedout()
+        saturation = in_use / capacity if capacity else 0.0
+        limit = float(current_app.config.get("HEALTH_POOL_MAX", 0.9))
+        return {"ok": saturation < limit, "in_use": in_use, "capacity": capacity, "saturation": round(saturation, 2)}
+
+    def _migrations(self) -> dict:
+        if self._heads is None:
+            from alembic.config import Config as AlembicConfig
+            from alembic.script import ScriptDirectory
+            alembic_cfg = AlembicConfig()
+            alembic_cfg.set_main_option("script_location", current_app.extensions["migrate"].directory)
+            self._heads = set(ScriptDirectory.from_config(alembic_cfg).get_heads())
+        with db.engine.connect() as conn:
+            if not inspect(conn).has_table("alembic_version"):
+                # SQLite de desarrollo creado con create_all: sin versionar
+                return {"ok": current_app.config.get("ENV") != "production", "state": "unversioned"}
+            current = set(conn.execute(text("SELECT version_num FROM alembic_version")).scalars())
+        # Mientras AUTO_MIGRATE migra en otra instancia la revisión no coincide
+        return {"ok": current == self._heads, "state": "current" if current == self._heads else "pending",
+                "revision": sorted(current), "head": sorted(self._heads)}
+
+    @staticmethod
+    def _storage(max_ms: float) -> dict:
+        uploads_dir = current_app.config.get("UPLOADS_DIR", "./uploads")
+        path = os.path.join(uploads_dir, f".ready-{os.getpid()}")
+        started = time.perf_counter()
+        with open(path, "wb") as f:
+            f.write(b"ok")
+            f.flush()
+            os.fsync(f.fileno())
+        os.remove(path)
+        ms = (time.perf_counter() - started) * 1000
+        return {"ok": ms <= max_ms, "latency_ms": round(ms, 1)}
+
+
+readiness = ReadinessProbe()
@@ -1,17 +1,137 @@
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
 from passlib.context import CryptContext
 from markupsafe import Markup
 
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Coste por defecto de bcrypt, mínimo en producción y máximo aceptado
+DEFAULT_ROUNDS = 12
+MIN_ROUNDS = 12
+MAX_ROUNDS = 16
+_CALIBRATION_ROUNDS = 8
+
+
+class HashingBusy(RuntimeError):
+    """No hay hueco en el pool de hashing dentro del tiempo de espera."""
+
+
+class HashingPool:
+    """
+    Ejecutor acotado para bcrypt: como mucho `max_workers` hashes a la vez
+    y `max_workers + queue` peticiones en vuelo. Si no hay hueco en
+    `timeout` segundos se lanza HashingBusy en vez de encolar sin límite.
+    """
+
+    def __init__(self, max_workers: int = 2, queue: int = 8, timeout: float = 2.0):
+        self.configure(max_workers, queue, timeout)
+
+    def configure(self, max_workers: int, queue: int, timeout: float) -> None:
+        previous = getattr(self, "_executor", None)
+        self.max_workers = max(1, int(max_workers))
+        self.timeout = float(timeout)
+        self._slots = threading.BoundedSemaphore(self.max_workers + max(0, int(queue)))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bcrypt")
+        if previous is not None:
+            previous.shutdown(wait=False)
+
+    def run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise HashingBusy("Password hashing is saturated")
+        try:
+            return self._executor.submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+
+hashing_pool = HashingPool()
+
+
+def _context_settings(rounds: int) -> dict:
+    # Los hashes entre MIN_ROUNDS y MAX_ROUNDS valen tal cual: solo se
+    # re-hashean al hacer login los más débiles, nunca se baja el coste
+    return {
+        "schemes": ["bcrypt"],
+        "deprecated": "auto",
+        "bcrypt__default_rounds": rounds,
+        "bcrypt__min_rounds": min(rounds, MIN_ROUNDS),
+        "bcrypt__max_rounds": MAX_ROUNDS,
+    }
+
+
+@lru_cache(maxsize=4)
+def _context_for(rounds: int) -> CryptContext:
+    return CryptContext(**_context_settings(rounds))
+
+
+def calibrate_rounds(target_ms: float) -> int:
+    """
+    Coste de bcrypt recomendado para que un hash tarde ~target_ms en esta
+    máquina (cada ronda dobla el tiempo). Solo orienta el BCRYPT_ROUNDS que
+    se configura: medirlo en cada proceso daría costes distintos por worker.
+    """
+    probe = _context_for(_CALIBRATION_ROUNDS)
+    best = min(_timed_hash(probe) for _ in range(3))
+    extra = math.log2(max(target_ms, 1) / max(best * 1000, 0.01))
+    return max(MIN_ROUNDS, min(MAX_ROUNDS, _CALIBRATION_ROUNDS + round(extra)))
+
+
+def _timed_hash(ctx: CryptContext) -> float:
+    start = time.perf_counter()
+    ctx.hash("calibration")
+    return time.perf_counter() - start
+
+
+def configure_hashing(app) -> None:
+    """Fija el coste de bcrypt (BCRYPT_ROUNDS, nunca menos de MIN_ROUNDS en producción) y el pool."""
+    rounds = min(int(app.config.get("BCRYPT_ROUNDS") or DEFAULT_ROUNDS), MAX_ROUNDS)
+    if rounds < MIN_ROUNDS and app.config.get("ENV") == "production":
+        app.logger.warning("BCRYPT_ROUNDS=%s is below %s, using %s", rounds, MIN_ROUNDS, MIN_ROUNDS)
+        rounds = MIN_ROUNDS
+    pwd_context.load(_context_settings(rounds))
+    app.config["BCRYPT_ROUNDS_EFFECTIVE"] = rounds
+    hashing_pool.configure(
+        int(app.config.get("HASH_MAX_CONCURRENCY") or 0) or os.cpu_count() or 1,
+        int(app.config.get("HASH_QUEUE_SIZE", 8)),
+        float(app.config.get("HASH_QUEUE_TIMEOUT_MS", 2000)) / 1000,
+    )
+
+
+def current_rounds() -> int:
+    return int(pwd_context.to_dict().get("bcrypt__default_rounds") or DEFAULT_ROUNDS)
+
+
+def hash_password_rounds(password: str, rounds: int) -> str:
+    # Para procesos hijo (pool de importación), que no heredan la configuración
+    return _context_for(rounds).hash(password)
+
 
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return hashing_pool.run(pwd_context.hash, password)
 
 
 def verify_password(password: str, hashed: str) -> bool:
-    return pwd_context.verify(password, hashed)
+    return hashing_pool.run(pwd_context.verify, password, hashed)
+
+
+def verify_and_update(password: str, hashed: str) -> tuple[bool, str | None]:
+    """Verifica y, si el hash usa otro coste, devuelve el nuevo hash a guardar."""
+    return hashing_pool.run(pwd_context.verify_and_update, password, hashed)
 
 
 def sanitize_text(text: str) -> str:
     return Markup.escape(text)
+
+
+def is_ops_admin() -> bool:
+    """Usuario con acceso a las herramientas de operación (OPS_ADMIN_EMAILS)."""
+    from flask import current_app
+    from flask_login import current_user
+    admins = current_app.config.get("OPS_ADMIN_EMAILS") or ()
+    return bool(current_user.is_authenticated and (current_user.email or "").lower() in admins)
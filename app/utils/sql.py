@@ -0,0 +1,46 @@
+from sqlalchemy import func, text
+from ..extensions import db
+
+
+def dialect_name() -> str:
+    return db.session.get_bind().dialect.name
+
+
+def upsert_insert(table):
+    """INSERT con soporte de ON CONFLICT para el dialecto activo (Postgres/SQLite)."""
+    name = dialect_name()
+    if name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"Upsert not supported for dialect {name}")
+    return insert(table)
+
+
+def month_key(column):
+    """Expresión 'YYYY-MM' para agrupar por mes en SQL."""
+    if dialect_name() == "postgresql":
+        return func.to_char(column, "YYYY-MM")
+    return func.strftime("%Y-%m", column)
+
+
+def day_key(column):
+    """Expresión 'YYYY-MM-DD' para agrupar por día en SQL."""
+    if dialect_name() == "postgresql":
+        return func.to_char(column, "YYYY-MM-DD")
+    return func.strftime("%Y-%m-%d", column)
+
+
+def advisory_xact_lock(*keys: int) -> None:
+    """
+    Cerrojo hasta el fin de la transacción actual. En Postgres es un
+    advisory lock (uno o dos enteros); en SQLite se toma el bloqueo de
+    escritura de la base, que serializa igual a los escritores.
+    """
+    if dialect_name() == "postgresql":
+        args = ", ".join(str(int(k)) for k in keys)
+        db.session.execute(text(f"SELECT pg_advisory_xact_lock({args})"))
+    else:
+        # Un UPDATE aunque no toque filas abre la transacción de escritura
+        db.session.execute(text("UPDATE transfers SET id = id WHERE 0 = 1"))
@@ -0,0 +1,137 @@
+import heapq
+import json
+import logging
+import re
+import time
+from collections import Counter
+
+from flask import current_app, g, has_request_context, render_template, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .security import is_ops_admin
+
+
+# Listas expandidas de IN (?, ?, ?) / (%(p_1)s, ...) -> una sola forma
+_IN_LIST = re.compile(r"\((?:\s*(?:\?|%\([^)]+\)s|:\w+)\s*,)+\s*(?:\?|%\([^)]+\)s|:\w+)\s*\)")
+_SPACES = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    return _SPACES.sub(" ", _IN_LIST.sub("(…)", statement)).strip()
+
+
+class RequestSQLStats:
+    """Consultas de una petición: número, tiempo total, más lentas y formas repetidas."""
+
+    __slots__ = ("count", "total_ms", "shapes", "slowest", "_top")
+
+    def __init__(self, top: int = 5):
+        self.count = 0
+        self.total_ms = 0.0
+        self.shapes = Counter()
+        self.slowest = []  # heap de (ms, n, sentencia)
+        self._top = top
+
+    def record(self, statement: str, ms: float) -> None:
+        self.count += 1
+        self.total_ms += ms
+        self.shapes[statement] += 1
+        item = (ms, self.count, statement)
+        if len(self.slowest) < self._top:
+            heapq.heappush(self.slowest, item)
+        elif ms > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, item)
+
+    def top(self) -> list[tuple[float, str]]:
+        return [(ms, statement_shape(s)) for ms, _, s in sorted(self.slowest, reverse=True)]
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        # Agrupar por forma solo al final: durante la petición basta el texto exacto
+        by_shape = Counter()
+        for statement, n in self.shapes.items():
+            by_shape[statement_shape(statement)] += n
+        return [(shape, n) for shape, n in by_shape.most_common() if n > threshold]
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and "sql_stats" in g:
+        conn.info.setdefault("sql_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("sql_started")
+    if not started:
+        return
+    ms = (time.perf_counter() - started.pop()) * 1000
+    if has_request_context() and "sql_stats" in g:
+        g.sql_stats.record(statement, ms)
+
+
+def _panel_allowed() -> bool:
+    if request.args.get("_sql") != "1":
+        return False
+    return current_app.debug or is_ops_admin()
+
+
+def init_sql_stats(app) -> None:
+    """
+    Instrumenta cada petición: nº de consultas y tiempo de BD en la cabecera
+    Server-Timing y en una línea de log JSON, aviso de N+1 (misma forma de
+    consulta más de SQL_NPLUSONE_THRESHOLD veces) y, con ?_sql=1 en debug o
+    para OPS_ADMIN_EMAILS, un panel con las consultas más lentas.
+    """
+    if not app.config.get("SQL_STATS_ENABLED", True):
+        return
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    if app.logger.level == logging.NOTSET:
+        # Sin esto la línea de log por petición (INFO) no sale en producción
+        app.logger.setLevel(logging.INFO)
+    top = int(app.config.get("SQL_SLOW_TOP", 5))
+    threshold = int(app.config.get("SQL_NPLUSONE_THRESHOLD", 10))
+
+    @app.before_request
+    def _start_sql_stats():
+        g.sql_stats = RequestSQLStats(top)
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def _report_sql_stats(response):
+        stats = g.pop("sql_stats", None)
+        if stats is None:
+            return response
+        total_ms = (time.perf_counter() - g.pop("request_started")) * 1000
+        response.headers.add(
+            "Server-Timing",
+            f'db;dur={stats.total_ms:.1f};desc="{stats.count} queries", app;dur={total_ms:.1f}',
+        )
+        endpoint = request.endpoint or "-"
+        repeated = stats.repeated(threshold)
+        for shape, n in repeated:
+            app.logger.warning("Possible N+1 in %s: %d x %s", endpoint, n, shape[:300])
+        app.logger.info(json.dumps({
+            "event": "request",
+            "endpoint": endpoint,
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "duration_ms": round(total_ms, 1),
+            "db_queries": stats.count,
+            "db_ms": round(stats.total_ms, 1),
+            "n_plus_one": len(repeated),
+        }))
+        if response.mimetype == "text/html" and not response.direct_passthrough and _panel_allowed():
+            panel = render_template(
+                "_sql_panel.html",
+                stats=stats,
+                slowest=stats.top(),
+                repeated=repeated,
+                total_ms=total_ms,
+                endpoint=endpoint,
+            )
+            body = response.get_data(as_text=True)
+            idx = body.rfind("</body>")
+            response.set_data(body[:idx] + panel + body[idx:] if idx >= 0 else body + panel)
+        return response
@@ -0,0 +1 @@
+"""Benchmarks de extremo a extremo (python -m bench.run --help)."""
@@ -0,0 +1,118 @@
+"""Clientes HTTP de los benchmarks: en proceso (test client de Flask) o contra un gunicorn real."""
+import http.cookiejar
+import re
+import secrets
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from io import BytesIO
+from typing import NamedTuple
+
+
+_CSRF_RE = re.compile(rb'name="csrf_token"[^>]*value="([^"]+)"')
+_QUERIES_RE = re.compile(r'desc="(\d+) queries"')
+
+
+class Sample(NamedTuple):
+    status: int
+    ms: float
+    queries: int | None
+
+
+class BenchClient:
+    """Sesión de un usuario: cookies, token CSRF y medición de cada petición."""
+
+    def __init__(self):
+        self._csrf = None
+
+    def _send(self, method: str, path: str, fields: dict | None, files: dict | None) -> tuple[int, dict, bytes]:
+        raise NotImplementedError
+
+    def request(self, method: str, path: str, fields: dict | None = None, files: dict | None = None) -> tuple[Sample, bytes]:
+        started = time.perf_counter()
+        status, headers, body = self._send(method, path, fields, files)
+        ms = (time.perf_counter() - started) * 1000
+        # Nº de consultas de la cabecera Server-Timing (SQL_STATS_ENABLED)
+        m = _QUERIES_RE.search(headers.get("Server-Timing") or "")
+        return Sample(status, ms, int(m.group(1)) if m else None), body
+
+    def get(self, path: str) -> Sample:
+        return self.request("GET", path)[0]
+
+    def post(self, path: str, fields: dict, files: dict | None = None) -> Sample:
+        return self.request("POST", path, {"csrf_token": self._csrf or "", **fields}, files)[0]
+
+    def fetch_csrf(self, path: str) -> str:
+        # El token va ligado a la sesión: basta con leerlo una vez por cliente
+        _, body = self.request("GET", path)
+        m = _CSRF_RE.search(body)
+        if not m:
+            raise RuntimeError(f"No CSRF token in {path}")
+        self._csrf = m.group(1).decode()
+        return self._csrf
+
+    def login(self, email: str, password: str) -> None:
+        self.fetch_csrf("/login")
+        sample = self.post("/login", {"email": email, "password": password})
+        if sample.status != 302:
+            raise RuntimeError(f"Login failed for {email}: HTTP {sample.status}")
+
+
+class InProcessClient(BenchClient):
+    def __init__(self, app):
+        super().__init__()
+        self.client = app.test_client()
+
+    def _send(self, method, path, fields, files):
+        data = dict(fields or {})
+        for name, (filename, content, _ctype) in (files or {}).items():
+            data[name] = (BytesIO(content), filename)
+        resp = self.client.open(path, method=method, data=data or None)
+        body = resp.get_data()
+        resp.close()
+        return resp.status_code, resp.headers, body
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def _multipart(fields: dict, files: dict) -> tuple[bytes, str]:
+    boundary = secrets.token_hex(16)
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (filename, content, ctype) in files.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f"Content-Type: {ctype}\r\n\r\n".encode() + content + b"\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+class HttpClient(BenchClient):
+    def __init__(self, base_url: str):
+        super().__init__()
+        self.base_url = base_url.rstrip("/")
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect()
+        )
+
+    def _send(self, method, path, fields, files):
+        data = None
+        headers = {}
+        if files:
+            data, headers["Content-Type"] = _multipart(fields or {}, files)
+        elif fields is not None:
+            data = urllib.parse.urlencode(fields).encode()
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        req = urllib.request.Request(self.base_url + path, data=data, method=method, headers=headers)
+        try:
+            with self.opener.open(req, timeout=60) as resp:
+                return resp.status, resp.headers, resp.read()
+        except urllib.error.HTTPError as e:
+            # Redirecciones (no se siguen) y errores llegan aquí
+            return e.code, e.headers, e.read()
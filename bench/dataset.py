@@ -0,0 +1,57 @@
+"""
+Dataset de los benchmarks: el mismo generador que `flask seed --scale`
+(app.seed_scale) con tamaños pequeños, más un login de staff en el
+primer local para los escenarios de panel.
+"""
+from app.extensions import db
+from app.models import Membership, Restaurant, Staff, User
+from app.seed_scale import PASSWORD, generate
+from app.utils.security import hash_password
+
+
+STAFF_EMAIL = "bench-staff@example.com"
+
+
+def is_empty() -> bool:
+    return db.session.query(Restaurant.id).first() is None
+
+
+def seed_bench(restaurants: int, staff: int, users: int, guests: int, tips: int, reviews: int,
+               days: int, seed: int = 1) -> dict:
+    """Genera el dataset, reconstruye user_stats como `flask seed --scale` y devuelve el contexto."""
+    from app.services.achievement_service import rebuild_counters
+    from app.services.stats_service import rebuild_user_stats
+
+    summary = generate(restaurants, staff, users, guests, tips, reviews, days, seed=seed)
+    rebuild_user_stats()
+    rebuild_counters()
+    first = Restaurant.query.filter_by(slug=summary["first_slug"]).one()
+    member = Staff.query.filter_by(restaurant_id=first.id).order_by(Staff.id).first()
+    staff_user = User(email=STAFF_EMAIL, name=member.name, password_hash=hash_password(PASSWORD), level=1, xp=0)
+    db.session.add(staff_user)
+    db.session.flush()
+    member.user_id = staff_user.id
+    db.session.add(Membership(user_id=staff_user.id, restaurant_id=first.id, role="staff"))
+    db.session.commit()
+    return dataset_context()
+
+
+def dataset_context() -> dict:
+    """Lo que necesitan los escenarios, leído del dataset cargado (también con --reuse)."""
+    staff_user = User.query.filter_by(email=STAFF_EMAIL).first()
+    if not staff_user:
+        raise SystemExit("No bench dataset found; run without --reuse")
+    first_id = Membership.query.filter_by(user_id=staff_user.id, role="staff").one().restaurant_id
+    admin = (
+        User.query.join(Membership, Membership.user_id == User.id)
+        .filter(Membership.restaurant_id == first_id, Membership.role == "admin")
+        .first()
+    )
+    return {
+        "slug": db.session.get(Restaurant, first_id).slug,
+        "restaurant_id": first_id,
+        "staff_ids": [s.id for s in Staff.query.filter_by(restaurant_id=first_id).order_by(Staff.id).all()],
+        "admin_email": admin.email,
+        "staff_email": STAFF_EMAIL,
+        "password": PASSWORD,
+    }
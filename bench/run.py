@@ -0,0 +1,253 @@
+"""
+Benchmarks de extremo a extremo sobre la app WSGI.
+
+    python -m bench.run                                   # en proceso, SQLite temporal
+    python -m bench.run --server gunicorn --workers 4 --concurrency 8
+    python -m bench.run --database-url postgresql://localhost/xigma_bench --reset
+    python -m bench.run --compare bench/results/<anterior>.json
+
+Siembra un dataset sintético con el generador de `flask seed --scale`,
+ejecuta cada escenario y guarda throughput, latencias p50/p95/p99 y
+consultas por petición (cabecera Server-Timing) en
+bench/results/<fecha>-<commit>.json para comparar entre commits.
+"""
+import argparse
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from bench.clients import HttpClient, InProcessClient  # noqa: E402
+from bench.scenarios import SCENARIOS, prepare  # noqa: E402
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="End-to-end benchmarks")
+    p.add_argument("--server", choices=("inprocess", "gunicorn"), default="inprocess")
+    p.add_argument("--database-url", help="Default: temporary SQLite file. Use a scratch Postgres DB, never a real one")
+    p.add_argument("--reset", action="store_true", help="Drop and recreate all tables before seeding")
+    p.add_argument("--reuse", action="store_true", help="Reuse an already seeded bench dataset")
+    p.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated scenario names")
+    p.add_argument("--requests", type=int, default=200, help="Measured requests per scenario")
+    p.add_argument("--warmup", type=int, default=5, help="Unmeasured requests per client before measuring")
+    p.add_argument("--concurrency", type=int, default=1, help="Concurrent clients (threads)")
+    p.add_argument("--workers", type=int, default=2, help="gunicorn workers")
+    p.add_argument("--restaurants", type=int, default=5)
+    p.add_argument("--staff", type=int, default=8, help="Average staff per restaurant")
+    p.add_argument("--users", type=int, default=2000, help="Registered users")
+    p.add_argument("--guests", type=int, default=5000, help="Guest users (per device)")
+    p.add_argument("--tips", type=int, default=20000)
+    p.add_argument("--reviews", type=int, default=5000)
+    p.add_argument("--days", type=int, default=90)
+    p.add_argument("--seed", type=int, default=1, help="Random seed for the dataset")
+    p.add_argument("--out", help="Result file (default bench/results/<date>-<commit>.json)")
+    p.add_argument("--compare", help="Previous result file to compare against")
+    return p.parse_args(argv)
+
+
+def _configure_env(args, workdir: str) -> None:
+    os.environ.update({
+        "SQLALCHEMY_DATABASE_URI": args.database_url or f"sqlite:///{workdir}/bench.db",
+        "UPLOADS_DIR": os.path.join(workdir, "uploads"),
+        "SECRET_KEY": "bench-secret",
+        "FLASK_ENV": "development",
+        "FLASK_DEBUG": "0",
+        # Sin límites: medimos la app, no el limitador
+        "RATELIMIT_ENABLED": "0",
+        "RATELIMIT_STORAGE_URI": "memory://",
+        "BCRYPT_ROUNDS": "4",
+        "SQL_STATS_ENABLED": "1",
+        "PROMETHEUS_MULTIPROC_DIR": os.path.join(workdir, "prometheus"),
+    })
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+
+def _git_commit() -> str:
+    try:
+        sha = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+        return f"{sha}-dirty" if dirty else sha
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_gunicorn(args, workdir: str) -> tuple[subprocess.Popen, str]:
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    log = open(os.path.join(workdir, "gunicorn.log"), "wb")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-w", str(args.workers), "-b", f"127.0.0.1:{port}", "wsgi:app"],
+        cwd=ROOT, env=os.environ.copy(), stdout=log, stderr=subprocess.STDOUT,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"gunicorn exited, see {log.name}")
+        try:
+            with urllib.request.urlopen(base_url + "/health/live", timeout=1):
+                return proc, base_url
+        except OSError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise SystemExit(f"gunicorn did not start, see {log.name}")
+
+
+def _summary(samples, elapsed: float, ok: tuple[int, ...]) -> dict:
+    ms = np.array([s.ms for s in samples])
+    queries = [s.queries for s in samples if s.queries is not None]
+    p50, p95, p99 = np.percentile(ms, (50, 95, 99))
+    return {
+        "requests": len(samples),
+        "errors": sum(1 for s in samples if s.status not in ok),
+        "statuses": dict(Counter(str(s.status) for s in samples)),
+        "throughput_rps": round(len(samples) / elapsed, 1),
+        "mean_ms": round(float(ms.mean()), 2),
+        "p50_ms": round(float(p50), 2),
+        "p95_ms": round(float(p95), 2),
+        "p99_ms": round(float(p99), 2),
+        "max_ms": round(float(ms.max()), 2),
+        "queries_mean": round(sum(queries) / len(queries), 1) if queries else None,
+        "queries_max": max(queries) if queries else None,
+    }
+
+
+def run_scenario(scenario, make_client, ctx: dict, requests: int, concurrency: int, warmup: int) -> dict:
+    clients = [prepare(make_client(), scenario, ctx) for _ in range(concurrency)]
+    for client in clients:
+        for _ in range(warmup):
+            scenario.run(client, ctx)
+    samples = []
+    lock = threading.Lock()
+    shares = [requests // concurrency + (1 if i < requests % concurrency else 0) for i in range(concurrency)]
+
+    def _worker(client, n):
+        local = [scenario.run(client, ctx) for _ in range(n)]
+        with lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=_worker, args=(c, n)) for c, n in zip(clients, shares)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return _summary(samples, time.perf_counter() - started, scenario.ok)
+
+
+def _delta(new, old) -> str:
+    if not old:
+        return ""
+    return f" ({(new - old) / old * 100:+.0f}%)"
+
+
+def print_table(results: dict, baseline: dict | None = None) -> None:
+    base = (baseline or {}).get("scenarios", {})
+    print(f"{'scenario':<22}{'rps':>16}{'p50 ms':>18}{'p95 ms':>18}{'p99 ms':>18}{'queries':>9}{'errors':>8}")
+    for name, r in results["scenarios"].items():
+        old = base.get(name, {})
+        print(
+            f"{name:<22}"
+            f"{r['throughput_rps']:>8}{_delta(r['throughput_rps'], old.get('throughput_rps')):>8}"
+            f"{r['p50_ms']:>10}{_delta(r['p50_ms'], old.get('p50_ms')):>8}"
+            f"{r['p95_ms']:>10}{_delta(r['p95_ms'], old.get('p95_ms')):>8}"
+            f"{r['p99_ms']:>10}{_delta(r['p99_ms'], old.get('p99_ms')):>8}"
+            f"{r['queries_mean'] if r['queries_mean'] is not None else '-':>9}"
+            f"{r['errors']:>8}"
+        )
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    names = [n.strip() for n in args.scenarios.split(",") if n.strip()]
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(unknown)}")
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    _configure_env(args, workdir)
+
+    from app import create_app
+    from app.extensions import db
+    from bench.dataset import dataset_context, is_empty, seed_bench
+
+    app = create_app()
+    # El log JSON por petición de sqlstats solo añadiría ruido y coste
+    app.logger.setLevel(logging.WARNING)
+    with app.app_context():
+        if args.reset:
+            db.drop_all()
+        db.create_all()
+        seed_started = time.perf_counter()
+        if args.reuse:
+            ctx = dataset_context()
+        elif not is_empty():
+            raise SystemExit("Database is not empty: use --reset (drops all tables) or --reuse")
+        else:
+            ctx = seed_bench(args.restaurants, args.staff, args.users, args.guests, args.tips, args.reviews, args.days, args.seed)
+        seed_seconds = time.perf_counter() - seed_started
+        dialect = db.engine.dialect.name
+    print(f"Dataset ready in {seed_seconds:.1f}s ({dialect}, workdir {workdir})")
+
+    proc = None
+    if args.server == "gunicorn":
+        proc, base_url = _start_gunicorn(args, workdir)
+        make_client = lambda: HttpClient(base_url)  # noqa: E731
+    else:
+        make_client = lambda: InProcessClient(app)  # noqa: E731
+
+    results = {
+        "commit": _git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "server": args.server,
+        "workers": args.workers if args.server == "gunicorn" else None,
+        "database": dialect,
+        "python": sys.version.split()[0],
+        "concurrency": args.concurrency,
+        "dataset": {
+            "restaurants": args.restaurants, "staff_per_restaurant": args.staff, "users": args.users,
+            "guests": args.guests, "tips": args.tips, "reviews": args.reviews, "days": args.days,
+            "seed": args.seed, "reused": args.reuse, "seed_seconds": round(seed_seconds, 1),
+        },
+        "scenarios": {},
+    }
+    try:
+        for name in names:
+            print(f"Running {name}...", flush=True)
+            results["scenarios"][name] = run_scenario(
+                SCENARIOS[name], make_client, ctx, args.requests, args.concurrency, args.warmup
+            )
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    out = Path(args.out) if args.out else ROOT / "bench" / "results" / f"{datetime.now():%Y%m%d-%H%M%S}-{results['commit']}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(results, indent=2) + "\n")
+    baseline = json.loads(Path(args.compare).read_text()) if args.compare else None
+    print_table(results, baseline)
+    print(f"Results written to {out}")
+    return 1 if any(r["errors"] for r in results["scenarios"].values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""
+Escenarios de carga. Cada uno tiene un rol (qué usuario lo ejecuta), una
+preparación por cliente (login, token CSRF) y la petición medida.
+"""
+import random
+from io import BytesIO
+from typing import Callable, NamedTuple
+
+from PIL import Image
+
+from .clients import BenchClient, Sample
+
+
+def _photo() -> bytes:
+    # Foto de móvil típica: JPEG 1600x1200 que el servidor reduce y recodifica
+    img = Image.effect_noise((1600, 1200), 40).convert("RGB")
+    out = BytesIO()
+    img.save(out, format="JPEG", quality=85)
+    return out.getvalue()
+
+
+PHOTO = _photo()
+
+
+class Scenario(NamedTuple):
+    role: str  # guest | admin | staff
+    setup: Callable[[BenchClient, dict], None]
+    run: Callable[[BenchClient, dict], Sample]
+    ok: tuple[int, ...] = (200,)
+
+
+def _no_setup(client, ctx):
+    pass
+
+
+def _guest_setup(client, ctx):
+    client.fetch_csrf(f"/r/{ctx['slug']}")
+
+
+def _tip_post(client, ctx):
+    return client.post(f"/r/{ctx['slug']}", {
+        "restaurant_id": ctx["restaurant_id"],
+        "staff_id": random.choice(ctx["staff_ids"]),
+        "amount_cents": random.choice((200, 500, 1000)),
+        "method_ui": "apple_pay",
+    })
+
+
+def _feedback_photo(client, ctx):
+    return client.post(
+        f"/r/{ctx['slug']}/feedback",
+        {"rating": random.randint(3, 5), "comment": "Bench review", "share_allowed": "y"},
+        {"photo": ("photo.jpg", PHOTO, "image/jpeg")},
+    )
+
+
+SCENARIOS: dict[str, Scenario] = {
+    "qr_landing": Scenario("guest", _no_setup, lambda c, ctx: c.get(f"/r/{ctx['slug']}")),
+    "tip_post": Scenario("guest", _guest_setup, _tip_post, ok=(302,)),
+    "feedback_photo": Scenario("guest", _guest_setup, _feedback_photo, ok=(302,)),
+    "restaurant_dashboard": Scenario("admin", _no_setup, lambda c, ctx: c.get("/dashboard/restaurant")),
+    "staff_dashboard": Scenario("staff", _no_setup, lambda c, ctx: c.get("/dashboard/me/staff")),
+    "payouts": Scenario("admin", _no_setup, lambda c, ctx: c.get("/dashboard/payouts")),
+    "csv_export": Scenario("admin", _no_setup, lambda c, ctx: c.get("/dashboard/breakdown?export=csv")),
+}
+
+
+def prepare(client: BenchClient, scenario: Scenario, ctx: dict) -> BenchClient:
+    if scenario.role == "admin":
+        client.login(ctx["admin_email"], ctx["password"])
+    elif scenario.role == "staff":
+        client.login(ctx["staff_email"], ctx["password"])
+    scenario.setup(client, ctx)
+    return client
@@ -0,0 +1,44 @@
+# Configuración de gunicorn (se carga sola desde el directorio de trabajo)
+import os
+import shutil
+import tempfile
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+bind = os.getenv("GUNICORN_BIND") or f"0.0.0.0:{os.getenv('PORT', '8000')}"
+# Un worker por defecto (instancias pequeñas); se sube con WEB_CONCURRENCY según CPU/RAM
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+# Reciclado por número de peticiones (0 = nunca) y por memoria residente (MB, 0 = sin límite)
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "0"))
+MAX_WORKER_RSS_MB = float(os.getenv("MAX_WORKER_RSS_MB", "0"))
+
+# Métricas agregadas entre workers: debe estar en el entorno antes de que
+# los workers importen prometheus_client
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "prometheus-multiproc"))
+
+
+def on_starting(server):
+    # Ficheros de una ejecución anterior falsearían los contadores
+    path = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def post_request(worker, req, environ, resp):
+    from app.utils.memtrace import current_rss_bytes
+    from app.utils.metrics import WORKER_RSS
+    rss = current_rss_bytes()
+    WORKER_RSS.set(rss)
+    if MAX_WORKER_RSS_MB and rss > MAX_WORKER_RSS_MB * 1024 * 1024 and worker.alive:
+        # Termina tras esta petición; el master arranca otro worker limpio
+        worker.log.warning("Worker %s RSS %.0f MB > %.0f MB after %s, recycling",
+                           worker.pid, rss / 1024 / 1024, MAX_WORKER_RSS_MB, req.path)
+        worker.alive = False
@@ -0,0 +1,79 @@
+"""tip pooling: rules, shifts, pool runs and allocations
+
+Revision ID: 0a6d3e9b4c71
+Revises: f2c9a7d13b85
+Create Date: 2026-10-19 20:05:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0a6d3e9b4c71"
+down_revision = "f2c9a7d13b85"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("restaurants", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("pool_rule", sa.String(length=16), nullable=False, server_default="equal"))
+        batch_op.add_column(sa.Column("pool_role_weights", sa.Text(), nullable=True))
+
+    op.create_table(
+        "staff_shifts",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("restaurant_id", sa.Integer(), sa.ForeignKey("restaurants.id"), nullable=False),
+        sa.Column("staff_id", sa.Integer(), sa.ForeignKey("staff.id"), nullable=False),
+        sa.Column("work_date", sa.Date(), nullable=False),
+        sa.Column("hours", sa.Float(), nullable=False, server_default="0"),
+        sa.UniqueConstraint("staff_id", "work_date", name="uq_staff_shifts_staff_date"),
+    )
+    op.create_index("ix_staff_shifts_restaurant_date", "staff_shifts", ["restaurant_id", "work_date"], unique=False)
+
+    op.create_table(
+        "pool_runs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("restaurant_id", sa.Integer(), sa.ForeignKey("restaurants.id"), nullable=False),
+        sa.Column("rule", sa.String(length=16), nullable=False),
+        sa.Column("period_start", sa.DateTime(), nullable=True),
+        sa.Column("period_end", sa.DateTime(), nullable=False),
+        sa.Column("tips_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("total_cents", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_pool_runs_restaurant_created", "pool_runs", ["restaurant_id", "created_at"], unique=False)
+
+    op.create_table(
+        "pool_allocations",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("run_id", sa.Integer(), sa.ForeignKey("pool_runs.id"), nullable=False),
+        sa.Column("restaurant_id", sa.Integer(), sa.ForeignKey("restaurants.id"), nullable=False),
+        sa.Column("staff_id", sa.Integer(), sa.ForeignKey("staff.id"), nullable=False),
+        sa.Column("amount_cents", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index(
+        "ix_pool_allocations_restaurant_staff", "pool_allocations", ["restaurant_id", "staff_id", "amount_cents"], unique=False
+    )
+    op.create_index("ix_pool_allocations_run", "pool_allocations", ["run_id"], unique=False)
+
+    with op.batch_alter_table("tips", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("pool_run_id", sa.Integer(), nullable=True))
+        batch_op.create_foreign_key("fk_tips_pool_run_id", "pool_runs", ["pool_run_id"], ["id"])
+
+
+def downgrade():
+    with op.batch_alter_table("tips", schema=None) as batch_op:
+        batch_op.drop_constraint("fk_tips_pool_run_id", type_="foreignkey")
+        batch_op.drop_column("pool_run_id")
+    op.drop_index("ix_pool_allocations_run", table_name="pool_allocations")
+    op.drop_index("ix_pool_allocations_restaurant_staff", table_name="pool_allocations")
+    op.drop_table("pool_allocations")
+    op.drop_index("ix_pool_runs_restaurant_created", table_name="pool_runs")
+    op.drop_table("pool_runs")
+    op.drop_index("ix_staff_shifts_restaurant_date", table_name="staff_shifts")
+    op.drop_table("staff_shifts")
+    with op.batch_alter_table("restaurants", schema=None) as batch_op:
+        batch_op.drop_column("pool_role_weights")
+        batch_op.drop_column("pool_rule")
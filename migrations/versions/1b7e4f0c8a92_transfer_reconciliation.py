@@ -0,0 +1,34 @@
+"""transfer external reference and reconciliation timestamp
+
+Revision ID: 1b7e4f0c8a92
+Revises: 0a6d3e9b4c71
+Create Date: 2026-10-19 21:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "1b7e4f0c8a92"
+down_revision = "0a6d3e9b4c71"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("transfers", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("external_ref", sa.String(length=40), nullable=True))
+        batch_op.add_column(sa.Column("reconciled_at", sa.DateTime(), nullable=True))
+    # Transferencias anteriores: referencia derivada del id
+    op.execute("UPDATE transfers SET external_ref = 'legacy_' || id WHERE external_ref IS NULL")
+    with op.batch_alter_table("transfers", schema=None) as batch_op:
+        batch_op.create_unique_constraint("uq_transfers_external_ref", ["external_ref"])
+        batch_op.create_index("ix_transfers_unreconciled", ["reconciled_at", "created_at"], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table("transfers", schema=None) as batch_op:
+        batch_op.drop_index("ix_transfers_unreconciled")
+        batch_op.drop_constraint("uq_transfers_external_ref", type_="unique")
+        batch_op.drop_column("reconciled_at")
+        batch_op.drop_column("external_ref")
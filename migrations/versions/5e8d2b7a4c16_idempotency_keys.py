@@ -0,0 +1,29 @@
+"""idempotency keys for tips and reviews replayed from the offline queue
+
+Revision ID: 5e8d2b7a4c16
+Revises: 1b7e4f0c8a92
+Create Date: 2026-10-20 09:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "5e8d2b7a4c16"
+down_revision = "1b7e4f0c8a92"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ("tips", "reviews"):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column("idempotency_key", sa.String(length=64), nullable=True))
+            batch_op.create_index(f"uq_{table}_idempotency_key", ["idempotency_key"], unique=True)
+
+
+def downgrade():
+    for table in ("reviews", "tips"):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(f"uq_{table}_idempotency_key")
+            batch_op.drop_column("idempotency_key")
@@ -0,0 +1,45 @@
+"""add low-quality image placeholders
+
+Revision ID: 7c2e5d9a1b40
+Revises: 4b9a8f1c2d3e
+Create Date: 2026-10-19 09:10:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "7c2e5d9a1b40"
+down_revision = "4b9a8f1c2d3e"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("media", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("placeholder", sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column("dominant_color", sa.String(length=7), nullable=True))
+    with op.batch_alter_table("users", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("avatar_placeholder", sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column("avatar_color", sa.String(length=7), nullable=True))
+    with op.batch_alter_table("staff", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("avatar_placeholder", sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column("avatar_color", sa.String(length=7), nullable=True))
+    with op.batch_alter_table("restaurants", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("logo_placeholder", sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column("logo_color", sa.String(length=7), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("restaurants", schema=None) as batch_op:
+        batch_op.drop_column("logo_color")
+        batch_op.drop_column("logo_placeholder")
+    with op.batch_alter_table("staff", schema=None) as batch_op:
+        batch_op.drop_column("avatar_color")
+        batch_op.drop_column("avatar_placeholder")
+    with op.batch_alter_table("users", schema=None) as batch_op:
+        batch_op.drop_column("avatar_color")
+        batch_op.drop_column("avatar_placeholder")
+    with op.batch_alter_table("media", schema=None) as batch_op:
+        batch_op.drop_column("dominant_color")
+        batch_op.drop_column("placeholder")
@@ -0,0 +1,25 @@
+"""heartbeat for coupon campaigns so stalled runs can be resumed
+
+Revision ID: 7c3a9e5d2f81
+Revises: 5e8d2b7a4c16
+Create Date: 2026-10-20 12:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "7c3a9e5d2f81"
+down_revision = "5e8d2b7a4c16"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("coupon_campaigns", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("heartbeat_at", sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("coupon_campaigns", schema=None) as batch_op:
+        batch_op.drop_column("heartbeat_at")
@@ -0,0 +1,33 @@
+"""add user_stats read model
+
+Revision ID: 9d41b7e0c3a2
+Revises: 7c2e5d9a1b40
+Create Date: 2026-10-19 11:30:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "9d41b7e0c3a2"
+down_revision = "7c2e5d9a1b40"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Tras aplicar: `flask stats rebuild` para rellenar con el histórico
+    op.create_table(
+        "user_stats",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("bucket", sa.String(length=16), nullable=False),
+        sa.Column("key", sa.String(length=64), nullable=False, server_default=""),
+        sa.Column("tips_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("tips_cents", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("reviews_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.PrimaryKeyConstraint("user_id", "bucket", "key"),
+    )
+
+
+def downgrade():
+    op.drop_table("user_stats")
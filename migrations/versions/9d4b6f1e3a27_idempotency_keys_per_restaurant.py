@@ -0,0 +1,28 @@
+"""scope tip/review idempotency keys to the restaurant
+
+Revision ID: 9d4b6f1e3a27
+Revises: 7c3a9e5d2f81
+Create Date: 2026-10-21 09:00:00
+"""
+
+from alembic import op
+
+
+revision = "9d4b6f1e3a27"
+down_revision = "7c3a9e5d2f81"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ("tips", "reviews"):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(f"uq_{table}_idempotency_key")
+            batch_op.create_index(f"uq_{table}_restaurant_idempotency_key", ["restaurant_id", "idempotency_key"], unique=True)
+
+
+def downgrade():
+    for table in ("reviews", "tips"):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(f"uq_{table}_restaurant_idempotency_key")
+            batch_op.create_index(f"uq_{table}_idempotency_key", ["idempotency_key"], unique=True)
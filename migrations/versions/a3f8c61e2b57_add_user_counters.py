@@ -0,0 +1,31 @@
+"""add user_counters for achievements and missions
+
+Revision ID: a3f8c61e2b57
+Revises: 9d41b7e0c3a2
+Create Date: 2026-10-19 12:40:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "a3f8c61e2b57"
+down_revision = "9d41b7e0c3a2"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Tras aplicar: `flask stats rebuild` para rellenar con el histórico
+    op.create_table(
+        "user_counters",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("period", sa.String(length=16), nullable=False),
+        sa.Column("name", sa.String(length=32), nullable=False),
+        sa.Column("value", sa.Integer(), nullable=False, server_default="0"),
+        sa.PrimaryKeyConstraint("user_id", "period", "name"),
+    )
+
+
+def downgrade():
+    op.drop_table("user_counters")
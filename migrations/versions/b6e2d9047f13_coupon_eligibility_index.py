@@ -0,0 +1,38 @@
+"""coupon eligibility index and one redemption per user
+
+Revision ID: b6e2d9047f13
+Revises: a3f8c61e2b57
+Create Date: 2026-10-19 13:50:00
+"""
+
+from alembic import op
+
+
+revision = "b6e2d9047f13"
+down_revision = "a3f8c61e2b57"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Canjes duplicados de la época check-then-insert: nos quedamos con el primero
+    op.execute(
+        "DELETE FROM coupon_redemptions WHERE id NOT IN ("
+        " SELECT MIN(id) FROM coupon_redemptions GROUP BY coupon_id, user_id)"
+    )
+    with op.batch_alter_table("coupons", schema=None) as batch_op:
+        batch_op.drop_index("ix_coupons_restaurant_active")
+        batch_op.create_index("ix_coupons_eligibility", ["restaurant_id", "active", "required_xp"], unique=False)
+    with op.batch_alter_table("coupon_redemptions", schema=None) as batch_op:
+        # El único (coupon_id, user_id) cubre las búsquedas por cupón
+        batch_op.drop_index("ix_redemptions_coupon")
+        batch_op.create_unique_constraint("uq_redemptions_coupon_user", ["coupon_id", "user_id"])
+
+
+def downgrade():
+    with op.batch_alter_table("coupon_redemptions", schema=None) as batch_op:
+        batch_op.drop_constraint("uq_redemptions_coupon_user", type_="unique")
+        batch_op.create_index("ix_redemptions_coupon", ["coupon_id"], unique=False)
+    with op.batch_alter_table("coupons", schema=None) as batch_op:
+        batch_op.drop_index("ix_coupons_eligibility")
+        batch_op.create_index("ix_coupons_restaurant_active", ["restaurant_id", "active"], unique=False)
@@ -0,0 +1,31 @@
+"""track counter redemption of coupon codes
+
+Revision ID: c1d7e4a95b28
+Revises: b6e2d9047f13
+Create Date: 2026-10-19 15:05:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "c1d7e4a95b28"
+down_revision = "b6e2d9047f13"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("coupon_redemptions", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("redeemed_at", sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column("redeemed_by_user_id", sa.Integer(), nullable=True))
+        batch_op.create_foreign_key(
+            "fk_redemptions_redeemed_by", "users", ["redeemed_by_user_id"], ["id"]
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("coupon_redemptions", schema=None) as batch_op:
+        batch_op.drop_constraint("fk_redemptions_redeemed_by", type_="foreignkey")
+        batch_op.drop_column("redeemed_by_user_id")
+        batch_op.drop_column("redeemed_at")
@@ -0,0 +1,44 @@
+"""coupon campaigns and expiry sweep indexes
+
+Revision ID: d4a2c8f61e09
+Revises: c1d7e4a95b28
+Create Date: 2026-10-19 16:20:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "d4a2c8f61e09"
+down_revision = "c1d7e4a95b28"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "coupon_campaigns",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("coupon_id", sa.Integer(), sa.ForeignKey("coupons.id"), nullable=False),
+        sa.Column("min_xp", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("tipped_here", sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column("status", sa.String(length=20), nullable=False, server_default="pending"),
+        sa.Column("issued_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("last_user_id", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("created_by_user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+    )
+    with op.batch_alter_table("coupons", schema=None) as batch_op:
+        batch_op.create_index("ix_coupons_expires_at", ["expires_at"], unique=False)
+    with op.batch_alter_table("coupon_redemptions", schema=None) as batch_op:
+        batch_op.create_index("ix_redemptions_coupon_status", ["coupon_id", "status", "id"], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table("coupon_redemptions", schema=None) as batch_op:
+        batch_op.drop_index("ix_redemptions_coupon_status")
+    with op.batch_alter_table("coupons", schema=None) as batch_op:
+        batch_op.drop_index("ix_coupons_expires_at")
+    op.drop_table("coupon_campaigns")
@@ -0,0 +1,36 @@
+"""add import_jobs for bulk staff onboarding
+
+Revision ID: e8b3f5a27c64
+Revises: d4a2c8f61e09
+Create Date: 2026-10-19 17:35:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "e8b3f5a27c64"
+down_revision = "d4a2c8f61e09"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "import_jobs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("kind", sa.String(length=20), nullable=False, server_default="staff"),
+        sa.Column("status", sa.String(length=20), nullable=False, server_default="pending"),
+        sa.Column("total", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("processed", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("payload", sa.Text(), nullable=True),
+        sa.Column("result", sa.Text(), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("created_by_user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+    )
+
+
+def downgrade():
+    op.drop_table("import_jobs")
@@ -0,0 +1,29 @@
+"""indexes for pending payouts per staff
+
+Revision ID: f2c9a7d13b85
+Revises: e8b3f5a27c64
+Create Date: 2026-10-19 19:10:00
+"""
+
+from alembic import op
+
+
+revision = "f2c9a7d13b85"
+down_revision = "e8b3f5a27c64"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Incluyen amount_cents para sumar pendientes solo con el índice
+    with op.batch_alter_table("tips", schema=None) as batch_op:
+        batch_op.create_index("ix_tips_restaurant_staff", ["restaurant_id", "staff_id", "amount_cents"], unique=False)
+    with op.batch_alter_table("transfers", schema=None) as batch_op:
+        batch_op.create_index("ix_transfers_restaurant_staff", ["restaurant_id", "staff_id", "amount_cents"], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table("transfers", schema=None) as batch_op:
+        batch_op.drop_index("ix_transfers_restaurant_staff")
+    with op.batch_alter_table("tips", schema=None) as batch_op:
+        batch_op.drop_index("ix_tips_restaurant_staff")
@@ -147,6 +147,7 @@ document.addEventListener('DOMContentLoaded', () => {
   initChartsDefaults();
   animateCards();
   initAvatarMenu();
+  initImageDownscale();
 
   document.body.addEventListener('click', (e) => {
     const btn = e.target.closest('.btn');
@@ -163,8 +164,102 @@ document.addEventListener('DOMContentLoaded', () => {
   });
 
   initAdminCharts();
+  initOfflineShell();
+  initPosRedeem();
 });
 
+// Counter coupon redemption (/pos): validate or redeem a code via the JSON API.
+const POS_MESSAGES = {
+  valid: ['success', 'Valid coupon'],
+  used: ['warning', 'Already redeemed'],
+  expired: ['danger', 'Coupon expired'],
+  inactive: ['danger', 'Coupon no longer active'],
+  wrong_venue: ['danger', 'Coupon belongs to another venue'],
+  not_found: ['danger', 'Unknown code'],
+};
+
+function initPosRedeem(){
+  const form = document.getElementById('pos-redeem');
+  if (!form) return;
+  const out = document.getElementById('pos-result');
+  const input = form.querySelector('[name="code"]');
+  const csrf = form.querySelector('input[name="csrf_token"]').value;
+
+  async function send(url){
+    const code = input.value.trim();
+    if (!code) return;
+    let data;
+    try {
+      const res = await fetch(url, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json', 'X-CSRFToken': csrf },
+        body: JSON.stringify({ code }),
+        credentials: 'same-origin',
+      });
+      data = await res.json();
+    } catch (e) {
+      data = { status: 'error' };
+    }
+    let [kind, text] = POS_MESSAGES[data.status] || ['danger', data.error || 'Could not reach the server'];
+    if (data.redeemed) [kind, text] = ['success', 'Redeemed'];
+    out.className = 'mt-3 alert alert-' + kind;
+    out.textContent = text + (data.title ? ' · ' + data.title : '');
+    if (data.redeemed) { input.value = ''; input.focus(); }
+  }
+
+  form.addEventListener('submit', (e) => { e.preventDefault(); send(form.dataset.redeemUrl); });
+  form.querySelector('[data-action="validate"]').addEventListener('click', () => send(form.dataset.validateUrl));
+}
+
+// Offline shell for the public tip pages: register the service worker and
+// hand it the versioned manifest so it can refresh its precache.
+function initOfflineShell(){
+  const shell = document.querySelector('[data-offline-manifest]');
+  if (!shell || !('serviceWorker' in navigator)) return;
+  const manifestUrl = shell.dataset.offlineManifest;
+  navigator.serviceWorker.register('/sw.js', { scope: '/r/' }).then(() => navigator.serviceWorker.ready).then(reg => {
+    const post = (msg) => reg.active && reg.active.postMessage(msg);
+    post({ type: 'xinra:manifest', url: manifestUrl });
+    post({ type: 'xinra:flush' });
+    window.addEventListener('online', () => post({ type: 'xinra:flush' }));
+    navigator.serviceWorker.addEventListener('message', (event) => {
+      if (event.data && event.data.type === 'xinra:outbox') showOutboxStatus(shell, event.data, post);
+    });
+  }).catch(err => console.warn('Service worker unavailable', err));
+}
+
+// Offline submissions the server rejected stay queued until the guest retries or discards them
+function showOutboxStatus(shell, status, post){
+  let box = document.getElementById('outbox-status');
+  if (!status.failed){
+    if (box) box.remove();
+    return;
+  }
+  if (!box){
+    box = document.createElement('div');
+    box.id = 'outbox-status';
+    box.className = 'alert alert-warning d-flex flex-wrap align-items-center gap-2';
+    shell.prepend(box);
+  }
+  box.innerHTML = '';
+  const text = document.createElement('span');
+  text.className = 'me-auto';
+  text.textContent = status.failed === 1
+    ? 'A tip or review saved offline could not be sent.'
+    : status.failed + ' tips or reviews saved offline could not be sent.';
+  const retry = document.createElement('button');
+  retry.type = 'button';
+  retry.className = 'btn btn-sm btn-dark';
+  retry.textContent = 'Try again';
+  retry.addEventListener('click', () => post({ type: 'xinra:retry-failed' }));
+  const discard = document.createElement('button');
+  discard.type = 'button';
+  discard.className = 'btn btn-sm btn-outline-dark';
+  discard.textContent = 'Discard';
+  discard.addEventListener('click', () => post({ type: 'xinra:discard-failed' }));
+  box.append(text, retry, discard);
+}
+
 function initAvatarMenu(){
   const form = document.getElementById('avatarUploadForm');
   const input = document.getElementById('avatarUploadInput');
@@ -173,13 +268,147 @@ function initAvatarMenu(){
   triggers.forEach(btn => {
     btn.addEventListener('click', () => input.click());
   });
-  input.addEventListener('change', () => {
+  input.addEventListener('change', async () => {
     if (input.files && input.files.length){
+      await prepareAndUpload(input);
       form.submit();
     }
   });
 }
 
+// Client-side downscaling: re-encode photos to the server bounds before upload
+// and attach a hint (signed policy + final size/format) so the server can
+// store them without decoding again.
+const UPLOAD_MAX_SIDE = 1600;
+
+async function downscaleImage(file){
+  if (!file || !/^image\/(jpeg|png)$/.test(file.type) || !window.createImageBitmap) return null;
+  const bmp = await createImageBitmap(file, { imageOrientation: 'from-image' });
+  const scale = Math.min(1, UPLOAD_MAX_SIDE / Math.max(bmp.width, bmp.height));
+  const width = Math.max(1, Math.round(bmp.width * scale));
+  const height = Math.max(1, Math.round(bmp.height * scale));
+  const canvas = document.createElement('canvas');
+  canvas.width = width;
+  canvas.height = height;
+  canvas.getContext('2d').drawImage(bmp, 0, 0, width, height);
+  if (bmp.close) bmp.close();
+  const type = file.type === 'image/png' ? 'image/png' : 'image/jpeg';
+  const blob = await new Promise(resolve => canvas.toBlob(resolve, type, 0.85));
+  if (!blob) return null;
+  const ext = type === 'image/png' ? 'png' : 'jpg';
+  const name = (file.name || 'photo').replace(/\.[^.]+$/, '') + '.' + ext;
+  return { file: new File([blob], name, { type }), width, height, format: ext === 'png' ? 'png' : 'jpeg' };
+}
+
+async function prepareImageUpload(input){
+  const file = input.files && input.files[0];
+  const policy = document.querySelector('meta[name="upload-policy"]')?.content;
+  if (!file || !policy || input.dataset.prepared === '1') return;
+  let out = null;
+  try { out = await downscaleImage(file); } catch (e) { out = null; }
+  if (!out) return; // fall back to the original file; the server resizes it
+  const dt = new DataTransfer();
+  dt.items.add(out.file);
+  input.files = dt.files;
+  input.dataset.prepared = '1';
+  let hint = input.form.querySelector(`input[name="${input.name}_hint"]`);
+  if (!hint){
+    hint = document.createElement('input');
+    hint.type = 'hidden';
+    hint.name = `${input.name}_hint`;
+    input.form.appendChild(hint);
+  }
+  hint.value = JSON.stringify({ policy, width: out.width, height: out.height, format: out.format });
+}
+
+// Resumable chunked upload (init/append, finalized by the form POST).
+// On success the file input is emptied and <name>_upload carries the id.
+const sleep = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+
+async function uploadInChunks(input){
+  const file = input.files && input.files[0];
+  const csrf = input.form.querySelector('input[name="csrf_token"]')?.value;
+  if (!file || !csrf) return false;
+  const headers = { 'X-CSRFToken': csrf };
+  let init;
+  try {
+    init = await fetch('/uploads/chunked', {
+      method: 'POST',
+      headers: { ...headers, 'Content-Type': 'application/json' },
+      body: JSON.stringify({ filename: file.name, size: file.size }),
+    });
+  } catch (e) { return false; }
+  if (!init.ok) return false;
+  const { id, chunk_size } = await init.json();
+  const statusUrl = `/uploads/chunked/${id}`;
+  const currentOffset = async () => {
+    const res = await fetch(statusUrl, { cache: 'no-store' });
+    if (!res.ok) throw new Error('HTTP ' + res.status);
+    return parseInt(res.headers.get('Upload-Offset') || '0', 10);
+  };
+
+  let offset = 0;
+  let failures = 0;
+  while (offset < file.size){
+    try {
+      const res = await fetch(statusUrl, {
+        method: 'PATCH',
+        headers: { ...headers, 'Upload-Offset': String(offset), 'Content-Type': 'application/offset+octet-stream' },
+        body: file.slice(offset, offset + chunk_size),
+      });
+      if (res.status === 409){
+        offset = parseInt(res.headers.get('Upload-Offset') || '0', 10);
+        continue;
+      }
+      if (!res.ok) return false;
+      offset = parseInt(res.headers.get('Upload-Offset') || '0', 10);
+      failures = 0;
+    } catch (e) {
+      // Dropped connection: back off, then resume from the server's offset
+      if (++failures > 6) return false;
+      await sleep(Math.min(8000, 500 * 2 ** failures));
+      try { offset = await currentOffset(); } catch (err) { /* keep local offset */ }
+    }
+  }
+
+  let ref = input.form.querySelector(`input[name="${input.name}_upload"]`);
+  if (!ref){
+    ref = document.createElement('input');
+    ref.type = 'hidden';
+    ref.name = `${input.name}_upload`;
+    input.form.appendChild(ref);
+  }
+  ref.value = id;
+  input.files = new DataTransfer().files;
+  return true;
+}
+
+async function prepareAndUpload(input){
+  await prepareImageUpload(input);
+  await uploadInChunks(input);
+}
+
+function initImageDownscale(){
+  document.querySelectorAll('input[type=file][data-downscale]').forEach(input => {
+    input.addEventListener('change', () => {
+      delete input.dataset.prepared;
+      const ref = input.form && input.form.querySelector(`input[name="${input.name}_upload"]`);
+      if (ref) ref.value = '';
+    });
+  });
+  document.querySelectorAll('form').forEach(form => {
+    const inputs = form.querySelectorAll('input[type=file][data-downscale]');
+    if (!inputs.length) return;
+    form.addEventListener('submit', async (e) => {
+      const pending = Array.from(inputs).filter(i => i.files && i.files.length && i.dataset.prepared !== '1');
+      if (!pending.length) return;
+      e.preventDefault();
+      for (const input of pending) await prepareAndUpload(input);
+      form.submit();
+    });
+  });
+}
+
 // Admin dashboard live charts
 function initAdminCharts(){
   const tipsEl = document.getElementById('tipsChart');
@@ -0,0 +1,286 @@
+// Service worker for the public QR tip pages (/r/<slug>).
+// - Precaches the tip page shell, CSS and roster from the versioned manifest
+// - Serves pages and assets cache-first, revalidating in the background
+// - Queues tip/feedback POSTs in IndexedDB when offline and replays them later
+// - Cached pages never keep a CSRF token: the worker fetches a fresh one on send
+// - Every POST carries an idempotency key, so a replay never duplicates a tip
+
+const SHELL_PREFIX = 'xinra-shell-';
+const RUNTIME_CACHE = 'xinra-runtime';
+const DB_NAME = 'xinra-offline';
+const STORE = 'outbox';
+const SYNC_TAG = 'xinra-outbox';
+
+self.addEventListener('install', () => self.skipWaiting());
+
+self.addEventListener('activate', (event) => {
+  event.waitUntil(self.clients.claim().then(flushOutbox));
+});
+
+self.addEventListener('message', (event) => {
+  const msg = event.data || {};
+  if (msg.type === 'xinra:manifest' && msg.url) {
+    event.waitUntil(syncManifest(msg.url));
+  } else if (msg.type === 'xinra:flush') {
+    event.waitUntil(flushOutbox());
+  } else if (msg.type === 'xinra:retry-failed') {
+    event.waitUntil(resetFailed(false).then(flushOutbox));
+  } else if (msg.type === 'xinra:discard-failed') {
+    event.waitUntil(resetFailed(true).then(notifyClients));
+  }
+});
+
+self.addEventListener('sync', (event) => {
+  if (event.tag === SYNC_TAG) event.waitUntil(flushOutbox());
+});
+
+self.addEventListener('fetch', (event) => {
+  const req = event.request;
+  const url = new URL(req.url);
+  const sameOrigin = url.origin === self.location.origin;
+
+  if (req.method === 'POST') {
+    if (sameOrigin && url.pathname.startsWith('/r/')) event.respondWith(postOrQueue(req));
+    return;
+  }
+  if (req.method !== 'GET') return;
+
+  if (req.mode === 'navigate') {
+    if (sameOrigin && url.pathname.startsWith('/r/')) event.respondWith(pageFromCache(event, req, url));
+    return;
+  }
+  if (sameOrigin && (url.pathname.startsWith('/static/') || url.pathname.startsWith('/uploads/'))) {
+    event.respondWith(shellFirst(event, req));
+    return;
+  }
+  if (!sameOrigin && ['style', 'script', 'font'].includes(req.destination)) {
+    event.respondWith(staleWhileRevalidate(event, req));
+  }
+});
+
+// ---- Manifest / precache ----
+
+function slugFromPath(pathname) {
+  const parts = pathname.split('/');
+  return parts.length > 2 ? parts[2] : '';
+}
+
+async function shellCacheName(slug) {
+  const keys = await caches.keys();
+  return keys.find(k => k.startsWith(SHELL_PREFIX + slug + '-')) || null;
+}
+
+async function syncManifest(manifestUrl) {
+  const res = await fetch(manifestUrl, { cache: 'no-cache', credentials: 'same-origin' });
+  if (!res.ok) return;
+  const manifest = await res.clone().json();
+  const slug = manifest.restaurant.slug;
+  const name = SHELL_PREFIX + slug + '-' + manifest.version;
+  if (await caches.has(name)) return;
+
+  const cache = await caches.open(name);
+  await Promise.all(manifest.precache.map(async (u) => {
+    try {
+      const r = await fetch(u, { credentials: 'same-origin' });
+      if (r.ok && !r.redirected) await cache.put(u, await withoutCsrf(r));
+    } catch (e) { /* offline mid-sync: keep what we have */ }
+  }));
+  await cache.put(manifestUrl, res);
+
+  const stale = (await caches.keys()).filter(k => k.startsWith(SHELL_PREFIX + slug + '-') && k !== name);
+  await Promise.all(stale.map(k => caches.delete(k)));
+}
+
+// ---- Fetch strategies ----
+
+async function pageFromCache(event, req, url) {
+  const name = await shellCacheName(slugFromPath(url.pathname));
+  const cache = name ? await caches.open(name) : null;
+  const cached = cache ? await cache.match(req, { ignoreSearch: true }) : null;
+  const network = fetch(req).then(async (res) => {
+    if (cache && res.ok && !res.redirected && !url.search) await cache.put(req, await withoutCsrf(res.clone()));
+    return res;
+  });
+  if (cached) {
+    event.waitUntil(network.catch(() => null));
+    return cached;
+  }
+  return network;
+}
+
+// CSRF tokens are bound to the session that rendered the page: never keep them in the cache
+const CSRF_INPUT = /(<input[^>]*name="csrf_token"[^>]*value=")[^"]*(")/g;
+
+async function withoutCsrf(res) {
+  if (!(res.headers.get('Content-Type') || '').includes('text/html')) return res;
+  const html = (await res.text()).replace(CSRF_INPUT, '$1$2');
+  return new Response(html, { status: res.status, statusText: res.statusText, headers: res.headers });
+}
+
+async function shellFirst(event, req) {
+  // Shell caches are replaced whenever the manifest version changes
+  const names = (await caches.keys()).filter(k => k.startsWith(SHELL_PREFIX));
+  for (const name of names) {
+    const hit = await (await caches.open(name)).match(req);
+    if (hit) return hit;
+  }
+  return staleWhileRevalidate(event, req);
+}
+
+async function staleWhileRevalidate(event, req) {
+  const cache = await caches.open(RUNTIME_CACHE);
+  const cached = await cache.match(req);
+  const network = fetch(req).then(async (res) => {
+    if (res.ok || res.type === 'opaque') await cache.put(req, res.clone());
+    return res;
+  });
+  if (cached) {
+    event.waitUntil(network.catch(() => null));
+    return cached;
+  }
+  return network;
+}
+
+// ---- Outbox (IndexedDB) ----
+
+function openDb() {
+  return new Promise((resolve, reject) => {
+    const open = indexedDB.open(DB_NAME, 1);
+    open.onupgradeneeded = () => open.result.createObjectStore(STORE, { autoIncrement: true });
+    open.onsuccess = () => resolve(open.result);
+    open.onerror = () => reject(open.error);
+  });
+}
+
+function tx(db, mode, fn) {
+  return new Promise((resolve, reject) => {
+    const t = db.transaction(STORE, mode);
+    const result = fn(t.objectStore(STORE));
+    t.oncomplete = () => resolve(result && 'result' in result ? result.result : result);
+    t.onerror = () => reject(t.error);
+  });
+}
+
+function newKey() {
+  return self.crypto.randomUUID ? self.crypto.randomUUID() : Date.now().toString(36) + '-' + Math.random().toString(36).slice(2);
+}
+
+async function freshCsrf(url) {
+  const res = await fetch('/r/' + slugFromPath(new URL(url).pathname) + '/csrf-token', { credentials: 'same-origin', cache: 'no-store' });
+  if (!res.ok) throw new Error('csrf ' + res.status);
+  return (await res.json()).csrf_token;
+}
+
+function formBody(entries) {
+  const body = new FormData();
+  entries.forEach(([k, v]) => body.append(k, v));
+  return body;
+}
+
+function setEntry(entries, key, value) {
+  const found = entries.find(([k]) => k === key);
+  if (found) found[1] = value; else entries.push([key, value]);
+}
+
+// Sends a queued form; a missing or stale CSRF token (400) is refreshed and retried once.
+// Throws when offline.
+async function send(url, entries) {
+  const post = () => fetch(url, { method: 'POST', body: formBody(entries), credentials: 'same-origin', redirect: 'manual' });
+  const token = entries.find(([k]) => k === 'csrf_token');
+  if (!token || !token[1]) setEntry(entries, 'csrf_token', await freshCsrf(url));
+  let res = await post();
+  if (res.status === 400) {
+    setEntry(entries, 'csrf_token', await freshCsrf(url));
+    res = await post();
+  }
+  return res;
+}
+
+async function postOrQueue(req) {
+  const form = await req.formData();
+  const entries = [];
+  form.forEach((value, key) => entries.push([key, value]));
+  // Same key on every replay: the server returns the tip it already recorded
+  if (!entries.some(([k, v]) => k === 'idempotency_key' && v)) setEntry(entries, 'idempotency_key', newKey());
+  try {
+    return await send(req.url, entries);
+  } catch (err) {
+    const db = await openDb();
+    await tx(db, 'readwrite', store => store.add({ url: req.url, entries, queuedAt: Date.now() }));
+    if (self.registration.sync) {
+      try { await self.registration.sync.register(SYNC_TAG); } catch (e) { /* flushed on next load */ }
+    }
+    return offlineResponse();
+  }
+}
+
+// Only the post-redirect-get counts as recorded; a 200 is the form re-rendered with errors
+function delivered(res) {
+  return res.type === 'opaqueredirect' || (res.status >= 300 && res.status < 400);
+}
+
+let flushing = null;
+function flushOutbox() {
+  if (!flushing) flushing = doFlush().finally(() => { flushing = null; });
+  return flushing;
+}
+
+async function doFlush() {
+  const db = await openDb();
+  const keys = await tx(db, 'readonly', store => store.getAllKeys());
+  try {
+    for (const key of keys || []) {
+      const item = await tx(db, 'readonly', store => store.get(key));
+      if (!item || item.failedStatus) continue;
+      let res;
+      try {
+        res = await send(item.url, item.entries);
+      } catch (e) {
+        return; // still offline; retry on next sync
+      }
+      // 429/5xx: keep it queued and retry later
+      if (res.status === 429 || res.status >= 500) return;
+      if (!delivered(res)) {
+        // Rejected (4xx, or the form re-rendered with errors): keep it and let the page ask the user
+        item.failedStatus = res.status || 400;
+        await tx(db, 'readwrite', store => store.put(item, key));
+        continue;
+      }
+      await tx(db, 'readwrite', store => store.delete(key));
+    }
+  } finally {
+    await notifyClients();
+  }
+}
+
+async function resetFailed(discard) {
+  const db = await openDb();
+  const keys = await tx(db, 'readonly', store => store.getAllKeys());
+  for (const key of keys || []) {
+    const item = await tx(db, 'readonly', store => store.get(key));
+    if (!item || !item.failedStatus) continue;
+    if (discard) {
+      await tx(db, 'readwrite', store => store.delete(key));
+    } else {
+      delete item.failedStatus;
+      await tx(db, 'readwrite', store => store.put(item, key));
+    }
+  }
+}
+
+async function notifyClients() {
+  const db = await openDb();
+  const items = (await tx(db, 'readonly', store => store.getAll())) || [];
+  const failed = items.filter(i => i.failedStatus).length;
+  const clients = await self.clients.matchAll({ type: 'window' });
+  clients.forEach(c => c.postMessage({ type: 'xinra:outbox', pending: items.length - failed, failed }));
+}
+
+function offlineResponse() {
+  const html = '<!doctype html><html lang="en"><head><meta charset="utf-8">' +
+    '<meta name="viewport" content="width=device-width, initial-scale=1"><title>Saved offline</title></head>' +
+    '<body style="font-family:sans-serif;text-align:center;padding:3rem 1rem">' +
+    '<h1>Saved</h1><p>You are offline. We will send it automatically as soon as the connection is back.</p>' +
+    '<p><a href="javascript:history.back()">Back</a></p></body></html>';
+  return new Response(html, { status: 202, headers: { 'Content-Type': 'text/html; charset=utf-8' } });
+}
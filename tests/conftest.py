@@ -0,0 +1,42 @@
+import os
+import shutil
+import tempfile
+
+import pytest
+
+_TMP = tempfile.mkdtemp(prefix="xigma-tests-")
+os.environ.update({
+    "SQLALCHEMY_DATABASE_URI": f"sqlite:///{_TMP}/test.db",
+    "UPLOADS_DIR": os.path.join(_TMP, "uploads"),
+    "RATELIMIT_STORAGE_URI": "memory://",
+    "RATELIMIT_ENABLED": "0",
+    "FLASK_ENV": "development",
+    "SECRET_KEY": "test-secret",
+    "BCRYPT_ROUNDS": "4",
+})
+
+
+@pytest.fixture(scope="session")
+def app():
+    from app import create_app
+    from app.extensions import db
+    from app.seed import seed_demo
+
+    app = create_app()
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    with app.app_context():
+        db.create_all()
+        seed_demo()
+    yield app
+    shutil.rmtree(_TMP, ignore_errors=True)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def login(client, email="admin@demo.com", password="demo123"):
+    resp = client.post("/login", data={"email": email, "password": password})
+    assert resp.status_code == 302, resp.status_code
+    return resp
@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+
+from app.extensions import db
+from app.models import Coupon, CouponCampaign, CouponRedemption, Restaurant, User, UserStat
+from app.services import campaign_service
+
+
+def _coupon():
+    restaurant = Restaurant.query.filter_by(slug="cafe-luna").one()
+    return Coupon.query.filter_by(restaurant_id=restaurant.id, title="Free Merch").one()
+
+
+def _campaign(coupon, **kwargs):
+    campaign = CouponCampaign(coupon_id=coupon.id, min_xp=0, **kwargs)
+    db.session.add(campaign)
+    db.session.commit()
+    return campaign
+
+
+def test_segment_is_scoped_to_the_restaurant(app):
+    with app.app_context():
+        coupon = _coupon()
+        outsider = User(email="outsider@example.com", name="Outsider", password_hash="x")
+        reviewer = User(email="reviewer@example.com", name="Reviewer", password_hash="x")
+        db.session.add_all([outsider, reviewer])
+        db.session.flush()
+        db.session.add(UserStat(user_id=reviewer.id, bucket="restaurant", key=str(coupon.restaurant_id), reviews_count=1))
+        db.session.add(UserStat(user_id=outsider.id, bucket="restaurant", key=str(coupon.restaurant_id + 1000), tips_count=3))
+        db.session.commit()
+
+        campaign_service.run_campaign(_campaign(coupon, tipped_here=False).id)
+        issued = {uid for (uid,) in db.session.query(CouponRedemption.user_id).filter_by(coupon_id=coupon.id)}
+        assert reviewer.id in issued
+        assert outsider.id not in issued
+
+        campaign_service.run_campaign(_campaign(coupon, tipped_here=True).id)
+        tippers = {s.user_id for s in UserStat.query.filter_by(bucket="restaurant", key=str(coupon.restaurant_id)) if s.tips_count}
+        assert tippers <= issued
+
+
+def test_stalled_campaign_is_resumed_once(app):
+    with app.app_context():
+        coupon = _coupon()
+        old = datetime.utcnow() - campaign_service.STALE_AFTER - timedelta(minutes=1)
+        stalled = _campaign(coupon, status="running", heartbeat_at=old)
+        alive = _campaign(coupon, status="running", heartbeat_at=datetime.utcnow())
+
+        resumed = campaign_service.resume_stalled()
+        assert [c.id for c in resumed] == [stalled.id]
+        assert db.session.get(CouponCampaign, stalled.id).status == "done"
+        assert db.session.get(CouponCampaign, alive.id).status == "running"
+        assert not campaign_service.claim_resume(alive.id)
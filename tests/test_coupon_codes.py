@@ -0,0 +1,30 @@
+from app.extensions import db
+from app.models import Coupon, CouponRedemption, Restaurant, User
+from app.services import coupon_service
+
+
+def _claim(title, code=None):
+    restaurant = Restaurant.query.filter_by(slug="cafe-luna").one()
+    coupon = Coupon.query.filter_by(restaurant_id=restaurant.id, title=title).one()
+    user = User.query.filter_by(email="admin@demo.com").one()
+    CouponRedemption.query.filter_by(coupon_id=coupon.id, user_id=user.id).delete()
+    code = code or coupon_service.redemption_code(coupon.id, user.id)
+    db.session.add(CouponRedemption(coupon_id=coupon.id, user_id=user.id, code=code, status="claimed"))
+    db.session.commit()
+    return code, frozenset({restaurant.id}), user
+
+
+def test_legacy_code_with_o_i_l_is_found(app):
+    with app.app_context():
+        code, venues, user = _claim("Free Coffee", code="LOI7QX2A")
+        assert coupon_service.validate_code("loi7-qx2a", venues)["status"] == "valid"
+        out = coupon_service.redeem_code("LOI7QX2A", venues, user)
+        assert out["redeemed"] and out["code"] == code
+
+
+def test_misread_crockford_code_is_folded(app):
+    with app.app_context():
+        code, venues, user = _claim("2-for-1 Latte", code="10ABCDEFGHJK0")
+        out = coupon_service.validate_code("IO-ABCD-EFGH-JKO", venues)
+        assert out["status"] == "valid" and out["code"] == code
+        assert coupon_service.redeem_code("lOABCDEFGHJKo", venues, user)["redeemed"]
@@ -0,0 +1,77 @@
+import io
+
+import pytest
+from PIL import Image, PngImagePlugin
+from werkzeug.datastructures import FileStorage
+
+from app.extensions import db
+from app.services.image_service import process_and_save_image
+
+ICC = b"\x00" * 128
+
+
+def _save(fmt, **kwargs):
+    out = io.BytesIO()
+    Image.new("RGB", (40, 30), (200, 80, 40)).save(out, fmt, **kwargs)
+    return out.getvalue()
+
+
+def _process(data, fmt):
+    hint = {"width": 40, "height": 30, "format": fmt.lower(), "max_side": 1600}
+    ext = "jpg" if fmt == "JPEG" else "png"
+    saved = process_and_save_image(FileStorage(io.BytesIO(data), filename=f"photo.{ext}"), hint)
+    stored = [obj for obj in db.session.new if getattr(obj, "filename", None) == saved.url.rsplit("/", 1)[-1]][0].data
+    db.session.rollback()
+    return stored
+
+
+def test_bare_canvas_jpeg_is_stored_as_is(app):
+    data = _save("JPEG", quality=85)
+    with app.app_context():
+        assert _process(data, "JPEG") == data
+
+
+@pytest.mark.parametrize("fmt,kwargs", [
+    ("JPEG", {"comment": b"secret", "xmp": b"<x:xmpmeta>secret</x:xmpmeta>", "icc_profile": ICC}),
+    ("PNG", {"icc_profile": ICC}),
+])
+def test_metadata_is_stripped(app, fmt, kwargs):
+    if fmt == "PNG":
+        info = PngImagePlugin.PngInfo()
+        info.add_text("Comment", "secret")
+        kwargs = {**kwargs, "pnginfo": info}
+    with app.app_context():
+        stored = _process(_save(fmt, **kwargs), fmt)
+    img = Image.open(io.BytesIO(stored))
+    assert not {"comment", "xmp", "icc_profile", "Comment"} & set(img.info)
+    assert b"secret" not in stored
+
+
+def test_declared_oversize_image_is_rejected_before_decoding(app):
+    out = io.BytesIO()
+    Image.new("RGB", (400, 300)).save(out, "PNG")
+    with app.app_context():
+        saved = app.config["MAX_IMAGE_PIXELS"]
+        app.config["MAX_IMAGE_PIXELS"] = 400 * 300 - 1
+        try:
+            with pytest.raises(ValueError, match="dimensions"):
+                process_and_save_image(FileStorage(io.BytesIO(out.getvalue()), filename="big.png"))
+        finally:
+            app.config["MAX_IMAGE_PIXELS"] = saved
+
+
+def test_over_limit_image_body_is_rejected(app):
+    body = io.BytesIO(b"\xff\xd8" + b"\x00" * (app.config["MAX_IMAGE_MB"] * 1024 * 1024))
+    with app.app_context():
+        with pytest.raises(ValueError, match="size limit"):
+            process_and_save_image(FileStorage(body, filename="big.jpg"))
+
+
+def test_oversized_request_gets_413(app, client):
+    body = b"x" * (app.config["MAX_CONTENT_LENGTH"] + 1)
+    resp = client.post(
+        "/r/cafe-luna/feedback",
+        data={"rating": "5", "photo": (io.BytesIO(body), "big.jpg")},
+        content_type="multipart/form-data",
+    )
+    assert resp.status_code == 413
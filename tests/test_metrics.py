@@ -0,0 +1,32 @@
+import pytest
+
+
+@pytest.fixture
+def metrics_config(app):
+    saved = {k: app.config.get(k) for k in ("METRICS_TOKEN", "METRICS_PUBLIC")}
+    yield app.config
+    app.config.update(saved)
+
+
+def test_metrics_hidden_without_token_when_not_public(client, metrics_config):
+    metrics_config.update(METRICS_TOKEN=None, METRICS_PUBLIC=False)
+    assert client.get("/metrics").status_code == 404
+
+
+def test_metrics_require_bearer_token(client, metrics_config):
+    metrics_config.update(METRICS_TOKEN="s3cret", METRICS_PUBLIC=True)
+    assert client.get("/metrics").status_code == 404
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 404
+    assert client.get("/metrics", headers={"Authorization": "Bearer s3cret"}).status_code == 200
+
+
+def test_pool_gauge_follows_checked_out_connections(app):
+    from app.extensions import db
+    from app.utils.metrics import POOL_CHECKED_OUT
+
+    with app.app_context():
+        before = db.engine.pool.checkedout()
+        conn = db.engine.connect()
+        assert POOL_CHECKED_OUT._value.get() == before + 1
+        conn.close()
+        assert POOL_CHECKED_OUT._value.get() == before
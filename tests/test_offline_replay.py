@@ -0,0 +1,62 @@
+import uuid
+
+from app.extensions import db
+from app.models import Restaurant, Review, Tip
+from app.services.tip_service import create_tip
+
+
+def _tip_form(app, key):
+    with app.app_context():
+        restaurant = Restaurant.query.filter_by(slug="cafe-luna").one()
+        staff_id = restaurant.staff[0].id
+    return {"restaurant_id": restaurant.id, "staff_id": staff_id, "amount_cents": 500, "method_ui": "apple_pay", "idempotency_key": key}
+
+
+def test_replayed_tip_is_recorded_once(app, client):
+    key = str(uuid.uuid4())
+    first = client.post("/r/cafe-luna", data=_tip_form(app, key))
+    replay = client.post("/r/cafe-luna", data=_tip_form(app, key))
+
+    assert first.status_code == replay.status_code == 302
+    assert first.headers["Location"] == replay.headers["Location"]
+    with app.app_context():
+        assert Tip.query.filter_by(idempotency_key=key).count() == 1
+
+
+def test_replayed_review_is_recorded_once(app, client):
+    key = str(uuid.uuid4())
+    for _ in range(2):
+        resp = client.post("/r/cafe-luna/feedback", data={"rating": 5, "comment": "Great", "idempotency_key": key})
+        assert resp.status_code == 302
+    with app.app_context():
+        assert Review.query.filter_by(idempotency_key=key).count() == 1
+
+
+def test_invalid_idempotency_key_is_ignored(app, client):
+    before_key = "not a key; drop"
+    client.post("/r/cafe-luna", data=_tip_form(app, before_key))
+    with app.app_context():
+        assert Tip.query.filter_by(idempotency_key=before_key).count() == 0
+
+
+def test_csrf_token_endpoint_is_not_cacheable(client):
+    resp = client.get("/r/cafe-luna/csrf-token")
+
+    assert resp.status_code == 200
+    assert resp.json["csrf_token"]
+    assert resp.headers["Cache-Control"] == "no-store"
+
+
+def test_idempotency_key_is_scoped_to_the_restaurant(app):
+    key = str(uuid.uuid4())
+    with app.app_context():
+        home = Restaurant.query.filter_by(slug="cafe-luna").one()
+        other = Restaurant(slug=f"other-{key[:8]}", name="Other venue")
+        db.session.add(other)
+        db.session.commit()
+        first = create_tip(home.id, None, None, 500, "apple_pay", key)
+        second = create_tip(other.id, None, None, 700, "apple_pay", key)
+
+        assert second.id != first.id
+        assert (second.restaurant_id, second.amount_cents) == (other.id, 700)
+        assert create_tip(other.id, None, None, 700, "apple_pay", key).id == second.id
@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from sqlalchemy import event
+
+from app.extensions import db
+from app.models import PoolAllocation, Restaurant, Staff, Tip
+from app.services.pool_service import allocate_cents, allocate_pool, parse_role_weights
+
+
+@pytest.mark.parametrize("text", ["Barista=inf", "Barista=nan", "Chef=-inf", "Barista=1e999"])
+def test_parse_role_weights_rejects_non_finite(text):
+    with pytest.raises(ValueError):
+        parse_role_weights(text)
+
+
+def test_allocate_cents_rejects_non_finite_weights():
+    with pytest.raises(ValueError):
+        allocate_cents(np.array([100]), np.array([np.inf, 1.0]))
+
+
+def test_allocate_cents_sums_exactly():
+    shares = allocate_cents(np.array([1001, 7]), np.array([[1.0, 2.0, 0.5], [0.0, 0.0, 0.0]]))
+    assert shares.sum(axis=1).tolist() == [1001, 7]
+
+
+def test_tip_committed_mid_allocation_stays_pending(app):
+    with app.app_context():
+        venue = Restaurant(slug="pool-venue", name="Pool Venue")
+        db.session.add(venue)
+        db.session.flush()
+        db.session.add(Staff(restaurant_id=venue.id, name="Sam"))
+        past = datetime.utcnow() - timedelta(hours=1)
+        db.session.add_all([Tip(restaurant_id=venue.id, amount_cents=300, method_ui="card", created_at=past) for _ in range(2)])
+        db.session.commit()
+        venue_id = venue.id
+
+        # Una propina que entra entre la lectura y el UPDATE no debe quedar marcada sin repartir
+        fired = []
+
+        def _late_tip(conn, clauseelement, *args, **kwargs):
+            if not fired and getattr(clauseelement, "is_update", False) and clauseelement.table.name == "tips":
+                fired.append(True)
+                conn.execute(Tip.__table__.insert().values(restaurant_id=venue_id, amount_cents=900, method_ui="card", status="recorded", created_at=past))
+
+        event.listen(db.engine, "before_execute", _late_tip)
+        try:
+            run = allocate_pool(db.session.get(Restaurant, venue_id))
+        finally:
+            event.remove(db.engine, "before_execute", _late_tip)
+
+        assert run.tips_count == 2 and run.total_cents == 600
+        allocated = db.session.query(db.func.sum(PoolAllocation.amount_cents)).filter_by(run_id=run.id).scalar()
+        assert allocated == 600
+        pending = Tip.query.filter_by(restaurant_id=venue_id, pool_run_id=None).all()
+        assert [t.amount_cents for t in pending] == [900]
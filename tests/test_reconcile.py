@@ -0,0 +1,23 @@
+import io
+
+from app.services.reconcile_service import iter_statement, reconcile_statement
+
+
+def test_malformed_jsonl_lines_are_bad_lines(app):
+    stream = io.StringIO(
+        '{"reference": "tr_unknown", "amount_cents": 100, "status": "settled"}\n'
+        '{"reference": "tr_trunc", "amount_c\n'
+        '\n'
+        '[1, 2]\n'
+        '{"reference": "tr_other", "amount": "2.50", "status": "paid"}\n'
+    )
+    with app.app_context():
+        summary = reconcile_statement(stream, "jsonl")
+    assert summary["lines"] == 4
+    assert summary["bad_line"] == 2
+    assert summary["unknown_reference"] == 2
+
+
+def test_bad_line_keeps_its_line_number():
+    lines = list(iter_statement(io.StringIO('{"reference": "a"}\nnot json\n'), "jsonl"))
+    assert [(line.line, line.reference) for line in lines] == [(1, "a"), (2, "")]
@@ -0,0 +1,19 @@
+from app.extensions import db
+from app.models import Media, Restaurant, Review
+from conftest import login
+
+
+def test_review_photo_renders_with_dimensions_and_placeholder(app, client):
+    with app.app_context():
+        restaurant = Restaurant.query.filter_by(slug="cafe-luna").one()
+        review = Review(restaurant_id=restaurant.id, rating=5, comment="Lovely latte art")
+        db.session.add(review)
+        db.session.add(Media(review=review, url="/uploads/latte.jpg", width=640, height=480,
+                             placeholder="data:image/jpeg;base64,AAAA", dominant_color="#a0522d"))
+        db.session.commit()
+    login(client)
+    html = client.get("/dashboard/restaurant").get_data(as_text=True)
+    assert 'src="/uploads/latte.jpg"' in html
+    assert 'width="640" height="480"' in html
+    assert "background-image:url('data:image/jpeg;base64,AAAA')" in html
+    assert "background-color:#a0522d" in html
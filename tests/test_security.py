@@ -0,0 +1,27 @@
+from passlib.context import CryptContext
+
+from app.utils import security
+
+
+def _hash_with_cost(rounds: int) -> str:
+    # needs_update solo lee la cabecera: no hace falta pagar el coste real
+    return security._context_for(4).hash("secret").replace("$04$", f"${rounds:02d}$", 1)
+
+
+def test_hashes_within_range_are_not_rehashed():
+    ctx = CryptContext(**security._context_settings(14))
+    assert not ctx.needs_update(_hash_with_cost(12))
+    assert not ctx.needs_update(_hash_with_cost(16))
+    assert ctx.needs_update(_hash_with_cost(10))
+
+
+def test_production_never_goes_below_minimum(app):
+    saved = app.config["BCRYPT_ROUNDS"], app.config["ENV"]
+    try:
+        app.config.update(BCRYPT_ROUNDS=10, ENV="production")
+        security.configure_hashing(app)
+        assert security.current_rounds() == security.MIN_ROUNDS
+    finally:
+        app.config["BCRYPT_ROUNDS"], app.config["ENV"] = saved
+        security.configure_hashing(app)
+    assert security.current_rounds() == 4
@@ -0,0 +1,49 @@
+import json
+
+from app.extensions import db
+from app.models import Membership, Restaurant, Staff, User
+from app.services.staff_service import create_import_job, parse_import, run_import
+
+
+def _import(app, csv_text, email="admin@demo.com"):
+    with app.app_context():
+        user = User.query.filter_by(email=email).one()
+        home = Restaurant.query.filter_by(slug="cafe-luna").one()
+        rows = parse_import(csv_text.encode(), "staff.csv", default_restaurant=home)
+        job = run_import(create_import_job(rows, user).id)
+        return job.status, json.loads(job.result)
+
+
+def test_import_rejects_rows_for_unmanaged_restaurant(app):
+    with app.app_context():
+        other = Restaurant(slug="other-venue", name="Other Venue")
+        db.session.add(other)
+        db.session.commit()
+        before = Staff.query.filter_by(restaurant_id=other.id).count()
+
+    status, result = _import(app, "restaurant_slug,name,role\nother-venue,Intruder,Cook\ncafe-luna,Ana,Server\n")
+
+    assert status == "done"
+    assert result["staff_created"] == 1
+    assert [(r["row"], r["name"]) for r in result["rejected"]] == [(1, "Intruder")]
+    with app.app_context():
+        other = Restaurant.query.filter_by(slug="other-venue").one()
+        assert Staff.query.filter_by(restaurant_id=other.id).count() == before
+        assert Membership.query.filter_by(restaurant_id=other.id).count() == 0
+        assert Staff.query.filter_by(name="Ana").one().restaurant.slug == "cafe-luna"
+
+
+def test_import_creates_new_restaurant_for_importer(app):
+    status, result = _import(app, "restaurant_slug,restaurant_name,name\nnew-spot,New Spot,Bo\n")
+
+    assert status == "done"
+    assert result == {"restaurants_created": 1, "staff_created": 1, "rejected": []}
+
+
+def test_staff_member_cannot_import_into_own_venue(app):
+    # mia@demo.com es staff (no admin) de cafe-luna
+    status, result = _import(app, "restaurant_slug,name\ncafe-luna,Sneaky\n", email="mia@demo.com")
+
+    assert status == "done"
+    assert result["staff_created"] == 0
+    assert len(result["rejected"]) == 1
@@ -0,0 +1,65 @@
+import io
+import threading
+
+import pytest
+
+from app.services import upload_service
+
+
+class _SlowStream:
+    """Entrega el primer bloque y se queda esperando hasta `release`."""
+
+    def __init__(self, data: bytes):
+        self.data = io.BytesIO(data)
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def read(self, n):
+        if self.started.is_set():
+            self.release.wait(5)
+        self.started.set()
+        return self.data.read(min(n, 1024))
+
+
+def test_overlapping_retry_waits_and_gets_the_new_offset(app):
+    chunk = b"a" * 4096
+    with app.app_context():
+        upload_id = upload_service.init_upload("photo.jpg", 2 * len(chunk))
+    slow = _SlowStream(chunk)
+    results = {}
+
+    def first():
+        with app.app_context():
+            results["first"] = upload_service.append_chunk(upload_id, 0, slow)
+
+    def retry():
+        with app.app_context():
+            try:
+                upload_service.append_chunk(upload_id, 0, io.BytesIO(b"b" * len(chunk)))
+            except upload_service.UploadOffsetMismatch as e:
+                results["retry"] = e.offset
+
+    t1 = threading.Thread(target=first)
+    t1.start()
+    assert slow.started.wait(5)
+    t2 = threading.Thread(target=retry)
+    t2.start()
+    t2.join(0.3)
+    assert t2.is_alive()  # bloqueado por el lock del primer PATCH
+    slow.release.set()
+    t1.join(5)
+    t2.join(5)
+
+    assert results == {"first": len(chunk), "retry": len(chunk)}
+    with app.app_context():
+        assert upload_service.upload_status(upload_id) == (len(chunk), 2 * len(chunk))
+        upload_service.discard_upload(upload_id)
+
+
+def test_oversized_chunk_is_discarded(app):
+    with app.app_context():
+        upload_id = upload_service.init_upload("photo.jpg", 10)
+        with pytest.raises(ValueError):
+            upload_service.append_chunk(upload_id, 0, io.BytesIO(b"x" * 11))
+        assert upload_service.upload_status(upload_id) == (0, 10)
+        upload_service.discard_upload(upload_id)